@@ -0,0 +1,378 @@
+"""
+Async facade over CustomerDatabase with a write-behind order queue.
+
+Placing an order used to wait on the SQLite commit inside the voice turn.
+AsyncCustomerDatabase instead hands out an order ID from a block reserved in
+advance and queues the order for a background writer task. The writer:
+
+    1. appends newly queued orders to a journal file and fsyncs it, which is
+       the point from which an order survives a crash. `add_order` returns
+       here, so an order ID is never handed out for an order that could
+       still be lost; one fsync covers every order queued meanwhile
+    2. writes the journaled orders to the database in one transaction once
+       `batch_size` orders are waiting or `flush_interval` has passed
+    3. empties the journal
+
+Each process has its own journal in the journal directory, held with an
+exclusive lock. On start, journals whose lock is free belong to processes
+that died before writing their orders; those orders are written to the
+database (inserts are idempotent, so a journal that was partly written is
+safe to replay) and the journal is removed.
+
+Reads go through a small cache of customer IDs, order histories and order
+summaries. A read that could see queued orders flushes them first, so a
+session always sees its own orders.
+
+Use one instance per event loop, and `await db.flush()` when a session ends.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from database import CustomerDatabase
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger("personal-shopper-db")
+
+JOURNAL_SUFFIX = ".jsonl"
+
+
+def _lock(f) -> bool:
+    """Take an exclusive lock on an open file without blocking."""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return False
+    return True
+
+
+class OrderJournal:
+    """Append-only file of orders that are not in the database yet."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a+b")
+        if not _lock(self._file):
+            self._file.close()
+            raise RuntimeError(f"Order journal {path} is in use by another process")
+
+    def append(self, entries: List[Dict[str, Any]]) -> None:
+        """Write entries and wait until they are on disk."""
+        self._file.write(b"".join(json.dumps(entry).encode() + b"\n" for entry in entries))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def entries(self) -> List[Dict[str, Any]]:
+        self._file.seek(0)
+        return self.read(self._file)
+
+    def clear(self) -> None:
+        """Drop every entry; called once they are all in the database."""
+        self._file.truncate(0)
+
+    def close(self) -> None:
+        """Close and remove the journal. Only call this once it is empty."""
+        self._file.close()
+        os.remove(self.path)
+
+    @staticmethod
+    def read(f) -> List[Dict[str, Any]]:
+        entries = []
+        for line in f.read().splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A write torn by the crash; it was never acknowledged as on disk
+                logger.warning(f"Skipping a truncated order journal entry: {line[:80]!r}")
+        return entries
+
+
+def _order_rows(entries: List[Dict[str, Any]]) -> List[Tuple[int, int, Dict[str, Any], str]]:
+    return [(e["id"], e["customer_id"], e["details"], e["date"]) for e in entries]
+
+
+def recover_journals(db: CustomerDatabase, journal_dir: str, skip: Optional[str] = None) -> int:
+    """
+    Write the orders left in the journals of dead processes to the database.
+
+    Args:
+        db: Database the journals belong to
+        journal_dir: Directory with the journals
+        skip: Path of this process's own journal
+
+    Returns the number of orders written.
+    """
+    written = 0
+    for name in sorted(os.listdir(journal_dir)):
+        path = os.path.join(journal_dir, name)
+        if not name.endswith(JOURNAL_SUFFIX) or path == skip:
+            continue
+        with open(path, "rb") as f:
+            if not _lock(f):
+                continue  # A live process's journal
+            entries = OrderJournal.read(f)
+            if entries:
+                written += db.insert_orders(_order_rows(entries))
+            os.remove(path)
+    if written:
+        logger.info(f"Recovered {written} orders from order journals in {journal_dir}")
+    return written
+
+
+class AsyncCustomerDatabase:
+    def __init__(
+        self,
+        db: CustomerDatabase,
+        journal_dir: Optional[str] = None,
+        batch_size: int = 100,
+        flush_interval: float = 0.5,
+        id_block: int = 20,
+        cache_size: int = 256,
+        cache_ttl: float = 30.0,
+    ):
+        """
+        Args:
+            db: The database to read from and write to
+            journal_dir: Directory for the order journals; defaults to
+                `<database file>.journal`
+            batch_size: Number of queued orders that triggers a write
+            flush_interval: Longest time, in seconds, an order waits in the
+                journal before it is written to the database
+            id_block: Number of order IDs reserved at a time
+            cache_size: Number of customer IDs and order histories or
+                summaries to cache
+            cache_ttl: Seconds a cached order history or summary is used. Orders placed
+                through this instance invalidate it right away; the TTL bounds
+                how stale it gets when other processes place orders.
+        """
+        self.db = db
+        self.journal_dir = journal_dir or f"{db.db_path}.journal"
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._id_block = id_block
+        self._cache_size = cache_size
+        self._cache_ttl = cache_ttl
+
+        self._customers: OrderedDict[Tuple[str, str], int] = OrderedDict()
+        # (first name, last name, view) -> (time cached, text)
+        self._histories: OrderedDict[Tuple[str, str, Any], Tuple[float, str]] = OrderedDict()
+        self._ids: List[int] = []
+        self._refill: Optional[asyncio.Task] = None
+        # (order, future set once it is journaled), or a flush() waiter
+        self._queue: "asyncio.Queue[Union[Tuple[Dict[str, Any], asyncio.Future], asyncio.Future]]" = (
+            asyncio.Queue()
+        )
+        self._unwritten: Counter = Counter()  # customer ID -> queued orders
+        self._journal: Optional[OrderJournal] = None
+        self._writer: Optional[asyncio.Task] = None
+        self._starting: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Recover orders from dead processes' journals and start the writer."""
+        if self._writer is not None:
+            return
+        if self._starting is None:
+            self._starting = asyncio.create_task(self._start())
+        await asyncio.shield(self._starting)
+
+    async def _start(self) -> None:
+        os.makedirs(self.journal_dir, exist_ok=True)
+        path = os.path.join(self.journal_dir, f"orders-{os.getpid()}{JOURNAL_SUFFIX}")
+        # Open our own journal first so no other process tries to recover it
+        self._journal = await self.db.run(OrderJournal, path)
+        # Left behind by a dead process that had the same PID
+        leftover = await self.db.run(self._journal.entries)
+        if leftover:
+            await self.db.run(self.db.insert_orders, _order_rows(leftover))
+            await self.db.run(self._journal.clear)
+        await self.db.run(recover_journals, self.db, self.journal_dir, path)
+        self._writer = asyncio.create_task(self._write_loop())
+
+    async def flush(self) -> None:
+        """Wait until every queued order is written to the database."""
+        if self._writer is None:
+            return
+        done = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(done)
+        await done
+
+    async def close(self) -> None:
+        """Flush queued orders and stop the writer. The database stays open."""
+        if self._writer is None:
+            return
+        await self.flush()
+        self._writer.cancel()
+        self._writer = self._starting = None
+        self._journal.close()
+        self._journal = None
+
+    async def get_or_create_customer(self, first_name: str, last_name: str) -> int:
+        key = (first_name, last_name)
+        customer_id = self._customers.get(key)
+        if customer_id is None:
+            customer_id = await self.db.run(self.db.get_or_create_customer, first_name, last_name)
+        self._cache(self._customers, key, customer_id)
+        return customer_id
+
+    async def add_order(self, customer_id: int, order_details: Dict[str, Any]) -> int:
+        """
+        Queue an order for the writer and return its order ID once the order
+        is journaled, i.e. will survive a crash. The database write happens
+        later, in a batch.
+        """
+        await self.start()
+        order_id = await self._next_order_id()
+        journaled = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(({
+            "id": order_id,
+            "customer_id": customer_id,
+            # Copied so later changes by the caller don't alter the order
+            "details": json.loads(json.dumps(order_details)),
+            # The format of the order_date column's CURRENT_TIMESTAMP default
+            "date": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        }, journaled))
+        self._unwritten[customer_id] += 1
+        self._invalidate(customer_id)
+        await asyncio.shield(journaled)
+        return order_id
+
+    async def get_customer_orders(self, customer_id: int) -> List[Dict[str, Any]]:
+        if self._unwritten[customer_id]:
+            await self.flush()
+        return await self.db.run(self.db.get_customer_orders, customer_id)
+
+    async def get_customer_order_history(self, first_name: str, last_name: str) -> str:
+        return await self._history(
+            (first_name, last_name, None),
+            self.db.get_customer_order_history, first_name, last_name,
+        )
+
+    async def get_customer_order_summary(
+        self,
+        first_name: str,
+        last_name: str,
+        page: int = 1,
+        page_size: int = 5,
+        max_chars: int = 2000,
+    ) -> str:
+        """Totals and one page of recent orders; see CustomerDatabase.get_customer_order_summary."""
+        return await self._history(
+            (first_name, last_name, ("summary", page, page_size, max_chars)),
+            self.db.get_customer_order_summary, first_name, last_name, page, page_size, max_chars,
+        )
+
+    async def _history(self, key: Tuple[str, str, Any], func: Callable[..., str], *args: Any) -> str:
+        cached = self._histories.get(key)
+        if cached is not None and time.monotonic() - cached[0] < self._cache_ttl:
+            self._histories.move_to_end(key)
+            return cached[1]
+
+        # Only the customer's own queued orders matter, but a customer looked
+        # up elsewhere could have any of them
+        customer_id = self._customers.get(key[:2])
+        if self._unwritten[customer_id] if customer_id is not None else sum(self._unwritten.values()):
+            await self.flush()
+        text = await self.db.run(func, *args)
+        # Only cache text that add_order can invalidate
+        if key[:2] in self._customers:
+            self._cache(self._histories, key, (time.monotonic(), text))
+        return text
+
+    def _cache(self, cache: OrderedDict, key: Any, value: Any) -> None:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > self._cache_size:
+            cache.popitem(last=False)
+
+    def _invalidate(self, customer_id: int) -> None:
+        stale = [key for key in self._histories if self._customers.get(key[:2]) == customer_id]
+        for key in stale:
+            del self._histories[key]
+
+    async def _next_order_id(self) -> int:
+        while not self._ids:
+            if self._refill is None:
+                self._refill = asyncio.create_task(self._reserve_ids())
+            await asyncio.shield(self._refill)
+        # Reserve the next block before this one runs out
+        if len(self._ids) <= self._id_block // 2 and self._refill is None:
+            self._refill = asyncio.create_task(self._reserve_ids())
+        return self._ids.pop(0)
+
+    async def _reserve_ids(self) -> None:
+        try:
+            self._ids.extend(await self.db.run(self.db.reserve_order_ids, self._id_block))
+        finally:
+            self._refill = None
+
+    async def _write_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        pending: List[Dict[str, Any]] = []
+        waiters: List[asyncio.Future] = []
+        deadline: Optional[float] = None
+
+        while True:
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            try:
+                items = [await asyncio.wait_for(self._queue.get(), timeout)]
+            except asyncio.TimeoutError:
+                items = []
+            while not self._queue.empty():
+                items.append(self._queue.get_nowait())
+
+            orders = [item for item in items if isinstance(item, tuple)]
+            waiters.extend(item for item in items if isinstance(item, asyncio.Future))
+            if orders:
+                entries = [entry for entry, _ in orders]
+                try:
+                    await self.db.run(self._journal.append, entries)
+                except OSError:
+                    # Not protected against a crash: write them right away
+                    # and acknowledge them once they are in the database
+                    logger.exception("Failed to journal orders")
+                    waiters.extend(journaled for _, journaled in orders)
+                else:
+                    for _, journaled in orders:
+                        if not journaled.done():
+                            journaled.set_result(None)
+                pending.extend(entries)
+                if deadline is None:
+                    deadline = loop.time() + self._flush_interval
+
+            if pending and (waiters or len(pending) >= self._batch_size or loop.time() >= deadline):
+                try:
+                    await self.db.run(self.db.insert_orders, _order_rows(pending))
+                    await self.db.run(self._journal.clear)
+                except Exception as e:
+                    # Keep the orders and retry after the next interval
+                    logger.exception("Failed to write queued orders")
+                    deadline = loop.time() + self._flush_interval
+                    for waiter in waiters:
+                        if not waiter.done():
+                            waiter.set_exception(e)
+                    waiters.clear()
+                    continue
+                for entry in pending:
+                    self._unwritten[entry["customer_id"]] -= 1
+                    if not self._unwritten[entry["customer_id"]]:
+                        del self._unwritten[entry["customer_id"]]
+                pending.clear()
+                deadline = None
+
+            if not pending:
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_result(None)
+                waiters.clear()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Backfill the order_items table from orders stored before it existed.
+
+Orders written before the order_items migration keep their item lines in
+the order_details JSON; history lookups still read them from there, but
+more slowly. This script moves those lines into order_items in batches,
+each in its own transaction, so it can run against a live database and be
+stopped and resumed at any time.
+
+Usage:
+    python backfill_order_items.py
+    python backfill_order_items.py --db path/to/customer_data.db --batch-size 5000
+"""
+
+import argparse
+import logging
+import time
+
+from database import CustomerDatabase
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("backfill-order-items")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", help="Database path (defaults to customer_data.db)")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    db = CustomerDatabase(args.db)
+    start = time.perf_counter()
+    total = 0
+    try:
+        while True:
+            done = db.backfill_order_items(args.batch_size)
+            if not done:
+                break
+            total += done
+            logger.info(f"Backfilled {total} orders ({total / (time.perf_counter() - start):.0f}/s)")
+    finally:
+        db.close()
+
+    logger.info(f"Backfill complete: {total} orders in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
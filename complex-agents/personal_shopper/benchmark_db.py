@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for CustomerDatabase.
+
+Simulates many shopper sessions running at once on one event loop. Each
+session identifies a customer, reads their order history and places a few
+orders, as the personal shopper agents do. Three access patterns are compared:
+
+    legacy  a new sqlite3 connection per call, run directly on the event loop
+            (what the agents did before)
+    pooled  CustomerDatabase's persistent WAL connections, called through
+            `db.run` on its worker threads
+    queued  AsyncCustomerDatabase over the pooled database: orders are
+            journaled and written in batches by a background task
+
+For each one the script reports operations per second, p50/p99 call latency
+and the worst event-loop stall, which is how long every other session (and
+its audio) would have been blocked.
+
+Usage:
+    python benchmark_db.py
+    python benchmark_db.py --sessions 200 --orders 5 --pool-size 8
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+from async_database import AsyncCustomerDatabase
+from database import (
+    INSERT_CUSTOMER,
+    SELECT_CUSTOMER_ID,
+    SELECT_ORDERS,
+    CustomerDatabase,
+)
+
+ORDER = {
+    "items": [
+        {"name": "Wireless Earbuds", "quantity": 1, "price": 149.99},
+        {"name": "Phone Case (Black)", "quantity": 2, "price": 29.99},
+    ],
+    "total": 209.97,
+}
+
+
+class LegacyAccess:
+    """The previous access pattern: connect, query, commit and close per call."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    async def get_or_create_customer(self, first_name: str, last_name: str) -> int:
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(SELECT_CUSTOMER_ID, (first_name, last_name)).fetchone()
+        customer_id = row[0] if row else conn.execute(INSERT_CUSTOMER, (first_name, last_name)).lastrowid
+        conn.commit()
+        conn.close()
+        return customer_id
+
+    async def add_order(self, customer_id: int, order: dict) -> int:
+        conn = sqlite3.connect(self.db_path)
+        order_id = conn.execute(
+            "INSERT INTO orders (customer_id, order_details) VALUES (?, ?)",
+            (customer_id, json.dumps(order)),
+        ).lastrowid
+        conn.commit()
+        conn.close()
+        return order_id
+
+    async def get_customer_orders(self, customer_id: int) -> list:
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute(SELECT_ORDERS, (customer_id,)).fetchall()
+        conn.close()
+        return rows
+
+
+class PooledAccess:
+    def __init__(self, db: CustomerDatabase):
+        self.db = db
+
+    async def get_or_create_customer(self, first_name: str, last_name: str) -> int:
+        return await self.db.run(self.db.get_or_create_customer, first_name, last_name)
+
+    async def add_order(self, customer_id: int, order: dict) -> int:
+        return await self.db.run(self.db.add_order, customer_id, order)
+
+    async def get_customer_orders(self, customer_id: int) -> list:
+        return await self.db.run(self.db.get_customer_orders, customer_id)
+
+
+class QueuedAccess:
+    def __init__(self, db: AsyncCustomerDatabase):
+        self.db = db
+
+    async def get_or_create_customer(self, first_name: str, last_name: str) -> int:
+        return await self.db.get_or_create_customer(first_name, last_name)
+
+    async def add_order(self, customer_id: int, order: dict) -> int:
+        return await self.db.add_order(customer_id, order)
+
+    async def get_customer_orders(self, customer_id: int) -> list:
+        return await self.db.get_customer_orders(customer_id)
+
+
+async def session(access, n: int, orders: int, latencies: list) -> None:
+    async def timed(coro):
+        start = time.perf_counter()
+        result = await coro
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    customer_id = await timed(access.get_or_create_customer(f"Customer{n}", "Bench"))
+    await timed(access.get_customer_orders(customer_id))
+    for _ in range(orders):
+        await timed(access.add_order(customer_id, ORDER))
+        # The user talks between tool calls
+        await asyncio.sleep(0)
+    await timed(access.get_customer_orders(customer_id))
+
+
+async def measure_stalls(stop: asyncio.Event, stalls: list, interval: float = 0.005) -> None:
+    """Record how late a periodic timer fires; that delay is a loop stall."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - start - interval)
+
+
+async def run(name: str, access, sessions: int, orders: int) -> None:
+    latencies: list = []
+    stalls: list = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_stalls(stop, stalls))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(access, n, orders, latencies) for n in range(sessions)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    # Inclusive, so p99 stays within the measured range; quantiles() needs two samples
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    else:
+        quantiles = latencies * 99 if latencies else [0.0] * 99
+    print(
+        f"{name:<7} {len(latencies) / elapsed:9.0f} {quantiles[49] * 1000:9.2f} "
+        f"{quantiles[98] * 1000:9.2f} {max(stalls, default=0.0) * 1000:12.2f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--orders", type=int, default=3)
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    # The per-call INFO logs would dominate the timings
+    logging.getLogger("personal-shopper-db").setLevel(logging.WARNING)
+
+    print(f"{args.sessions} sessions, {args.orders} orders each")
+    print(f"{'access':<7} {'ops/sec':>9} {'p50 ms':>9} {'p99 ms':>9} {'max stall ms':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        db = CustomerDatabase(os.path.join(tmp, "legacy.db"))
+        db.close()
+        # The legacy database used SQLite's default rollback journal
+        conn = sqlite3.connect(db.db_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+        await run("legacy", LegacyAccess(db.db_path), args.sessions, args.orders)
+
+        db = CustomerDatabase(os.path.join(tmp, "pooled.db"), pool_size=args.pool_size)
+        try:
+            await run("pooled", PooledAccess(db), args.sessions, args.orders)
+        finally:
+            db.close()
+
+        db = CustomerDatabase(os.path.join(tmp, "queued.db"), pool_size=args.pool_size)
+        queued = AsyncCustomerDatabase(db)
+        try:
+            await queued.start()
+            await run("queued", QueuedAccess(queued), args.sessions, args.orders)
+        finally:
+            await queued.close()
+            db.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
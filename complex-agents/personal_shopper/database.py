@@ -1,164 +1,527 @@
+import asyncio
 import sqlite3
 import os
 import json
-from typing import List, Dict, Optional, Any
+import queue
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 import logging
 
 logger = logging.getLogger("personal-shopper-db")
 logger.setLevel(logging.INFO)
 
+T = TypeVar("T")
+
+# Statements are kept as constants so each pooled connection prepares them
+# once and reuses them from its statement cache
+SELECT_CUSTOMER_ID = "SELECT id FROM customers WHERE first_name = ? AND last_name = ?"
+INSERT_CUSTOMER = "INSERT INTO customers (first_name, last_name) VALUES (?, ?)"
+INSERT_ORDER = "INSERT INTO orders (id, customer_id, order_details, has_items) VALUES (?, ?, ?, ?)"
+# Replays of already written orders are ignored, so batches can be retried
+INSERT_ORDER_AT = (
+    "INSERT OR IGNORE INTO orders (id, customer_id, order_details, has_items, order_date) "
+    "VALUES (?, ?, ?, ?, ?)"
+)
+INSERT_ORDER_ITEM = (
+    "INSERT INTO order_items (order_id, position, name, quantity, price, extra) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SELECT_ORDERS = """
+SELECT o.id, o.order_details, o.order_date, o.has_items,
+       i.position, i.name, i.quantity, i.price, i.extra
+FROM orders o
+LEFT JOIN order_items i ON i.order_id = o.id AND o.has_items = 1
+WHERE o.customer_id = ?
+ORDER BY o.order_date DESC, o.id DESC, i.position
+"""
+# Customer lookup, orders and their lines in one statement. Order details are
+# only read for orders whose lines are not in order_items.
+SELECT_HISTORY = """
+SELECT o.id, o.order_date, o.has_items,
+       CASE WHEN o.has_items = 1 THEN NULL ELSE o.order_details END AS order_details,
+       i.position, i.name, i.quantity, i.price
+FROM customers c
+LEFT JOIN orders o ON o.customer_id = c.id
+LEFT JOIN order_items i ON i.order_id = o.id AND o.has_items = 1
+WHERE c.id = (SELECT id FROM customers WHERE first_name = ? AND last_name = ? LIMIT 1)
+ORDER BY o.order_date DESC, o.id DESC, i.position
+"""
+# One page of a customer's most recent orders, with their lines
+SELECT_ORDER_PAGE = """
+SELECT o.id, o.order_date, o.has_items,
+       CASE WHEN o.has_items = 1 THEN NULL ELSE o.order_details END AS order_details,
+       i.position, i.name, i.quantity, i.price
+FROM (
+    SELECT id, order_date, has_items, order_details FROM orders
+    WHERE customer_id = ?
+    ORDER BY order_date DESC, id DESC
+    LIMIT ? OFFSET ?
+) o
+LEFT JOIN order_items i ON i.order_id = o.id AND o.has_items = 1
+ORDER BY o.order_date DESC, o.id DESC, i.position
+"""
+# Order count, date range and amount spent. Orders whose lines are not in
+# order_items count with the total stored in their details.
+SELECT_ORDER_TOTALS = """
+SELECT COUNT(*) AS orders, MIN(o.order_date) AS first_order, MAX(o.order_date) AS last_order,
+       SUM(CASE WHEN o.has_items = 1
+                THEN (SELECT SUM(COALESCE(i.quantity, 1) * i.price) FROM order_items i WHERE i.order_id = o.id)
+                ELSE json_extract(o.order_details, '$.total') END) AS spent
+FROM orders o
+WHERE o.customer_id = ?
+"""
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+MIGRATIONS = [
+    # 1: indexes for the customer and order lookups, and order lines in their
+    # own table. has_items is 1 when an order's lines are in order_items, 0
+    # when its details have no item list, and NULL for orders written before
+    # this migration (see backfill_order_items.py).
+    """
+    CREATE INDEX IF NOT EXISTS idx_customers_name ON customers (first_name, last_name);
+    CREATE INDEX IF NOT EXISTS idx_orders_customer ON orders (customer_id, order_date);
+    ALTER TABLE orders ADD COLUMN has_items INTEGER;
+    CREATE TABLE IF NOT EXISTS order_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        position INTEGER NOT NULL,
+        name TEXT,
+        -- No declared type, so no affinity: quantities and prices read back
+        -- exactly as the order JSON had them (20.0 stays 20.0, "19.99" a string)
+        quantity,
+        price,
+        extra TEXT,
+        FOREIGN KEY (order_id) REFERENCES orders (id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items (order_id, position);
+    CREATE INDEX IF NOT EXISTS idx_orders_unmigrated ON orders (id) WHERE has_items IS NULL;
+    """,
+    # 2: order IDs are handed out from a sequence, so a writer can reserve a
+    # block of them and return IDs before the orders are written
+    """
+    CREATE TABLE IF NOT EXISTS sequences (
+        name TEXT PRIMARY KEY,
+        next_id INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO sequences (name, next_id)
+    SELECT 'orders', COALESCE(MAX(id), 0) + 1 FROM orders;
+    """,
+]
+
+ITEM_COLUMNS = ("name", "quantity", "price")
+
+
+def _statements(script: str) -> Iterator[str]:
+    """Split a migration script into its SQL statements."""
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ""
+    if statement.strip():
+        yield statement.strip()
+
+
+def split_order_items(
+    order_details: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+    """
+    Split an order into the details kept as JSON and its item list.
+
+    Returns the details unchanged and None when they have no item list.
+    """
+    items = order_details.get("items")
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return order_details, None
+    return {k: v for k, v in order_details.items() if k != "items"}, items
+
+
+def insert_order_items(conn: sqlite3.Connection, order_id: int, items: List[Dict[str, Any]]) -> None:
+    """Insert the lines of an order into order_items."""
+    rows = []
+    for position, item in enumerate(items):
+        extra = {k: v for k, v in item.items() if k not in ITEM_COLUMNS}
+        rows.append((
+            order_id,
+            position,
+            item.get("name"),
+            item.get("quantity"),
+            item.get("price"),
+            json.dumps(extra) if extra else None,
+        ))
+    conn.executemany(INSERT_ORDER_ITEM, rows)
+
+
+def _format_orders(rows: List[sqlite3.Row]) -> List[str]:
+    """Format order rows (SELECT_HISTORY columns) as one block per order."""
+    lines: List[str] = []
+    current_order = None
+    for row in rows:
+        if row['id'] != current_order:
+            if current_order is not None:
+                lines.append("")
+            current_order = row['id']
+            lines.append(f"Order #{row['id']} (Date: {row['order_date']}):")
+
+            if row['has_items'] != 1:
+                # Not in order_items: stored before the migration and not
+                # yet backfilled, or details without an item list
+                details = json.loads(row['order_details'])
+                if 'items' in details:
+                    for item in details['items']:
+                        lines.append(_format_item(item.get('name'), item.get('quantity', 1), item.get('price')))
+                else:
+                    lines.append(f"- {json.dumps(details)}")
+
+        if row['position'] is not None:
+            lines.append(_format_item(row['name'], row['quantity'], row['price']))
+    return lines
+
+
+def _format_item(name: Optional[str], quantity: Optional[int], price: Optional[float]) -> str:
+    line = f"- {quantity if quantity is not None else 1}x {name if name is not None else 'Unknown Item'}"
+    if price is not None:
+        line += f" (${price})"
+    return line
+
+
+class ConnectionPool:
+    """A fixed set of persistent SQLite connections shared across threads."""
+
+    def __init__(self, db_path: str, size: int = 4, busy_timeout_ms: int = 5000):
+        """
+        Args:
+            db_path: Path to the SQLite database file
+            size: Number of connections to keep open
+            busy_timeout_ms: How long a connection waits for a lock before failing
+        """
+        self.db_path = db_path
+        self.size = size
+        self._busy_timeout_ms = busy_timeout_ms
+        self._connections: List[sqlite3.Connection] = []
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(size):
+            conn = self._connect()
+            self._connections.append(conn)
+            self._idle.put(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self._busy_timeout_ms / 1000,
+            check_same_thread=False,  # Connections move between worker threads
+            cached_statements=128,
+        )
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        # WAL lets readers run alongside a writer; NORMAL sync is durable
+        # across application crashes, which is what WAL needs
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self._busy_timeout_ms)}")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection; commits on success and rolls back on error."""
+        conn = self._idle.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._idle.put(conn)
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+
+
 class CustomerDatabase:
-    def __init__(self, db_path: str = None):
-        """Initialize the customer database."""
+    def __init__(self, db_path: str = None, pool_size: int = 4):
+        """
+        Initialize the customer database.
+
+        Args:
+            db_path: Path to the SQLite database file
+            pool_size: Number of pooled connections, which is also the number
+                of threads that run calls made through `run`
+        """
         if db_path is None:
             # Use a default path in the same directory as this file
             script_dir = os.path.dirname(os.path.abspath(__file__))
             db_path = os.path.join(script_dir, 'customer_data.db')
-        
+
         self.db_path = db_path
+        self._pool = ConnectionPool(db_path, size=pool_size)
+        # One thread per connection, so calls never wait on the pool
+        self._executor = ThreadPoolExecutor(
+            max_workers=pool_size, thread_name_prefix="customer-db"
+        )
         self._initialize_db()
-    
+
     def _initialize_db(self):
         """Create the database and tables if they don't exist."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Create customers table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS customers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            first_name TEXT NOT NULL,
-            last_name TEXT NOT NULL,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        ''')
-        
-        # Create orders table
-        cursor.execute('''
-        CREATE TABLE IF NOT EXISTS orders (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            order_details TEXT NOT NULL,
-            order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (customer_id) REFERENCES customers (id)
-        )
-        ''')
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            # Create customers table
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS customers (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                first_name TEXT NOT NULL,
+                last_name TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            ''')
+
+            # Create orders table
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS orders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                customer_id INTEGER NOT NULL,
+                order_details TEXT NOT NULL,
+                order_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (customer_id) REFERENCES customers (id)
+            )
+            ''')
+
+            self._migrate(conn)
+
         logger.info(f"Database initialized at {self.db_path}")
-    
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Apply the schema migrations this database hasn't seen yet."""
+        conn.commit()
+        while True:
+            # Take the write lock before reading the version, so processes
+            # opening the database together apply each migration only once
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version >= len(MIGRATIONS):
+                    conn.commit()
+                    return
+                logger.info(f"Applying schema migration {version + 1}")
+                # Each migration and its version bump commit together
+                for statement in _statements(MIGRATIONS[version]):
+                    conn.execute(statement)
+                conn.execute(f"PRAGMA user_version = {version + 1}")
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run a blocking database method on the database's worker threads.
+
+        Example:
+            customer_id = await db.run(db.get_or_create_customer, "Jane", "Doe")
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args))
+
+    def close(self) -> None:
+        """Wait for pending calls, then close the pooled connections."""
+        self._executor.shutdown(wait=True)
+        self._pool.close()
+
     def get_or_create_customer(self, first_name: str, last_name: str) -> int:
         """Get a customer by name or create if not exists. Returns customer ID."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Check if customer exists
-        cursor.execute(
-            "SELECT id FROM customers WHERE first_name = ? AND last_name = ?", 
-            (first_name, last_name)
-        )
-        result = cursor.fetchone()
-        
-        if result:
-            customer_id = result[0]
-            logger.info(f"Found existing customer: {first_name} {last_name} (ID: {customer_id})")
-        else:
-            # Create new customer
-            cursor.execute(
-                "INSERT INTO customers (first_name, last_name) VALUES (?, ?)",
-                (first_name, last_name)
-            )
-            customer_id = cursor.lastrowid
-            logger.info(f"Created new customer: {first_name} {last_name} (ID: {customer_id})")
-        
-        conn.commit()
-        conn.close()
+        with self._pool.connection() as conn:
+            # Check if customer exists
+            result = conn.execute(SELECT_CUSTOMER_ID, (first_name, last_name)).fetchone()
+
+            if result:
+                customer_id = result[0]
+                logger.info(f"Found existing customer: {first_name} {last_name} (ID: {customer_id})")
+            else:
+                # Create new customer
+                customer_id = conn.execute(INSERT_CUSTOMER, (first_name, last_name)).lastrowid
+                logger.info(f"Created new customer: {first_name} {last_name} (ID: {customer_id})")
+
         return customer_id
-    
+
+    @staticmethod
+    def _reserve_order_ids(conn: sqlite3.Connection, count: int) -> int:
+        """Take `count` order IDs from the sequence; returns the first one."""
+        conn.execute("UPDATE sequences SET next_id = next_id + ? WHERE name = 'orders'", (count,))
+        next_id = conn.execute("SELECT next_id FROM sequences WHERE name = 'orders'").fetchone()[0]
+        return next_id - count
+
+    def reserve_order_ids(self, count: int) -> range:
+        """Reserve a block of order IDs for orders that will be written later."""
+        with self._pool.connection() as conn:
+            first = self._reserve_order_ids(conn, count)
+        return range(first, first + count)
+
     def add_order(self, customer_id: int, order_details: Dict[str, Any]) -> int:
         """Add a new order for a customer. Returns order ID."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Convert order details to JSON string
-        order_json = json.dumps(order_details)
-        
-        cursor.execute(
-            "INSERT INTO orders (customer_id, order_details) VALUES (?, ?)",
-            (customer_id, order_json)
-        )
-        
-        order_id = cursor.lastrowid
+        # Item lines go to order_items, the rest of the details stay JSON
+        details, items = split_order_items(order_details)
+        order_json = json.dumps(details)
+
+        with self._pool.connection() as conn:
+            order_id = self._reserve_order_ids(conn, 1)
+            conn.execute(
+                INSERT_ORDER, (order_id, customer_id, order_json, 1 if items is not None else 0)
+            )
+            if items:
+                insert_order_items(conn, order_id, items)
+
         logger.info(f"Added new order (ID: {order_id}) for customer ID: {customer_id}")
-        
-        conn.commit()
-        conn.close()
         return order_id
-    
+
+    def insert_orders(self, orders: List[Tuple[int, int, Dict[str, Any], str]]) -> int:
+        """
+        Write a batch of orders with reserved IDs in one transaction.
+
+        Args:
+            orders: (order ID, customer ID, order details, order date) tuples;
+                orders whose ID already exists are skipped
+
+        Returns the number of orders written.
+        """
+        written = 0
+        with self._pool.connection() as conn:
+            for order_id, customer_id, order_details, order_date in orders:
+                details, items = split_order_items(order_details)
+                inserted = conn.execute(
+                    INSERT_ORDER_AT,
+                    (order_id, customer_id, json.dumps(details), 1 if items is not None else 0, order_date),
+                ).rowcount
+                if inserted and items:
+                    insert_order_items(conn, order_id, items)
+                written += inserted
+
+        logger.info(f"Wrote {written} orders in one transaction")
+        return written
+
+    def backfill_order_items(self, batch_size: int = 1000) -> int:
+        """
+        Move the item lines of up to `batch_size` orders written before the
+        order_items migration into order_items. Returns the number of orders
+        processed; 0 once the backfill is complete.
+        """
+        with self._pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT id, order_details FROM orders WHERE has_items IS NULL ORDER BY id LIMIT ?",
+                (batch_size,),
+            ).fetchall()
+
+            for row in rows:
+                details, items = split_order_items(json.loads(row['order_details']))
+                if items:
+                    insert_order_items(conn, row['id'], items)
+                conn.execute(
+                    "UPDATE orders SET order_details = ?, has_items = ? WHERE id = ?",
+                    (json.dumps(details), 1 if items is not None else 0, row['id']),
+                )
+
+        return len(rows)
+
     def get_customer_orders(self, customer_id: int) -> List[Dict[str, Any]]:
         """Get all orders for a customer."""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # This enables column access by name
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "SELECT id, order_details, order_date FROM orders WHERE customer_id = ? ORDER BY order_date DESC",
-            (customer_id,)
-        )
-        
-        orders = []
-        for row in cursor.fetchall():
-            order_data = json.loads(row['order_details'])
-            orders.append({
-                'id': row['id'],
-                'date': row['order_date'],
-                'details': order_data
-            })
-        
-        conn.close()
+        with self._pool.connection() as conn:
+            rows = conn.execute(SELECT_ORDERS, (customer_id,)).fetchall()
+
+        orders: List[Dict[str, Any]] = []
+        for row in rows:
+            if not orders or orders[-1]['id'] != row['id']:
+                order_data = json.loads(row['order_details'])
+                if row['has_items'] == 1:
+                    order_data['items'] = []
+                orders.append({
+                    'id': row['id'],
+                    'date': row['order_date'],
+                    'details': order_data
+                })
+            if row['position'] is not None:
+                item = {k: row[k] for k in ITEM_COLUMNS if row[k] is not None}
+                if row['extra'] is not None:
+                    item.update(json.loads(row['extra']))
+                orders[-1]['details']['items'].append(item)
         return orders
-    
+
     def get_customer_order_history(self, first_name: str, last_name: str) -> str:
         """Get a formatted string of customer order history for LLM consumption."""
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Get customer ID
-        cursor.execute(
-            "SELECT id FROM customers WHERE first_name = ? AND last_name = ?", 
-            (first_name, last_name)
-        )
-        result = cursor.fetchone()
-        
-        if not result:
-            conn.close()
+        with self._pool.connection() as conn:
+            rows = conn.execute(SELECT_HISTORY, (first_name, last_name)).fetchall()
+
+        if not rows:
             return "No order history found for this customer."
-        
-        customer_id = result[0]
-        orders = self.get_customer_orders(customer_id)
-        
-        if not orders:
+        if rows[0]['id'] is None:
             return f"Customer {first_name} {last_name} has no previous orders."
-        
+
         # Format order history for LLM
-        history = f"Order history for {first_name} {last_name}:\n\n"
-        
-        for order in orders:
-            history += f"Order #{order['id']} (Date: {order['date']}):\n"
-            details = order['details']
-            
-            if 'items' in details:
-                for item in details['items']:
-                    history += f"- {item.get('quantity', 1)}x {item.get('name', 'Unknown Item')}"
-                    if 'price' in item:
-                        history += f" (${item['price']})"
-                    history += "\n"
-            else:
-                # Handle case where order details might be in a different format
-                history += f"- {json.dumps(details)}\n"
-            
-            history += "\n"
-        
-        conn.close()
-        return history 
\ No newline at end of file
+        lines = [f"Order history for {first_name} {last_name}:", ""]
+        lines.extend(_format_orders(rows))
+        lines.extend(["", ""])
+        return "\n".join(lines)
+
+    def get_customer_order_summary(
+        self,
+        first_name: str,
+        last_name: str,
+        page: int = 1,
+        page_size: int = 5,
+        max_chars: int = 2000,
+    ) -> str:
+        """
+        Get a size-bounded summary of a customer's orders for LLM consumption:
+        totals over all orders, then one page of orders, most recent first.
+
+        Args:
+            first_name: The customer's first name
+            last_name: The customer's last name
+            page: Page of orders to include, starting at 1
+            page_size: Number of orders per page
+            max_chars: Upper bound on the length of the summary; orders that
+                don't fit are left out and the summary says so
+        """
+        page = max(page, 1)
+        with self._pool.connection() as conn:
+            customer = conn.execute(SELECT_CUSTOMER_ID, (first_name, last_name)).fetchone()
+            if customer is None:
+                return "No order history found for this customer."
+            totals = conn.execute(SELECT_ORDER_TOTALS, (customer[0],)).fetchone()
+            if not totals['orders']:
+                return f"Customer {first_name} {last_name} has no previous orders."
+            rows = conn.execute(
+                SELECT_ORDER_PAGE, (customer[0], page_size, (page - 1) * page_size)
+            ).fetchall()
+
+        header = [f"Order summary for {first_name} {last_name}:"]
+        overview = f"{totals['orders']} orders between {totals['first_order']} and {totals['last_order']}"
+        if totals['spent'] is not None:
+            overview += f", ${totals['spent']:.2f} spent in total"
+        header.extend([overview, ""])
+
+        first = (page - 1) * page_size + 1
+        if not rows:
+            return "\n".join(header + [f"There are no orders on page {page}."])
+
+        # Whole orders only, until the next one would break the size bound
+        blocks = "\n".join(_format_orders(rows)).split("\n\n")
+        shown: List[str] = []
+        length = sum(len(line) + 1 for line in header) + 120  # room for the footer
+        for block in blocks:
+            if shown and length + len(block) + 2 > max_chars:
+                break
+            shown.append(block)
+            length += len(block) + 2
+
+        last = first + len(shown) - 1
+        lines = header + [f"Orders {first}-{last} of {totals['orders']}, most recent first:", ""]
+        lines.append("\n\n".join(shown))
+        if len(shown) < len(blocks):
+            lines.extend(["", f"Orders {last + 1}-{first + len(blocks) - 1} were left out to keep this short."])
+        if first + len(blocks) - 1 < totals['orders']:
+            lines.extend(["", f"Ask for page {page + 1} to see older orders."])
+        return "\n".join(lines)
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Bulk test data for the personal shopper database.
+
+Creates customers and orders (with their lines in order_items) from a seed,
+so the same arguments always produce the same database. Rows are written
+with executemany in large transactions, which is what makes millions of
+rows practical; add_test_orders.py adds a handful of hand-written orders one
+at a time.
+
+Data is appended to an existing database, with IDs after the ones already
+in it. Generation turns off SQLite's fsyncs, so if it is interrupted, delete
+the file and run it again.
+
+Usage:
+    python generate_test_data.py --db /tmp/load.db --customers 1000000 --orders-per-customer 5
+    python generate_test_data.py --db /tmp/load.db --customers 1000 --seed 7
+"""
+
+import argparse
+import json
+import logging
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+from database import INSERT_ORDER_ITEM, CustomerDatabase
+
+logger = logging.getLogger("generate-test-data")
+
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda",
+    "David", "Elizabeth", "William", "Barbara", "Richard", "Susan", "Joseph", "Jessica",
+    "Thomas", "Sarah", "Charles", "Karen", "Wei", "Aiko", "Mateo", "Priya",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis",
+    "Rodriguez", "Martinez", "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson",
+    "Thomas", "Taylor", "Moore", "Jackson", "Martin", "Chen", "Tanaka", "Silva", "Patel",
+]
+PRODUCTS = [
+    ("Smartphone XS Pro", 999.99),
+    ("Wireless Earbuds", 149.99),
+    ("Phone Case (Black)", 29.99),
+    ("Laptop Stand", 49.99),
+    ("USB-C Hub", 39.99),
+    ("Mechanical Keyboard", 129.99),
+    ("Running Shoes", 89.99),
+    ("Yoga Mat", 24.99),
+    ("Water Bottle", 19.99),
+    ("Coffee Grinder", 59.99),
+    ("Desk Lamp", 34.99),
+    ("Backpack", 79.99),
+]
+
+INSERT_GENERATED_CUSTOMER = "INSERT INTO customers (first_name, last_name, created_at) VALUES (?, ?, ?)"
+INSERT_GENERATED_ORDER = (
+    "INSERT INTO orders (id, customer_id, order_details, order_date, has_items) VALUES (?, ?, ?, ?, 1)"
+)
+
+
+def customer_name(n: int) -> tuple:
+    """Name of the n-th generated customer; unique for every n."""
+    first = FIRST_NAMES[n % len(FIRST_NAMES)]
+    n //= len(FIRST_NAMES)
+    last = LAST_NAMES[n % len(LAST_NAMES)]
+    n //= len(LAST_NAMES)
+    return first, f"{last}-{n}" if n else last
+
+
+def generate(
+    db_path: str,
+    customers: int,
+    orders_per_customer: float,
+    seed: int = 0,
+    days: int = 730,
+    batch_size: int = 100_000,
+) -> None:
+    """
+    Append generated customers and orders to a database.
+
+    Args:
+        db_path: Database file; created with the current schema if missing
+        customers: Number of customers to add
+        orders_per_customer: Mean number of orders per customer; each
+            order goes to a uniformly chosen customer
+        seed: Seed for every random choice
+        days: Customers and orders are dated within this many days before
+            2025-01-01
+        batch_size: Rows per executemany call and per transaction
+    """
+    # Creates the tables and applies the migrations
+    CustomerDatabase(db_path, pool_size=1).close()
+
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA cache_size=-262144")  # 256MB
+
+    first_customer = conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM customers").fetchone()[0]
+    first_order = conn.execute("SELECT next_id FROM sequences WHERE name = 'orders'").fetchone()[0]
+    epoch = datetime(2025, 1, 1)
+    start = time.perf_counter()
+
+    def random_date() -> str:
+        return (epoch - timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+    for offset in range(0, customers, batch_size):
+        count = min(batch_size, customers - offset)
+        conn.execute("BEGIN")
+        conn.executemany(
+            INSERT_GENERATED_CUSTOMER,
+            (customer_name(first_customer + offset + n - 1) + (random_date(),) for n in range(count)),
+        )
+        conn.execute("COMMIT")
+    logger.info(f"Added {customers} customers in {time.perf_counter() - start:.1f}s")
+
+    total_orders = int(customers * orders_per_customer)
+    start = time.perf_counter()
+    for offset in range(0, total_orders, batch_size):
+        orders, items = [], []
+        for order_id in range(first_order + offset, first_order + min(offset + batch_size, total_orders)):
+            lines = rng.sample(PRODUCTS, rng.randint(1, 4))
+            quantities = [rng.randint(1, 3) for _ in lines]
+            total = round(sum(price * q for (_, price), q in zip(lines, quantities)), 2)
+            orders.append((
+                order_id,
+                first_customer + rng.randrange(customers),
+                json.dumps({"total": total}),
+                random_date(),
+            ))
+            for position, ((name, price), quantity) in enumerate(zip(lines, quantities)):
+                items.append((order_id, position, name, quantity, price, None))
+
+        conn.execute("BEGIN")
+        conn.executemany(INSERT_GENERATED_ORDER, orders)
+        conn.executemany(INSERT_ORDER_ITEM, items)
+        conn.execute("COMMIT")
+        logger.info(f"Added {offset + len(orders)}/{total_orders} orders")
+
+    conn.execute(
+        "UPDATE sequences SET next_id = ? WHERE name = 'orders'", (first_order + total_orders,)
+    )
+    conn.execute("ANALYZE")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    logger.info(f"Added {total_orders} orders in {time.perf_counter() - start:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", required=True, help="Database file to create or extend")
+    parser.add_argument("--customers", type=int, default=100_000)
+    parser.add_argument("--orders-per-customer", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--days", type=int, default=730)
+    parser.add_argument("--batch-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(message)s")
+    logging.getLogger("personal-shopper-db").setLevel(logging.WARNING)
+    generate(args.db, args.customers, args.orders_per_customer, args.seed, args.days, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
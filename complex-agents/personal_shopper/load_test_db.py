@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Load harness for the personal shopper database.
+
+Runs a mix of get_or_create_customer, add_order and order-history calls from
+many concurrent workers against a database, usually one filled with
+generate_test_data.py, and reports throughput and latency per operation.
+Workers pick customers from a sample of the existing ones, and a share of
+lookups use new names so customers are created too.
+
+    pooled  CustomerDatabase, called through `db.run`
+    queued  AsyncCustomerDatabase with its write-behind order queue. History
+            reads of a customer it hasn't looked up wait for every queued
+            order to be written, so raise the lookup share to model sessions
+            that identify the customer first.
+
+Usage:
+    python generate_test_data.py --db /tmp/load.db --customers 1000000
+    python load_test_db.py --db /tmp/load.db --workers 50 --duration 30
+    python load_test_db.py --db /tmp/load.db --mix lookup=50,order=30,history=10,summary=10 --mode queued
+"""
+
+import argparse
+import asyncio
+import logging
+import random
+import sqlite3
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from async_database import AsyncCustomerDatabase
+from benchmark_db import measure_stalls
+from database import CustomerDatabase
+from generate_test_data import PRODUCTS
+
+OPERATIONS = ("lookup", "order", "history", "summary")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}, expected one of {OPERATIONS}")
+        weights[name] = float(weight)
+    return weights
+
+
+def sample_customers(db_path: str, count: int, rng: random.Random) -> List[Tuple[int, str, str]]:
+    """Pick up to `count` existing customers."""
+    conn = sqlite3.connect(db_path)
+    max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM customers").fetchone()[0]
+    ids = rng.sample(range(1, max_id + 1), min(count, max_id))
+    rows = []
+    for start in range(0, len(ids), 500):
+        chunk = ids[start : start + 500]
+        rows += conn.execute(
+            f"SELECT id, first_name, last_name FROM customers WHERE id IN ({','.join('?' * len(chunk))})",
+            chunk,
+        ).fetchall()
+    conn.close()
+    return rows
+
+
+class PooledAccess:
+    def __init__(self, db: CustomerDatabase):
+        self.db = db
+
+    async def lookup(self, first_name: str, last_name: str) -> int:
+        return await self.db.run(self.db.get_or_create_customer, first_name, last_name)
+
+    async def order(self, customer_id: int, order: dict) -> int:
+        return await self.db.run(self.db.add_order, customer_id, order)
+
+    async def history(self, first_name: str, last_name: str) -> str:
+        return await self.db.run(self.db.get_customer_order_history, first_name, last_name)
+
+    async def summary(self, first_name: str, last_name: str) -> str:
+        return await self.db.run(self.db.get_customer_order_summary, first_name, last_name)
+
+
+class QueuedAccess:
+    def __init__(self, db: AsyncCustomerDatabase):
+        self.db = db
+
+    async def lookup(self, first_name: str, last_name: str) -> int:
+        return await self.db.get_or_create_customer(first_name, last_name)
+
+    async def order(self, customer_id: int, order: dict) -> int:
+        return await self.db.add_order(customer_id, order)
+
+    async def history(self, first_name: str, last_name: str) -> str:
+        return await self.db.get_customer_order_history(first_name, last_name)
+
+    async def summary(self, first_name: str, last_name: str) -> str:
+        return await self.db.get_customer_order_summary(first_name, last_name)
+
+
+async def worker(
+    n: int,
+    access,
+    customers: List[Tuple[int, str, str]],
+    weights: Dict[str, float],
+    new_customers: float,
+    seed: int,
+    deadline: float,
+    latencies: Dict[str, List[float]],
+) -> None:
+    rng = random.Random(seed * 1_000_003 + n)
+    names, cumulative = list(weights), list(weights.values())
+    created = 0
+    while time.perf_counter() < deadline:
+        operation = rng.choices(names, cumulative)[0]
+        customer_id, first_name, last_name = rng.choice(customers)
+        start = time.perf_counter()
+        if operation == "lookup":
+            if rng.random() < new_customers:
+                created += 1
+                first_name, last_name = f"Load{n}", f"Customer-{seed}-{created}"
+            await access.lookup(first_name, last_name)
+        elif operation == "order":
+            lines = rng.sample(PRODUCTS, rng.randint(1, 4))
+            order = {
+                "items": [{"name": name, "quantity": 1, "price": price} for name, price in lines],
+                "total": round(sum(price for _, price in lines), 2),
+            }
+            await access.order(customer_id, order)
+        else:
+            await getattr(access, operation)(first_name, last_name)
+        latencies[operation].append(time.perf_counter() - start)
+
+
+async def run(args) -> None:
+    rng = random.Random(args.seed)
+    weights = parse_mix(args.mix)
+    customers = sample_customers(args.db, args.sample, rng)
+    if not customers:
+        raise SystemExit(f"{args.db} has no customers; fill it with generate_test_data.py first")
+
+    db = CustomerDatabase(args.db, pool_size=args.pool_size)
+    queued = AsyncCustomerDatabase(db) if args.mode == "queued" else None
+    access = QueuedAccess(queued) if queued else PooledAccess(db)
+    if queued:
+        await queued.start()
+
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    stalls: List[float] = []
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(measure_stalls(stop, stalls))
+
+    start = time.perf_counter()
+    deadline = start + args.duration
+    try:
+        await asyncio.gather(*(
+            worker(n, access, customers, weights, args.new_customers, args.seed, deadline, latencies)
+            for n in range(args.workers)
+        ))
+        if queued:
+            await queued.flush()
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await monitor
+        if queued:
+            await queued.close()
+        db.close()
+
+    total = sum(len(v) for v in latencies.values())
+    print(f"{args.mode}, {args.workers} workers, {elapsed:.1f}s, {len(customers)} sampled customers")
+    print(f"{'operation':<9} {'ops':>8} {'ops/sec':>9} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for operation in OPERATIONS:
+        values = latencies.get(operation)
+        if not values:
+            continue
+        q = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else values * 99
+        print(
+            f"{operation:<9} {len(values):8d} {len(values) / elapsed:9.0f} {q[49] * 1000:8.2f} "
+            f"{q[89] * 1000:8.2f} {q[98] * 1000:8.2f} {max(values) * 1000:8.2f}"
+        )
+    print(f"{'total':<9} {total:8d} {total / elapsed:9.0f}")
+    print(f"max event loop stall: {max(stalls, default=0.0) * 1000:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--db", required=True)
+    parser.add_argument("--mode", choices=["pooled", "queued"], default="pooled")
+    parser.add_argument("--workers", type=int, default=50, help="Concurrent sessions")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument(
+        "--mix", default="lookup=40,order=20,history=20,summary=20",
+        help="Relative weights of the operations",
+    )
+    parser.add_argument(
+        "--new-customers", type=float, default=0.05,
+        help="Share of lookups that create a customer",
+    )
+    parser.add_argument("--sample", type=int, default=10_000, help="Existing customers to pick from")
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # The per-call INFO logs would dominate the timings
+    logging.getLogger("personal-shopper-db").setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,16 @@ from livekit.plugins import noise_cancellation
 
 from utils import load_prompt
 from database import CustomerDatabase
+from async_database import AsyncCustomerDatabase
 
 logger = logging.getLogger("personal-shopper")
 logger.setLevel(logging.INFO)
 
 load_dotenv()
 
-# Initialize the customer database
-db = CustomerDatabase()
+# Initialize the customer database. Orders are queued and written in the
+# background, so placing one doesn't wait on the disk inside a voice turn.
+db = AsyncCustomerDatabase(CustomerDatabase())
 
 @dataclass
 class UserData:
@@ -145,7 +147,7 @@ class TriageAgent(BaseAgent):
         userdata: UserData = self.session.userdata
         userdata.first_name = first_name
         userdata.last_name = last_name
-        userdata.customer_id = db.get_or_create_customer(first_name, last_name)
+        userdata.customer_id = await db.get_or_create_customer(first_name, last_name)
 
         return f"Thank you, {first_name}. I've found your account."
 
@@ -196,7 +198,7 @@ class SalesAgent(BaseAgent):
         userdata: UserData = self.session.userdata
         userdata.first_name = first_name
         userdata.last_name = last_name
-        userdata.customer_id = db.get_or_create_customer(first_name, last_name)
+        userdata.customer_id = await db.get_or_create_customer(first_name, last_name)
 
         return f"Thank you, {first_name}. I've found your account."
 
@@ -255,7 +257,7 @@ class SalesAgent(BaseAgent):
         userdata.current_order["total"] = total
 
         # Save order to database
-        order_id = db.add_order(userdata.customer_id, userdata.current_order)
+        order_id = await db.add_order(userdata.customer_id, userdata.current_order)
 
         # Create a summary of the order
         summary = f"Order #{order_id} has been completed. Total: ${total:.2f}\n"
@@ -315,18 +317,24 @@ class ReturnsAgent(BaseAgent):
         userdata: UserData = self.session.userdata
         userdata.first_name = first_name
         userdata.last_name = last_name
-        userdata.customer_id = db.get_or_create_customer(first_name, last_name)
+        userdata.customer_id = await db.get_or_create_customer(first_name, last_name)
 
         return f"Thank you, {first_name}. I've found your account."
 
     @function_tool
-    async def get_order_history(self):
-        """Get the order history for the current customer."""
+    async def get_order_history(self, page: int = 1):
+        """
+        Get the order history for the current customer: their order totals and
+        their most recent orders, a page at a time.
+
+        Args:
+            page: Page of orders to show, starting at 1 for the most recent
+        """
         userdata: UserData = self.session.userdata
         if not userdata.is_identified():
             return "Please identify the customer first using the identify_customer function."
 
-        order_history = db.get_customer_order_history(userdata.first_name, userdata.last_name)
+        order_history = await db.get_customer_order_summary(userdata.first_name, userdata.last_name, page)
         return order_history
 
     @function_tool
@@ -375,6 +383,11 @@ class ReturnsAgent(BaseAgent):
 async def entrypoint(ctx: JobContext):
     await ctx.connect()
 
+    # Recover orders left by a crashed worker, and make sure this session's
+    # orders are in the database before the job exits
+    await db.start()
+    ctx.add_shutdown_callback(db.flush)
+
     # Initialize user data with context
     userdata = UserData(ctx=ctx)
 
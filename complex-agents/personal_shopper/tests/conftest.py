@@ -0,0 +1,18 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests import the example's modules (`database`, `async_database`, ...)
+# the way its scripts do, from the example directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from database import CustomerDatabase  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    """A fresh database in a temporary directory."""
+    db = CustomerDatabase(str(tmp_path / "customer_data.db"))
+    yield db
+    db.close()
@@ -0,0 +1,89 @@
+import asyncio
+import os
+
+from async_database import JOURNAL_SUFFIX, AsyncCustomerDatabase, OrderJournal
+
+
+def test_add_order_returns_once_the_order_is_journaled(db):
+    async def place_orders():
+        # A long flush interval keeps the orders out of the database
+        async_db = AsyncCustomerDatabase(db, flush_interval=60)
+        customer_id = await async_db.get_or_create_customer("Jane", "Doe")
+        order_ids = await asyncio.gather(*(
+            async_db.add_order(customer_id, {"items": [{"name": f"Item {i}", "price": 1.5}]})
+            for i in range(3)
+        ))
+        journaled = [entry["id"] for entry in async_db._journal.entries()]
+        in_database = db.get_customer_orders(customer_id)
+        await async_db.close()
+        return order_ids, journaled, in_database, customer_id
+
+    order_ids, journaled, in_database, customer_id = asyncio.run(place_orders())
+
+    assert sorted(journaled) == sorted(order_ids)
+    assert in_database == []
+    assert sorted(order["id"] for order in db.get_customer_orders(customer_id)) == sorted(order_ids)
+
+
+def test_order_invalidates_the_cached_summary(db, monkeypatch):
+    calls = []
+    get_summary = db.get_customer_order_summary
+
+    def counting_summary(*args):
+        calls.append(args)
+        return get_summary(*args)
+
+    monkeypatch.setattr(db, "get_customer_order_summary", counting_summary)
+
+    async def scenario():
+        async_db = AsyncCustomerDatabase(db)
+        customer_id = await async_db.get_or_create_customer("Jane", "Doe")
+        await async_db.add_order(customer_id, {"items": [{"name": "Lamp", "price": 20.0}]})
+        first = await async_db.get_customer_order_summary("Jane", "Doe")
+        cached = await async_db.get_customer_order_summary("Jane", "Doe")
+        await async_db.add_order(customer_id, {"items": [{"name": "Rug", "price": 80.0}]})
+        updated = await async_db.get_customer_order_summary("Jane", "Doe")
+        await async_db.close()
+        return first, cached, updated
+
+    first, cached, updated = asyncio.run(scenario())
+
+    assert cached == first
+    assert "1 orders between" in first and "$20.00 spent" in first
+    assert "2 orders between" in updated and "$100.00 spent" in updated
+    assert "Rug" in updated
+    assert len(calls) == 2
+
+
+def test_journal_is_replayed_after_a_crash(db):
+    journal_dir = f"{db.db_path}.journal"
+    os.makedirs(journal_dir)
+    customer_id = db.get_or_create_customer("Jane", "Doe")
+    first, second, third = db.reserve_order_ids(3)
+    entries = [
+        {"id": order_id, "customer_id": customer_id, "date": "2025-01-01 12:00:00",
+         "details": {"items": [{"name": f"Item {order_id}", "quantity": 1, "price": 5.0}]}}
+        for order_id in (first, second, third)
+    ]
+    # The first order made it to the database before the crash
+    db.insert_orders([(first, customer_id, entries[0]["details"], entries[0]["date"])])
+
+    # A process that journaled the orders and died: its lock is released,
+    # the journal is left behind, and its last write was torn
+    journal = OrderJournal(os.path.join(journal_dir, f"orders-999999{JOURNAL_SUFFIX}"))
+    journal.append(entries)
+    journal._file.write(b'{"id": 12, "customer')
+    journal._file.close()
+
+    async def restart():
+        async_db = AsyncCustomerDatabase(db)
+        await async_db.start()
+        orders = await async_db.get_customer_orders(customer_id)
+        await async_db.close()
+        return orders
+
+    orders = asyncio.run(restart())
+
+    assert sorted(order["id"] for order in orders) == [first, second, third]
+    assert orders[0]["details"]["items"] == [{"name": f"Item {third}", "quantity": 1, "price": 5.0}]
+    assert os.listdir(journal_dir) == []
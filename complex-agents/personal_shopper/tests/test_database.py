@@ -0,0 +1,100 @@
+import re
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from database import MIGRATIONS, CustomerDatabase
+
+BASELINE_DB = Path(__file__).resolve().parents[1] / "customer_data.db"
+
+
+def order(*prices: float) -> dict:
+    return {"items": [{"name": f"Item {i}", "quantity": 1, "price": price} for i, price in enumerate(prices)]}
+
+
+def order_ids(text: str) -> list:
+    return [int(i) for i in re.findall(r"Order #(\d+)", text)]
+
+
+@pytest.fixture
+def customer(db):
+    customer_id = db.get_or_create_customer("Jane", "Doe")
+    # Placed within the same second, so only the ID orders them
+    ids = [db.add_order(customer_id, order(10.0, 2.5 * i)) for i in range(8)]
+    return customer_id, ids
+
+
+def test_summary_is_bounded_to_one_page_with_totals(db, customer):
+    _, ids = customer
+    summary = db.get_customer_order_summary("Jane", "Doe", page=1, page_size=3)
+
+    assert "8 orders between" in summary
+    assert f"${8 * 10.0 + 2.5 * sum(range(8)):.2f} spent in total" in summary
+    assert "Orders 1-3 of 8, most recent first:" in summary
+    assert order_ids(summary) == ids[::-1][:3]
+    assert "Ask for page 2 to see older orders." in summary
+
+
+def test_summary_pages_follow_the_history_order(db, customer):
+    _, ids = customer
+    history = db.get_customer_order_history("Jane", "Doe")
+    pages = [db.get_customer_order_summary("Jane", "Doe", page=p, page_size=3) for p in (1, 2, 3)]
+
+    assert order_ids(history) == ids[::-1]
+    assert [i for page in pages for i in order_ids(page)] == order_ids(history)
+    assert "Ask for page" not in pages[2]
+
+
+def test_summary_respects_max_chars(db, customer):
+    summary = db.get_customer_order_summary("Jane", "Doe", page_size=8, max_chars=400)
+
+    assert len(summary) <= 400
+    assert 0 < len(order_ids(summary)) < 8
+    assert "were left out to keep this short." in summary
+
+
+def test_unknown_customer_and_empty_history(db):
+    db.get_or_create_customer("John", "Roe")
+
+    assert db.get_customer_order_summary("Nobody", "Here") == "No order history found for this customer."
+    assert db.get_customer_order_summary("John", "Roe") == "Customer John Roe has no previous orders."
+
+
+def test_migrates_the_baseline_database(tmp_path):
+    path = tmp_path / "customer_data.db"
+    shutil.copy(BASELINE_DB, path)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+        baseline_orders = conn.execute("SELECT COUNT(*), MAX(id) FROM orders").fetchone()
+
+    db = CustomerDatabase(str(path))
+    try:
+        before_backfill = db.get_customer_order_history("Shayne", "Parlo")
+        while db.backfill_order_items():
+            pass
+        after_backfill = db.get_customer_order_history("Shayne", "Parlo")
+        customer_id = db.get_or_create_customer("Shayne", "Parlo")
+        new_order = db.add_order(customer_id, order(5.0))
+    finally:
+        db.close()
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+        assert conn.execute("SELECT COUNT(*) FROM orders WHERE has_items IS NULL").fetchone()[0] == 0
+    assert after_backfill == before_backfill
+    # The baseline orders share a timestamp: newest ID first
+    assert order_ids(before_backfill) == list(range(baseline_orders[1], 0, -1))
+    assert "- 2x Men's Casual Shirt (Blue) ($39.99)" in before_backfill
+    assert new_order == baseline_orders[1] + 1
+
+
+def test_reopening_does_not_migrate_again(tmp_path):
+    path = str(tmp_path / "customer_data.db")
+    CustomerDatabase(path).close()
+    db = CustomerDatabase(path)
+    db.close()
+
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
@@ -0,0 +1,170 @@
+"""
+Streaming latency aggregates for the metrics server.
+
+Each value is added to a LogHistogram: counts of values in logarithmic
+buckets, so any quantile can be read back to within a fixed relative error
+and two histograms merge by adding their counts. WindowedAggregates keeps one
+histogram per (metric type, label, field) in each fixed time slot and merges
+the slots inside the requested window when a summary is asked for. Memory
+and the size of a summary depend on the number of slots, labels and fields,
+not on how many events were received.
+"""
+
+import math
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+# Fields summarized for each metric, where present
+SUMMARY_FIELDS = ["ttft", "ttfb", "duration", "end_of_utterance_delay", "tokens_per_second"]
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p99": 0.99}
+# Summaries group events without a label under this one
+DEFAULT_LABEL = "default"
+
+
+class LogHistogram:
+    def __init__(self, relative_accuracy: float = 0.01):
+        """
+        Args:
+            relative_accuracy: Largest relative error of a reported quantile
+        """
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.buckets: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float) -> None:
+        """Add a value; negative and non-finite values are ignored."""
+        if not math.isfinite(value) or value < 0:
+            return
+        if value == 0:
+            self.zeros += 1
+        else:
+            key = self.bucket_key(value)
+            self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def bucket_key(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    @property
+    def log_gamma(self) -> float:
+        return self._log_gamma
+
+    def add_bucket(self, key: Optional[int], count: int, total: float, low: float, high: float) -> None:
+        """
+        Add `count` values already counted into bucket `key` (None for
+        zeros) elsewhere, e.g. by a database query, with their sum, min and max.
+        """
+        if key is None:
+            self.zeros += count
+        else:
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += count
+        self.sum += total
+        self.min = min(self.min, low)
+        self.max = max(self.max, high)
+
+    def merge(self, other: "LogHistogram") -> None:
+        """Add the counts of a histogram with the same relative accuracy."""
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        key = max(self.buckets)
+        for candidate in sorted(self.buckets):
+            seen += self.buckets[candidate]
+            if rank < seen:
+                key = candidate
+                break
+        # Midpoint of the bucket (gamma^(key-1), gamma^key], kept within the
+        # values actually seen
+        return min(max(2 * self._gamma**key / (self._gamma + 1), self.min), self.max)
+
+    def summary(self) -> dict:
+        result = {"count": self.count, "mean": self.mean}
+        for name, q in QUANTILES.items():
+            result[name] = self.quantile(q)
+        return result
+
+
+Key = Tuple[str, str, str]  # metric type, label, field
+
+
+class WindowedAggregates:
+    def __init__(self, slot_seconds: int = 10, horizon: int = 3600, relative_accuracy: float = 0.01):
+        """
+        Args:
+            slot_seconds: Width of a time slot; windows are rounded to whole slots
+            horizon: Longest window that can be summarized, in seconds
+            relative_accuracy: Relative error of the reported quantiles
+        """
+        self.slot_seconds = slot_seconds
+        self.horizon = horizon
+        self._relative_accuracy = relative_accuracy
+        self._slots: Deque[Tuple[int, Dict[Key, LogHistogram]]] = deque()
+
+    def add(self, metric_type: str, data: dict, now: float) -> None:
+        """Add the summarized fields of one event received at `now`."""
+        label = data.get("label") or DEFAULT_LABEL
+        slot = int(now // self.slot_seconds)
+        if self._slots and slot < self._slots[-1][0]:
+            # Slots must stay in time order for `merged`; count a late event
+            # (e.g. after the clock stepped back) in the newest slot
+            slot = self._slots[-1][0]
+        if not self._slots or self._slots[-1][0] != slot:
+            self._slots.append((slot, {}))
+            oldest = slot - math.ceil(self.horizon / self.slot_seconds)
+            while self._slots[0][0] <= oldest:
+                self._slots.popleft()
+
+        histograms = self._slots[-1][1]
+        for field in SUMMARY_FIELDS:
+            value = data.get(field)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                key = (metric_type, label, field)
+                if key not in histograms:
+                    histograms[key] = LogHistogram(self._relative_accuracy)
+                histograms[key].add(value)
+
+    def merged(self, window: float, now: float) -> Dict[Key, LogHistogram]:
+        """One histogram per (type, label, field) over the last `window` seconds."""
+        first = int(now // self.slot_seconds) - math.ceil(min(window, self.horizon) / self.slot_seconds) + 1
+        merged: Dict[Key, LogHistogram] = {}
+        for slot, histograms in reversed(self._slots):
+            if slot < first:
+                break
+            for key, histogram in histograms.items():
+                if key not in merged:
+                    merged[key] = LogHistogram(self._relative_accuracy)
+                merged[key].merge(histogram)
+        return merged
+
+    def summary(self, window: float, now: float) -> dict:
+        """Count, mean and quantiles as {type: {label: {field: {...}}}}."""
+        result: dict = {}
+        for (metric_type, label, field), histogram in sorted(self.merged(window, now).items()):
+            result.setdefault(metric_type, {}).setdefault(label, {})[field] = histogram.summary()
+        return result
@@ -1,17 +1,102 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
+import atexit
 import json
 import os
+import threading
+import time
+from itertools import islice
 from datetime import datetime
-from collections import defaultdict
+from collections import deque
 from pathlib import Path
 
+from aggregates import WindowedAggregates
+from feed import MetricsFeed, sse
+from storage import MetricsStore
+
 # Set up the Flask app with proper template directory
 template_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), 'templates'))
 app = Flask(__name__, template_folder=template_dir)
 
-# Store metrics in memory (for simplicity)
-metrics_data = defaultdict(list)
+# Store metrics in memory (for simplicity): the most recent events of each
+# type, in a ring buffer so appending never copies what is already stored
+METRICS_RETENTION = int(os.getenv("METRICS_RETENTION", "10000"))
 metrics_types = ["llm", "stt", "tts", "eou", "vad"]
+metrics_data = {metric_type: deque(maxlen=METRICS_RETENTION) for metric_type in metrics_types}
+# Streaming count, mean and percentiles per type and label, for summaries
+# over any window up to METRICS_SUMMARY_HORIZON seconds
+METRICS_SUMMARY_HORIZON = int(os.getenv("METRICS_SUMMARY_HORIZON", "3600"))
+aggregates = WindowedAggregates(horizon=METRICS_SUMMARY_HORIZON)
+# Request handlers run on several threads
+metrics_lock = threading.Lock()
+# New events are pushed to the dashboards connected to /api/metrics/stream
+METRICS_STREAM_MAX_PENDING = int(os.getenv("METRICS_STREAM_MAX_PENDING", "1000"))
+feed = MetricsFeed(max_pending=METRICS_STREAM_MAX_PENDING)
+# Serialized summaries by window, shared by every stream for a second
+summary_cache = {}
+summary_cache_lock = threading.Lock()
+# Every event is also appended to a SQLite database, which survives restarts
+# and answers time-range queries; set METRICS_DB to an empty string to disable
+METRICS_DB = os.getenv("METRICS_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), 'metrics.db'))
+store = MetricsStore(METRICS_DB) if METRICS_DB else None
+if store:
+    # Write the events still queued when the server stops
+    atexit.register(store.close)
+
+def store_metrics(metric_type, events):
+    """Add events of one type, stamped with when the server received them"""
+    received_at = datetime.now().isoformat()
+    for data in events:
+        data['received_at'] = received_at
+    with metrics_lock:
+        # Taken under the lock so the aggregates see times in order
+        now = time.time()
+        metrics_data[metric_type].extend(events)
+        for data in events:
+            aggregates.add(metric_type, data, now)
+    if store:
+        store.append(metric_type, events, now)
+    feed.publish(metric_type, events)
+
+def restore_metrics():
+    """Fill the in-memory buffers and aggregates from the database after a restart"""
+    for metric_type in metrics_types:
+        for _, data in store.recent(metric_type, None, METRICS_RETENTION):
+            metrics_data[metric_type].append(data)
+    # Every event inside the longest summary window, not only the buffered
+    # ones, so summaries match what they were before the restart
+    for received_at, metric_type, fields in store.summarized_fields(time.time() - METRICS_SUMMARY_HORIZON):
+        aggregates.add(metric_type, fields, received_at)
+
+def parse_time(value):
+    """A query time given as a Unix timestamp or an ISO 8601 string"""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def summary_payload(window):
+    now = time.time()
+    with metrics_lock:
+        summary = aggregates.summary(window, now)
+    return {"window": window, "generated_at": now, "metrics": summary}
+
+def cached_summary_json(window):
+    """summary_payload as JSON, computed at most once a second per window"""
+    with summary_cache_lock:
+        cached = summary_cache.get(window)
+        if cached is None or time.monotonic() - cached[0] > 1.0:
+            cached = (time.monotonic(), json.dumps(summary_payload(window)))
+            summary_cache[window] = cached
+        return cached[1]
+
+def snapshot(metric_type, limit=None):
+    """The stored events of a type, oldest first; only the last `limit` if given"""
+    with metrics_lock:
+        if limit is None:
+            return list(metrics_data[metric_type])
+        return list(islice(reversed(metrics_data[metric_type]), limit))[::-1]
 
 @app.route('/metrics/<metric_type>', methods=['POST'])
 def receive_metrics(metric_type):
@@ -21,17 +106,33 @@ def receive_metrics(metric_type):
     if metric_type not in metrics_types:
         return jsonify({"error": f"Invalid metric type: {metric_type}"}), 400
     
-    data = request.json
-    # Add timestamp for when server received it
-    data['received_at'] = datetime.now().isoformat()
-    metrics_data[metric_type].append(data)
-    
-    # Limit the size of stored metrics (keep only last 100 entries per type)
-    if len(metrics_data[metric_type]) > 100:
-        metrics_data[metric_type] = metrics_data[metric_type][-100:]
-    
+    store_metrics(metric_type, [request.json])
     return jsonify({"status": "success"}), 200
 
+@app.route('/metrics/batch', methods=['POST'])
+def receive_metrics_batch():
+    """
+    Endpoint to receive many metrics events in one request:
+    {"events": [{"metric_type": "llm", "data": {...}}, ...]}
+    """
+    events = (request.json or {}).get("events")
+    if not isinstance(events, list):
+        return jsonify({"error": "Expected an 'events' list"}), 400
+
+    by_type = {metric_type: [] for metric_type in metrics_types}
+    for event in events:
+        metric_type = event.get("metric_type") if isinstance(event, dict) else None
+        if metric_type in by_type and isinstance(event.get("data"), dict):
+            by_type[metric_type].append(event["data"])
+
+    accepted = 0
+    for metric_type, batch in by_type.items():
+        if batch:
+            store_metrics(metric_type, batch)
+            accepted += len(batch)
+
+    return jsonify({"status": "success", "accepted": accepted, "rejected": len(events) - accepted}), 200
+
 @app.route('/')
 def dashboard():
     """Display metrics dashboard"""
@@ -39,8 +140,119 @@ def dashboard():
 
 @app.route('/api/metrics')
 def get_metrics():
-    """API endpoint to get all metrics data for AJAX requests"""
-    return jsonify(metrics_data)
+    """API endpoint to get all metrics data for AJAX requests; ?limit=N returns the last N of each type"""
+    limit = request.args.get('limit', type=int)
+    return jsonify({metric_type: snapshot(metric_type, limit) for metric_type in metrics_types})
+
+@app.route('/api/metrics/summary')
+def get_metrics_summary():
+    """
+    API endpoint for count, mean and p50/p90/p99 of the latency fields per
+    metric type and label, over the last ?window=<seconds> (300 by default)
+    """
+    window = min(request.args.get('window', 300, type=float), METRICS_SUMMARY_HORIZON)
+    return jsonify(summary_payload(window))
+
+@app.route('/api/metrics/history')
+def get_metrics_history():
+    """
+    API endpoint for stored events, oldest first. Query parameters (all
+    optional): start and end (Unix timestamps or ISO 8601), type, label,
+    speech_id, request_id and limit (1000 by default)
+    """
+    if store is None:
+        return jsonify({"error": "Metrics storage is disabled"}), 404
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time: {e}"}), 400
+    events = store.query(
+        start=start,
+        end=end,
+        metric_type=request.args.get('type'),
+        label=request.args.get('label'),
+        speech_id=request.args.get('speech_id'),
+        request_id=request.args.get('request_id'),
+        limit=request.args.get('limit', 1000, type=int),
+    )
+    return jsonify(events)
+
+@app.route('/api/metrics/history/summary')
+def get_metrics_history_summary():
+    """
+    API endpoint for count, mean and p50/p90/p99 of the latency fields of the
+    stored events between start and end, per metric type and label;
+    optionally for one type or label only
+    """
+    if store is None:
+        return jsonify({"error": "Metrics storage is disabled"}), 404
+    try:
+        start = parse_time(request.args.get('start'))
+        end = parse_time(request.args.get('end'))
+    except ValueError as e:
+        return jsonify({"error": f"Invalid time: {e}"}), 400
+    summary = store.summary(start, end, request.args.get('type'), request.args.get('label'))
+    return jsonify({"start": start, "end": end, "metrics": summary})
+
+@app.route('/api/metrics/stream')
+def stream_metrics():
+    """
+    Server-sent-events feed for dashboards. Query parameters:
+        types: comma-separated metric types to receive (all by default)
+        backlog: number of stored events per type sent on connect (5 by default)
+        window: window of the summary snapshots, in seconds (300 by default)
+        interval: seconds between summary snapshots (5 by default)
+
+    Events:
+        backlog  the most recent stored events, as [{"metric_type", "data"}, ...]
+        metrics  new events since the last message, in the same format
+        summary  the /api/metrics/summary payload
+        lagged   {"dropped": N} when the client read too slowly and its N
+                 oldest pending events were dropped; sent before the events
+                 that follow the gap
+    """
+    types = request.args.get('types')
+    types = types.split(',') if types else metrics_types
+    invalid = [metric_type for metric_type in types if metric_type not in metrics_types]
+    if invalid:
+        return jsonify({"error": f"Invalid metric types: {', '.join(invalid)}"}), 400
+    backlog = max(request.args.get('backlog', 5, type=int), 0)
+    window = min(request.args.get('window', 300, type=float), METRICS_SUMMARY_HORIZON)
+    interval = max(request.args.get('interval', 5, type=float), 1.0)
+
+    # Subscribe before reading the backlog so no event falls in between
+    subscriber = feed.subscribe(types)
+    initial = [
+        {"metric_type": metric_type, "data": data}
+        for metric_type in types
+        for data in (snapshot(metric_type, backlog) if backlog else [])
+    ]
+
+    def generate():
+        try:
+            yield sse("backlog", json.dumps(initial))
+            yield sse("summary", cached_summary_json(window))
+            next_summary = time.monotonic() + interval
+            while True:
+                payloads, dropped = subscriber.take(timeout=next_summary - time.monotonic())
+                if dropped:
+                    yield sse("lagged", json.dumps({"dropped": dropped}))
+                if payloads:
+                    yield sse("metrics", "[" + ",".join(payloads) + "]")
+                # The periodic summary also serves as a keepalive
+                if time.monotonic() >= next_summary:
+                    yield sse("summary", cached_summary_json(window))
+                    next_summary = time.monotonic() + interval
+        finally:
+            # Runs when the client disconnects
+            feed.unsubscribe(subscriber)
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 @app.route('/api/metrics/<metric_type>')
 def get_metric_type(metric_type):
@@ -48,7 +260,10 @@ def get_metric_type(metric_type):
     if metric_type not in metrics_types:
         return jsonify({"error": f"Invalid metric type: {metric_type}"}), 400
     
-    return jsonify(metrics_data[metric_type])
+    return jsonify(snapshot(metric_type, request.args.get('limit', type=int)))
+
+if store:
+    restore_metrics()
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001) 
\ No newline at end of file
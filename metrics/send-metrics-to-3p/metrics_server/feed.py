@@ -0,0 +1,105 @@
+"""
+Push feed of new metrics events for the dashboard's server-sent-events stream.
+
+Every connected client has a Subscriber with the metric types it asked for
+and a bounded queue of pending events. Events are serialized once when they
+are published, however many clients receive them. Publishing never waits on
+a client: when a client reads too slowly and its queue fills up, its oldest
+pending events are dropped to make room for new ones, and the client is told
+how many it missed, so it can resync from the snapshot endpoints.
+"""
+
+import json
+import queue
+import threading
+from typing import Iterable, List, Set, Tuple
+
+
+class Subscriber:
+    def __init__(self, metric_types: Iterable[str], max_pending: int = 1000):
+        """
+        Args:
+            metric_types: Types of the events this client receives
+            max_pending: Events kept for the client; beyond that the oldest
+                are dropped
+        """
+        self.metric_types = frozenset(metric_types)
+        self._max_pending = max_pending
+        self._pending: "queue.Queue[str]" = queue.Queue(maxsize=max_pending)
+        self._dropped = 0
+        self._lock = threading.Lock()
+
+    def offer(self, payloads: List[str]) -> None:
+        # Only the newest events of a batch larger than the queue can be kept
+        # (a max_pending of 0 means no limit)
+        dropped = max(len(payloads) - self._max_pending, 0) if self._max_pending > 0 else 0
+        for payload in payloads[dropped:]:
+            while True:
+                try:
+                    self._pending.put_nowait(payload)
+                    break
+                except queue.Full:
+                    # Lagging behind: make room by dropping the oldest event
+                    # rather than block the publisher
+                    try:
+                        self._pending.get_nowait()
+                        dropped += 1
+                    except queue.Empty:
+                        pass
+        if dropped:
+            with self._lock:
+                self._dropped += dropped
+
+    def take(self, timeout: float, max_items: int = 500) -> Tuple[List[str], int]:
+        """
+        Wait up to `timeout` seconds for events. Returns the pending events
+        (at most `max_items`) and the number dropped since the last call.
+        """
+        payloads: List[str] = []
+        try:
+            payloads.append(self._pending.get(timeout=max(timeout, 0.0)))
+            while len(payloads) < max_items:
+                payloads.append(self._pending.get_nowait())
+        except queue.Empty:
+            pass
+        with self._lock:
+            dropped, self._dropped = self._dropped, 0
+        return payloads, dropped
+
+
+class MetricsFeed:
+    def __init__(self, max_pending: int = 1000):
+        """
+        Args:
+            max_pending: Events kept for each client before they are dropped
+        """
+        self._max_pending = max_pending
+        self._subscribers: Set[Subscriber] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self, metric_types: Iterable[str]) -> Subscriber:
+        subscriber = Subscriber(metric_types, self._max_pending)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, metric_type: str, events: List[dict]) -> None:
+        with self._lock:
+            subscribers = [s for s in self._subscribers if metric_type in s.metric_types]
+        if not subscribers:
+            return
+        payloads = [json.dumps({"metric_type": metric_type, "data": data}) for data in events]
+        for subscriber in subscribers:
+            subscriber.offer(payloads)
+
+
+def sse(event: str, data: str) -> str:
+    """Format one server-sent event; `data` must be a single line."""
+    return f"event: {event}\ndata: {data}\n\n"
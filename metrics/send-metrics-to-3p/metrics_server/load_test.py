@@ -0,0 +1,138 @@
+"""
+Load test for the metrics server.
+
+Simulates several agents sending metrics at a fixed rate, each over its own
+keep-alive connection, and reports the event rate the server sustained and
+the latency of its requests. Events are sent in batches to /metrics/batch,
+or one per request to /metrics/<type> with --single, which is how agents
+sent them before batching.
+
+Usage:
+    python app.py &
+    python load_test.py --agents 8 --rate 500 --duration 10
+    python load_test.py --agents 4 --rate 100 --single
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+import uuid
+
+import requests
+
+METRIC_TYPES = ["llm", "stt", "tts", "eou", "vad"]
+
+
+def make_event(rng: random.Random, agent: int) -> tuple:
+    """A random (metric type, data) pair shaped like the agent's metrics."""
+    metric_type = rng.choice(METRIC_TYPES)
+    data = {
+        "type": f"{metric_type}_metrics",
+        "label": f"agent-{agent}",
+        "timestamp": time.time(),
+        "speech_id": f"speech_{uuid.UUID(int=rng.getrandbits(128)).hex[:12]}",
+    }
+    if metric_type == "llm":
+        data.update(
+            request_id=uuid.UUID(int=rng.getrandbits(128)).hex,
+            ttft=rng.lognormvariate(-1.0, 0.4),
+            duration=rng.lognormvariate(0.0, 0.4),
+            tokens_per_second=rng.uniform(20, 120),
+            cancelled=False,
+        )
+    elif metric_type == "tts":
+        data.update(
+            request_id=uuid.UUID(int=rng.getrandbits(128)).hex,
+            ttfb=rng.lognormvariate(-1.2, 0.3),
+            duration=rng.lognormvariate(0.2, 0.3),
+            audio_duration=rng.uniform(0.5, 8.0),
+        )
+    elif metric_type == "stt":
+        data.update(duration=rng.uniform(0.0, 0.2), audio_duration=rng.uniform(0.5, 5.0), streamed=True)
+    elif metric_type == "eou":
+        data.update(end_of_utterance_delay=rng.lognormvariate(-0.7, 0.3), transcription_delay=rng.uniform(0, 0.3))
+    else:
+        data.update(idle_time=rng.uniform(0, 2), inference_count=rng.randint(1, 50))
+    return metric_type, data
+
+
+def run_agent(agent: int, args, results: dict, lock: threading.Lock) -> None:
+    rng = random.Random(args.seed * 1000 + agent)
+    session = requests.Session()
+    latencies, sent, errors = [], 0, 0
+    # Requests per second needed to reach the rate
+    per_request = 1 if args.single else args.batch_size
+    interval = per_request / args.rate
+    next_at = time.perf_counter()
+    deadline = next_at + args.duration
+
+    while time.perf_counter() < deadline:
+        events = [make_event(rng, agent) for _ in range(per_request)]
+        start = time.perf_counter()
+        try:
+            if args.single:
+                metric_type, data = events[0]
+                response = session.post(f"{args.url}/metrics/{metric_type}", json=data, timeout=5)
+            else:
+                body = {"events": [{"metric_type": t, "data": d} for t, d in events]}
+                response = session.post(f"{args.url}/metrics/batch", json=body, timeout=5)
+            response.raise_for_status()
+            sent += len(events)
+        except requests.RequestException:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+        next_at += interval
+        delay = next_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    with lock:
+        results["latencies"].extend(latencies)
+        results["sent"] += sent
+        results["errors"] += errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="http://localhost:5001")
+    parser.add_argument("--agents", type=int, default=8, help="Simulated agents")
+    parser.add_argument("--rate", type=float, default=500, help="Events per second per agent")
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--single", action="store_true", help="One event per request")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = {"latencies": [], "sent": 0, "errors": 0}
+    lock = threading.Lock()
+    threads = [
+        threading.Thread(target=run_agent, args=(agent, args, results, lock))
+        for agent in range(args.agents)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = results["latencies"]
+    target = args.agents * args.rate
+    print(f"{args.agents} agents, target {target:.0f} events/sec, {'single' if args.single else 'batch'} requests")
+    print(f"events sent: {results['sent']} ({results['sent'] / elapsed:.0f}/sec), failed requests: {results['errors']}")
+    if latencies:
+        # Inclusive, so p99 stays within the measured range; quantiles() needs two samples
+        q = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+        print(
+            f"request latency ms: p50 {q[49] * 1000:.2f}, p90 {q[89] * 1000:.2f}, "
+            f"p99 {q[98] * 1000:.2f}, max {max(latencies) * 1000:.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Persistent, append-only metrics storage in SQLite.
+
+Every event is one row of the `events` table. The latency fields the
+dashboards summarize get their own REAL columns, so time-range statistics
+read only those columns, and the full event is kept as JSON next to them.
+Rows are indexed by received time, by type and label (with time), and by
+speech_id and request_id, so the queries a regression analysis needs stay
+range scans over weeks of data.
+
+Requests never wait on the disk: `append` queues events and a writer
+thread inserts them in batches, one transaction per batch.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from aggregates import DEFAULT_LABEL, SUMMARY_FIELDS, LogHistogram
+
+logger = logging.getLogger("metrics-storage")
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    received_at REAL NOT NULL,
+    metric_type TEXT NOT NULL,
+    label TEXT,
+    timestamp REAL,
+    speech_id TEXT,
+    request_id TEXT,
+    {", ".join(f"{field} REAL" for field in SUMMARY_FIELDS)},
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_received ON events (received_at);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events (metric_type, received_at);
+CREATE INDEX IF NOT EXISTS idx_events_label ON events (label, received_at);
+CREATE INDEX IF NOT EXISTS idx_events_speech ON events (speech_id) WHERE speech_id IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_events_request ON events (request_id) WHERE request_id IS NOT NULL;
+"""
+
+COLUMNS = ["received_at", "metric_type", "label", "timestamp", "speech_id", "request_id"] + SUMMARY_FIELDS + ["data"]
+INSERT_EVENT = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    return None
+
+
+def _row(metric_type: str, data: dict, received_at: float) -> tuple:
+    return (
+        received_at,
+        metric_type,
+        data.get("label"),
+        _number(data.get("timestamp")),
+        data.get("speech_id"),
+        data.get("request_id"),
+        *(_number(data.get(field)) for field in SUMMARY_FIELDS),
+        json.dumps(data),
+    )
+
+
+class MetricsStore:
+    def __init__(self, path: str, batch_size: int = 1000, flush_interval: float = 0.5):
+        """
+        Args:
+            path: SQLite database file, created if missing
+            batch_size: Most events inserted in one transaction
+            flush_interval: Longest time, in seconds, an event waits to be written
+        """
+        self.path = path
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._write_conn = self._connect()
+        self._write_conn.executescript(SCHEMA)
+        # Queries run on request threads; each gets its own connection
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="metrics-storage", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # WAL lets queries run while the writer appends
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def append(self, metric_type: str, events: List[dict], received_at: float) -> None:
+        """Queue events for writing; returns immediately."""
+        for data in events:
+            self._pending.put(_row(metric_type, data, received_at))
+
+    def flush(self) -> None:
+        """Wait until every queued event is written."""
+        done = threading.Event()
+        self._pending.put(("flush", done))
+        done.wait()
+
+    def close(self) -> None:
+        """Write every queued event, then stop the writer; safe to call twice."""
+        if not self._writer.is_alive():
+            return
+        self._pending.put(None)
+        self._writer.join()
+        self._write_conn.close()
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._pending.get()
+            rows, waiters, stop = [], [], False
+            try:
+                # Gather what arrives within the interval into one transaction
+                while True:
+                    if item is None:
+                        stop = True
+                    elif item[0] == "flush":
+                        waiters.append(item[1])
+                    else:
+                        rows.append(item)
+                    if stop or waiters or len(rows) >= self._batch_size:
+                        break
+                    item = self._pending.get(timeout=self._flush_interval)
+            except queue.Empty:
+                pass
+
+            if rows:
+                try:
+                    with self._write_conn:
+                        self._write_conn.executemany(INSERT_EVENT, rows)
+                except sqlite3.Error:
+                    logger.exception(f"Failed to store {len(rows)} metrics events")
+            for waiter in waiters:
+                waiter.set()
+            if stop:
+                return
+
+    def _where(
+        self,
+        start: Optional[float],
+        end: Optional[float],
+        metric_type: Optional[str],
+        label: Optional[str],
+        speech_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+    ) -> Tuple[str, list]:
+        clauses, params = [], []
+        if label == DEFAULT_LABEL:
+            # Summaries report unlabeled events under the default label
+            clauses.append("(label = ? OR label IS NULL OR label = '')")
+            params.append(label)
+            label = None
+        for clause, value in (
+            ("received_at >= ?", start),
+            ("received_at < ?", end),
+            ("metric_type = ?", metric_type),
+            ("label = ?", label),
+            ("speech_id = ?", speech_id),
+            ("request_id = ?", request_id),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        metric_type: Optional[str] = None,
+        label: Optional[str] = None,
+        speech_id: Optional[str] = None,
+        request_id: Optional[str] = None,
+        limit: int = 1000,
+    ) -> List[Dict[str, Any]]:
+        """
+        Stored events matching every given filter, oldest first.
+
+        Args:
+            start: Earliest received time, as a Unix timestamp (inclusive)
+            end: Latest received time, as a Unix timestamp (exclusive)
+            metric_type: "llm", "stt", "tts", "eou" or "vad"
+            label: The events' label, e.g. the plugin that produced them
+            speech_id: Events of one speech
+            request_id: Events of one request
+            limit: Most events returned
+        """
+        where, params = self._where(start, end, metric_type, label, speech_id, request_id)
+        rows = self._reader().execute(
+            f"SELECT metric_type, data FROM events{where} ORDER BY received_at, id LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [{"metric_type": row["metric_type"], "data": json.loads(row["data"])} for row in rows]
+
+    def summary(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        metric_type: Optional[str] = None,
+        label: Optional[str] = None,
+    ) -> dict:
+        """
+        Count, mean and p50/p90/p99 of the latency fields per type and label
+        over a time range, in the format of /api/metrics/summary.
+        """
+        where, params = self._where(start, end, metric_type, label)
+        histograms: Dict[Tuple[str, str, str], LogHistogram] = {}
+
+        def histogram(key: Tuple[str, str, str]) -> LogHistogram:
+            if key not in histograms:
+                histograms[key] = LogHistogram()
+            return histograms[key]
+
+        conn = self._reader()
+        try:
+            # Let SQLite count the values per histogram bucket, so only the
+            # bucket counts come back to Python
+            log_gamma = LogHistogram().log_gamma
+            for field in SUMMARY_FIELDS:
+                rows = conn.execute(
+                    f"SELECT metric_type, COALESCE(NULLIF(label, ''), ?), "
+                    f"CASE WHEN {field} > 0 THEN CAST(ceil(ln({field}) / ?) AS INTEGER) END, "
+                    f"COUNT(*), SUM({field}), MIN({field}), MAX({field}) "
+                    f"FROM events{where}{' AND' if where else ' WHERE'} {field} >= 0 "
+                    f"GROUP BY 1, 2, 3",
+                    [DEFAULT_LABEL, log_gamma] + params,
+                )
+                for event_type, event_label, key, count, total, low, high in rows:
+                    histogram((event_type, event_label, field)).add_bucket(key, count, total, low, high)
+        except sqlite3.OperationalError:
+            # SQLite built without its math functions: bucket every value here
+            histograms.clear()
+            columns = ", ".join(SUMMARY_FIELDS)
+            for row in conn.execute(f"SELECT metric_type, label, {columns} FROM events{where}", params):
+                for field in SUMMARY_FIELDS:
+                    if row[field] is not None:
+                        histogram((row["metric_type"], row["label"] or DEFAULT_LABEL, field)).add(row[field])
+
+        result: dict = {}
+        for (event_type, event_label, field), histogram_ in sorted(histograms.items()):
+            result.setdefault(event_type, {}).setdefault(event_label, {})[field] = histogram_.summary()
+        return result
+
+    def recent(self, metric_type: str, since: Optional[float], limit: int) -> List[Tuple[float, dict]]:
+        """The last `limit` events of a type received after `since`, oldest first."""
+        where, params = self._where(since, None, metric_type, None)
+        rows = self._reader().execute(
+            f"SELECT received_at, data FROM events{where} ORDER BY received_at DESC, id DESC LIMIT ?",
+            params + [limit],
+        ).fetchall()
+        return [(row["received_at"], json.loads(row["data"])) for row in reversed(rows)]
+
+    def summarized_fields(self, since: float) -> Iterator[Tuple[float, str, dict]]:
+        """
+        The label and summarized fields of every event received at or after
+        `since`, oldest first, as (received at, metric type, fields) tuples.
+        """
+        rows = self._reader().execute(
+            f"SELECT received_at, metric_type, label, {', '.join(SUMMARY_FIELDS)} FROM events "
+            f"WHERE received_at >= ? ORDER BY received_at, id",
+            (since,),
+        )
+        for row in rows:
+            fields = {field: row[field] for field in SUMMARY_FIELDS if row[field] is not None}
+            fields["label"] = row["label"]
+            yield row["received_at"], row["metric_type"], fields
@@ -0,0 +1,46 @@
+import importlib
+import sys
+from pathlib import Path
+
+import pytest
+
+# The tests import the server's modules (`storage`, `feed`, ...) the way
+# app.py does, from the server directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from storage import MetricsStore  # noqa: E402
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A metrics database in a temporary directory."""
+    store = MetricsStore(str(tmp_path / "metrics.db"), flush_interval=0.05)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """
+    Import a fresh copy of app.py on a temporary database; call it again to
+    simulate a restart. Extra keyword arguments are set as environment
+    variables.
+    """
+    loaded = []
+
+    def load(**env):
+        env.setdefault("METRICS_DB", tmp_path / "metrics.db")
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        if loaded and loaded[-1].store:
+            loaded[-1].store.close()
+        sys.modules.pop("app", None)
+        app = importlib.import_module("app")
+        loaded.append(app)
+        return app
+
+    yield load
+    for app in loaded:
+        if app.store:
+            app.store.close()
+    sys.modules.pop("app", None)
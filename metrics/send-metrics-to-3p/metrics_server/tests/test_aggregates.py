@@ -0,0 +1,115 @@
+import random
+import statistics
+import threading
+
+import pytest
+
+from aggregates import QUANTILES, LogHistogram, WindowedAggregates
+
+
+def inclusive_quantiles(values):
+    """p50/p90/p99 the way the load tests report them."""
+    cuts = statistics.quantiles(values, n=100, method="inclusive")
+    return {name: cuts[round(q * 100) - 1] for name, q in QUANTILES.items()}
+
+
+def distributions():
+    rng = random.Random(7)
+    yield "lognormal", [rng.lognormvariate(-1.5, 0.8) for _ in range(20000)]
+    yield "uniform", [rng.uniform(0.05, 3.0) for _ in range(5000)]
+    yield "bimodal", [rng.gauss(0.2, 0.02) if rng.random() < 0.8 else rng.gauss(1.5, 0.1) for _ in range(10000)]
+    yield "with zeros", [0.0] * 300 + [rng.expovariate(4) for _ in range(3000)]
+
+
+@pytest.mark.parametrize("name, values", list(distributions()), ids=lambda v: v if isinstance(v, str) else "")
+def test_percentiles_match_inclusive_quantiles(name, values):
+    histogram = LogHistogram(relative_accuracy=0.01)
+    for value in values:
+        histogram.add(value)
+
+    summary = histogram.summary()
+    expected = inclusive_quantiles(values)
+    assert summary["count"] == len(values)
+    assert summary["mean"] == pytest.approx(statistics.fmean(values))
+    for quantile, value in expected.items():
+        # 1% from the buckets, plus the interpolation between neighbours
+        assert summary[quantile] == pytest.approx(value, rel=0.015, abs=1e-9), quantile
+
+
+def test_small_samples_stay_within_the_values_seen():
+    histogram = LogHistogram()
+    for value in (0.3, 0.31, 2.0):
+        histogram.add(value)
+
+    assert histogram.quantile(0.0) == pytest.approx(0.3, rel=0.01)
+    assert histogram.quantile(0.5) == pytest.approx(0.31, rel=0.01)
+    assert histogram.quantile(1.0) == pytest.approx(2.0, rel=0.01)
+    assert histogram.quantile(1.0) <= histogram.max == 2.0
+    assert LogHistogram().quantile(0.5) is None
+
+
+def test_invalid_values_are_ignored():
+    histogram = LogHistogram()
+    for value in (-1.0, float("nan"), float("inf"), 1.0):
+        histogram.add(value)
+
+    assert histogram.count == 1
+
+
+def test_merging_equals_adding_everything():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(0, 1) for _ in range(2000)]
+    whole, left, right = LogHistogram(), LogHistogram(), LogHistogram()
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+    left.merge(right)
+
+    assert left.buckets == whole.buckets
+    assert left.summary() == pytest.approx(whole.summary())
+
+
+def test_window_covers_only_recent_slots():
+    aggregates = WindowedAggregates(slot_seconds=10, horizon=60)
+    for second in range(0, 120, 5):
+        aggregates.add("llm", {"ttft": 0.1}, now=1000.0 + second)
+
+    now = 1000.0 + 119
+    assert aggregates.summary(30, now)["llm"]["default"]["ttft"]["count"] == 6
+    # Slots older than the horizon were dropped
+    assert aggregates.summary(3600, now)["llm"]["default"]["ttft"]["count"] == 12
+
+
+def test_concurrent_requests_keep_slots_ordered_and_complete(load_app, monkeypatch):
+    app = load_app(METRICS_DB="")
+    app.aggregates = WindowedAggregates(slot_seconds=1, horizon=3600)
+
+    # A clock that moves 10ms per reading, so the requests cross many slots
+    clock_lock = threading.Lock()
+    clock = [1_000_000.0]
+
+    def fake_time():
+        with clock_lock:
+            clock[0] += 0.01
+            return clock[0]
+
+    monkeypatch.setattr(app.time, "time", fake_time)
+
+    threads, per_thread = 8, 250
+
+    def send(worker):
+        for i in range(per_thread):
+            app.store_metrics("llm", [{"ttft": 0.1 + worker / 100, "seq": i}])
+
+    workers = [threading.Thread(target=send, args=(w,)) for w in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    slots = [slot for slot, _ in app.aggregates._slots]
+    assert slots == sorted(set(slots))
+    assert len(slots) > 10
+    summary = app.aggregates.summary(3600, clock[0])
+    assert summary["llm"]["default"]["ttft"]["count"] == threads * per_thread
+    assert len(app.metrics_data["llm"]) == threads * per_thread
@@ -0,0 +1,73 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+# send_metrics_to_3p.py lives in the example directory, next to the server
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from send_metrics_to_3p import MetricsExporter  # noqa: E402
+
+
+@pytest.fixture
+def server(load_app):
+    """The metrics server running on a local port."""
+    from werkzeug.serving import make_server
+
+    app = load_app(METRICS_DB="")
+    httpd = make_server("127.0.0.1", 0, app.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    app.url = f"http://127.0.0.1:{httpd.server_port}"
+    yield app
+    httpd.shutdown()
+
+
+def test_events_arrive_in_batches_and_in_order(server):
+    async def export():
+        exporter = MetricsExporter(server.url, batch_size=50, flush_interval=0.05)
+        exporter.start()
+        for i in range(120):
+            exporter.submit("llm" if i % 2 else "tts", {"seq": i})
+            if i % 40 == 0:
+                await asyncio.sleep(0.01)
+        await exporter.aclose()
+        return exporter
+
+    exporter = asyncio.run(export())
+
+    assert (exporter.sent, exporter.dropped, exporter.failed) == (120, 0, 0)
+    assert [e["seq"] for e in server.metrics_data["llm"]] == list(range(1, 120, 2))
+    assert [e["seq"] for e in server.metrics_data["tts"]] == list(range(0, 120, 2))
+
+
+def test_full_queue_drops_the_oldest_events(server):
+    async def export():
+        exporter = MetricsExporter(server.url, max_queue=10, batch_size=100)
+        for i in range(15):
+            exporter.submit("stt", {"seq": i})
+        exporter.start()
+        await exporter.aclose()
+        return exporter
+
+    exporter = asyncio.run(export())
+
+    assert (exporter.sent, exporter.dropped) == (10, 5)
+    assert [e["seq"] for e in server.metrics_data["stt"]] == list(range(5, 15))
+
+
+def test_unreachable_server_fails_without_raising():
+    async def export():
+        exporter = MetricsExporter("http://127.0.0.1:9", timeout=0.5)
+        exporter.start()
+        exporter.submit("vad", {"seq": 0})
+        await exporter.aclose()
+        return exporter
+
+    exporter = asyncio.run(export())
+
+    assert (exporter.sent, exporter.failed) == (0, 1)
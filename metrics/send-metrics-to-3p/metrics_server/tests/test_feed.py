@@ -0,0 +1,36 @@
+import json
+
+from feed import MetricsFeed, Subscriber
+
+
+def test_slow_subscriber_keeps_the_newest_events():
+    subscriber = Subscriber(["llm"], max_pending=3)
+    for i in range(5):
+        subscriber.offer([str(i)])
+
+    assert subscriber.take(timeout=0) == (["2", "3", "4"], 2)
+    assert subscriber.take(timeout=0) == ([], 0)
+
+
+def test_batch_larger_than_the_queue():
+    subscriber = Subscriber(["llm"], max_pending=3)
+    subscriber.offer(["0"])
+    subscriber.offer([str(i) for i in range(1, 6)])
+
+    assert subscriber.take(timeout=0) == (["3", "4", "5"], 3)
+
+
+def test_feed_delivers_only_subscribed_types():
+    feed = MetricsFeed(max_pending=10)
+    llm = feed.subscribe(["llm"])
+    everything = feed.subscribe(["llm", "tts"])
+    feed.publish("tts", [{"ttfb": 0.1}])
+    feed.publish("llm", [{"ttft": 0.2}])
+
+    assert [json.loads(p) for p in llm.take(timeout=0)[0]] == [
+        {"metric_type": "llm", "data": {"ttft": 0.2}}
+    ]
+    assert [json.loads(p)["metric_type"] for p in everything.take(timeout=0)[0]] == ["tts", "llm"]
+
+    feed.unsubscribe(llm)
+    assert len(feed) == 1
@@ -0,0 +1,34 @@
+def test_batch_endpoint_accepts_valid_events(load_app):
+    client = load_app(METRICS_DB="").app.test_client()
+    response = client.post("/metrics/batch", json={"events": [
+        {"metric_type": "llm", "data": {"ttft": 0.2}},
+        {"metric_type": "tts", "data": {"ttfb": 0.1}},
+        {"metric_type": "bogus", "data": {}},
+        {"metric_type": "stt"},
+        "not an event",
+    ]})
+
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "success", "accepted": 2, "rejected": 3}
+    metrics = client.get("/api/metrics").get_json()
+    assert [e["ttft"] for e in metrics["llm"]] == [0.2]
+    assert [e["ttfb"] for e in metrics["tts"]] == [0.1]
+    assert all("received_at" in e for e in metrics["llm"] + metrics["tts"])
+
+
+def test_batch_endpoint_rejects_malformed_bodies(load_app):
+    client = load_app(METRICS_DB="").app.test_client()
+
+    assert client.post("/metrics/batch", json={"events": {}}).status_code == 400
+    assert client.post("/metrics/batch", json={}).status_code == 400
+    assert client.post("/metrics/bogus", json={}).status_code == 400
+
+
+def test_ring_buffer_keeps_the_newest_events(load_app):
+    client = load_app(METRICS_DB="", METRICS_RETENTION=5).app.test_client()
+    for i in range(8):
+        client.post("/metrics/eou", json={"end_of_utterance_delay": 0.1, "seq": i})
+
+    assert [e["seq"] for e in client.get("/api/metrics/eou").get_json()] == [3, 4, 5, 6, 7]
+    assert [e["seq"] for e in client.get("/api/metrics/eou?limit=2").get_json()] == [6, 7]
+    assert [e["seq"] for e in client.get("/api/metrics?limit=3").get_json()["eou"]] == [5, 6, 7]
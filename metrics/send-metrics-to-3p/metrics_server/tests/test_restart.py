@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+
+def send(app, count):
+    rng = random.Random(11)
+    for i in range(count):
+        app.store_metrics("llm", [{"label": rng.choice(["openai.LLM", None]), "ttft": rng.uniform(0.1, 1.0), "seq": i}])
+        app.store_metrics("tts", [{"ttfb": rng.uniform(0.05, 0.5), "duration": rng.uniform(1, 5), "seq": i}])
+
+
+def test_history_and_summary_survive_a_restart(load_app):
+    app = load_app(METRICS_RETENTION=50)
+    send(app, 80)
+    client = app.app.test_client()
+    before = {
+        "metrics": client.get("/api/metrics").get_json(),
+        "summary": client.get("/api/metrics/summary?window=3600").get_json()["metrics"],
+    }
+
+    # Closes the first server's store, writing what is still queued
+    restarted = load_app(METRICS_RETENTION=50)
+    client = restarted.app.test_client()
+    after = {
+        "metrics": client.get("/api/metrics").get_json(),
+        "summary": client.get("/api/metrics/summary?window=3600").get_json()["metrics"],
+    }
+
+    assert [e["seq"] for e in after["metrics"]["llm"]] == list(range(30, 80))
+    assert after["metrics"] == before["metrics"]
+    # Rebuilt from every stored event, not only the 50 kept in memory
+    assert after["summary"] == before["summary"]
+    assert after["summary"]["llm"]["openai.LLM"]["ttft"]["count"] + after["summary"]["llm"]["default"]["ttft"]["count"] == 80
+
+
+def test_stored_summary_matches_the_live_one(load_app):
+    app = load_app()
+    send(app, 200)
+    app.store.flush()
+    client = app.app.test_client()
+
+    live = client.get("/api/metrics/summary?window=3600").get_json()["metrics"]
+    stored = client.get("/api/metrics/history/summary").get_json()["metrics"]
+    history = client.get("/api/metrics/history?type=llm&label=default").get_json()
+
+    assert stored.keys() == live.keys()
+    for metric_type, labels in live.items():
+        for label, fields in labels.items():
+            for field, stats in fields.items():
+                assert stored[metric_type][label][field] == pytest.approx(stats), (metric_type, label, field)
+    assert len(history) == live["llm"]["default"]["ttft"]["count"]
+    assert all(e["data"]["label"] is None for e in history)
@@ -0,0 +1,28 @@
+import pytest
+
+LABELED = {"label": "openai.LLM", "ttft": 0.2, "duration": 1.0}
+UNLABELED = [{"ttft": 0.4, "duration": 2.0}, {"label": "", "ttft": 0.6, "duration": 3.0}]
+
+
+@pytest.fixture
+def events(store):
+    store.append("llm", [LABELED], received_at=100.0)
+    store.append("llm", UNLABELED, received_at=101.0)
+    store.flush()
+    return store
+
+
+def test_default_label_matches_unlabeled_events(events):
+    summary = events.summary()
+    default = events.query(label="default")
+
+    assert set(summary["llm"]) == {"openai.LLM", "default"}
+    assert summary["llm"]["default"]["ttft"]["count"] == len(default) == 2
+    assert [e["data"] for e in default] == UNLABELED
+    assert events.summary(label="default") == {"llm": {"default": summary["llm"]["default"]}}
+
+
+def test_label_filter(events):
+    assert [e["data"] for e in events.query(label="openai.LLM")] == [LABELED]
+    assert events.query(label="other") == []
+    assert set(events.summary(label="openai.LLM")["llm"]) == {"openai.LLM"}
@@ -0,0 +1,45 @@
+import json
+
+
+def sse_events(response):
+    """Parse the server-sent events of a streamed response, one at a time."""
+    for chunk in response.response:
+        text = chunk.decode() if isinstance(chunk, bytes) else chunk
+        lines = dict(line.split(": ", 1) for line in text.strip().splitlines())
+        yield lines["event"], json.loads(lines["data"])
+
+
+def test_slow_client_gets_a_gap_and_the_newest_events(load_app):
+    app = load_app(METRICS_STREAM_MAX_PENDING=3)
+    client = app.app.test_client()
+    response = client.get("/api/metrics/stream?types=llm&backlog=0&interval=60", buffered=False)
+    events = sse_events(response)
+    try:
+        assert next(events) == ("backlog", [])
+        assert next(events)[0] == "summary"
+
+        # Published while the client isn't reading
+        for i in range(5):
+            app.store_metrics("llm", [{"ttft": i / 10, "seq": i}])
+
+        assert next(events) == ("lagged", {"dropped": 2})
+        event, payload = next(events)
+        assert event == "metrics"
+        assert [e["data"]["seq"] for e in payload] == [2, 3, 4]
+    finally:
+        response.close()
+
+    assert len(app.feed) == 0
+
+
+def test_backlog_on_connect(load_app):
+    app = load_app()
+    app.store_metrics("tts", [{"ttfb": 0.1, "seq": i} for i in range(4)])
+    response = app.app.test_client().get("/api/metrics/stream?types=tts&backlog=2", buffered=False)
+    try:
+        event, payload = next(sse_events(response))
+    finally:
+        response.close()
+
+    assert event == "backlog"
+    assert [e["data"]["seq"] for e in payload] == [2, 3]
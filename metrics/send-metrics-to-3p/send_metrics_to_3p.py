@@ -1,9 +1,12 @@
 import logging
 import asyncio
-import requests
+import aiohttp
 import json
 import os
+import time
+from collections import deque
 from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
 from dotenv import load_dotenv
 from livekit.agents import JobContext, WorkerOptions, cli, vad
 from livekit.agents.metrics import LLMMetrics, STTMetrics, TTSMetrics, EOUMetrics, VADMetrics
@@ -15,20 +18,120 @@ from livekit.plugins import deepgram, openai, silero
 logger = logging.getLogger("combined-metrics")
 logger.setLevel(logging.INFO)
 
-# Reduce log level for HTTP-related libraries
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("requests").setLevel(logging.WARNING)
 
 load_dotenv(dotenv_path=Path(__file__).parent.parent / '.env')
 
 # Configure the metrics server URL
 METRICS_SERVER_URL = os.getenv("METRICS_SERVER_URL", "http://localhost:5001") 
 
+
+class MetricsExporter:
+    """
+    Sends metrics to the metrics server in batches, off the voice pipeline.
+
+    `submit` only appends to a bounded in-memory queue. A background task
+    posts the queued events to `/metrics/batch` over a keep-alive session
+    once `batch_size` events are waiting or `flush_interval` has passed.
+    When the server can't keep up and the queue is full, the oldest events
+    are dropped, so a slow or unreachable server costs memory and CPU
+    bounded by `max_queue` and never delays the agent.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        max_queue: int = 10_000,
+        batch_size: int = 200,
+        flush_interval: float = 1.0,
+        timeout: float = 2.0,
+    ) -> None:
+        """
+        Args:
+            server_url: Base URL of the metrics server
+            max_queue: Events kept while waiting to be sent; older ones are
+                dropped beyond this
+            batch_size: Number of waiting events that triggers a send, and
+                the most events sent in one request
+            flush_interval: Longest time, in seconds, an event waits to be sent
+            timeout: Timeout of one batch request, in seconds
+        """
+        self._endpoint = f"{server_url.rstrip('/')}/metrics/batch"
+        self._queue: Deque[Tuple[str, Dict[str, Any]]] = deque(maxlen=max_queue)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+        self.sent = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def submit(self, metric_type: str, data: Dict[str, Any]) -> None:
+        """Queue an event for the next batch. Never blocks."""
+        if len(self._queue) == self._queue.maxlen:
+            self.dropped += 1
+        self._queue.append((metric_type, data))
+        if len(self._queue) >= self._batch_size:
+            self._wakeup.set()
+
+    async def aclose(self) -> None:
+        """Send what is still queued, then stop."""
+        if self._task is None:
+            return
+        self._closing = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+        if self.dropped or self.failed:
+            logger.warning(f"Metrics exporter dropped {self.dropped} and failed to send {self.failed} events")
+
+    async def _run(self) -> None:
+        # One connection, reused for every batch
+        connector = aiohttp.TCPConnector(limit=1, keepalive_timeout=60)
+        async with aiohttp.ClientSession(connector=connector, timeout=self._timeout) as session:
+            while True:
+                deadline = time.monotonic() + self._flush_interval
+                while len(self._queue) < self._batch_size and not self._closing:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+
+                while self._queue:
+                    await self._send(session)
+                    if len(self._queue) < self._batch_size and not self._closing:
+                        break
+                if self._closing:
+                    return
+
+    async def _send(self, session: aiohttp.ClientSession) -> None:
+        batch = [self._queue.popleft() for _ in range(min(self._batch_size, len(self._queue)))]
+        events = [{"metric_type": metric_type, "data": data} for metric_type, data in batch]
+        try:
+            async with session.post(self._endpoint, json={"events": events}) as response:
+                response.raise_for_status()
+            self.sent += len(events)
+        except Exception as e:
+            # Metrics are best effort: drop the batch rather than let retries
+            # pile up behind a server that is down
+            self.failed += len(events)
+            logger.warning(f"Failed to send {len(events)} metrics events: {e!r}")
+
+
 class CombinedMetricsAgent(Agent):
     """
     A comprehensive agent that tracks all metrics: LLM, STT, TTS, and VAD.
     """
-    def __init__(self) -> None:
+    def __init__(self, exporter: MetricsExporter) -> None:
         # Initialize components
         llm = openai.LLM(model="gpt-4o-mini")
         stt = deepgram.STT()
@@ -42,6 +145,7 @@ class CombinedMetricsAgent(Agent):
             tts=tts,
             vad=silero_vad,
         )
+        self._exporter = exporter
         
         # Set up event handlers for all metric types
         
@@ -72,18 +176,9 @@ class CombinedMetricsAgent(Agent):
 
     async def send_metrics_to_server(self, metric_type: str, data: dict) -> None:
         """
-        Send metrics data to the Flask server
+        Queue metrics data for the Flask server; the exporter sends it in batches
         """
-        endpoint = f"{METRICS_SERVER_URL}/metrics/{metric_type}"
-        try:
-            # Use asyncio to run blocking request in a threadpool
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(
-                None, 
-                lambda: requests.post(endpoint, json=data, timeout=2)
-            )
-        except Exception as e:
-            raise e
+        self._exporter.submit(metric_type, data)
 
     async def on_llm_metrics_collected(self, metrics: LLMMetrics) -> None:
         # Create a dictionary of metrics data
@@ -175,10 +270,15 @@ class CombinedMetricsAgent(Agent):
 async def entrypoint(ctx: JobContext):
     await ctx.connect()
 
+    exporter = MetricsExporter(METRICS_SERVER_URL)
+    exporter.start()
+    # Send the last batch before the job exits
+    ctx.add_shutdown_callback(exporter.aclose)
+
     session = AgentSession()
 
     await session.start(
-        agent=CombinedMetricsAgent(),
+        agent=CombinedMetricsAgent(exporter),
         room=ctx.room,
         room_input_options=RoomInputOptions(),
     )
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Benchmark the batched embedding pipeline in RAGBuilder against the serial,
+one-paragraph-per-request loop it replaces: `openai.create_embeddings`
+awaited once per paragraph, as `RAGBuilder.build_from_texts` used to do.
+
+A local stub server stands in for the OpenAI embeddings endpoint, so no API key
+or network access is needed. The stub adds a fixed per-request latency and a
+small per-input cost, which is roughly how the real endpoint behaves.
+
+Usage:
+    python benchmark_embeddings.py
+    python benchmark_embeddings.py --paragraphs 2000 --latency-ms 150
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import random
+import struct
+import time
+
+import aiohttp
+from aiohttp import web
+from livekit.plugins import openai
+
+from rag_db_builder import RAGBuilder
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger("benchmark-embeddings")
+
+
+def make_stub_app(
+    latency: float, per_input_latency: float, dimensions: int, rate_limit_every: int = 0
+) -> web.Application:
+    """Create an aiohttp app that mimics the OpenAI embeddings endpoint."""
+    request_count = 0
+
+    async def embeddings(request: web.Request) -> web.Response:
+        nonlocal request_count
+        request_count += 1
+        if rate_limit_every and request_count % rate_limit_every == 0:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached"}},
+                status=429,
+                headers={"Retry-After": "0.05"},
+            )
+
+        body = await request.json()
+        inputs = body["input"]
+        await asyncio.sleep(latency + per_input_latency * len(inputs))
+
+        data = []
+        for i, text in enumerate(inputs):
+            rng = random.Random(text)
+            vector = [rng.uniform(-1.0, 1.0) for _ in range(dimensions)]
+            raw = struct.pack(f"{dimensions}f", *vector)
+            data.append(
+                {"index": i, "embedding": base64.b64encode(raw).decode("ascii")}
+            )
+
+        # Return items in reverse order to check that ordering is restored
+        return web.json_response({"data": list(reversed(data))})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/v1/embeddings", embeddings)
+    return app
+
+
+class _RedirectedSession:
+    """
+    Sends the POSTs of `openai.create_embeddings`, which always targets the
+    OpenAI API, to the stub server instead.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, url: str) -> None:
+        self._session = session
+        self._url = url
+
+    def post(self, url: str, **kwargs):
+        return self._session.post(self._url, **kwargs)
+
+
+async def run_serial_loop(
+    url: str, texts: list[str], dimensions: int
+) -> tuple[float, list[list[float]]]:
+    """The loop the pipeline replaced: one request per paragraph, awaited in turn."""
+    embeddings = []
+    async with aiohttp.ClientSession() as http_session:
+        redirected = _RedirectedSession(http_session, url)
+        start = time.perf_counter()
+        for text in texts:
+            results = await openai.create_embeddings(
+                input=[text],
+                model="text-embedding-3-small",
+                dimensions=dimensions,
+                http_session=redirected,
+            )
+            embeddings.append(results[0].embedding)
+        elapsed = time.perf_counter() - start
+    return elapsed, embeddings
+
+
+async def run_pipeline(
+    url: str, texts: list[str], dimensions: int, batch_size: int, max_concurrency: int
+) -> tuple[float, list[list[float]]]:
+    builder = RAGBuilder(
+        index_path="unused",
+        data_path="unused",
+        embeddings_dimension=dimensions,
+        batch_size=batch_size,
+        max_concurrency=max_concurrency,
+        embeddings_url=url,
+    )
+    async with aiohttp.ClientSession() as http_session:
+        start = time.perf_counter()
+        embeddings = await builder._embed_texts(texts, http_session, show_progress=False)
+        elapsed = time.perf_counter() - start
+    return elapsed, embeddings
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=500)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--per-input-latency-ms", type=float, default=0.5)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    parser.add_argument(
+        "--rate-limit-every",
+        type=int,
+        default=0,
+        help="Answer every Nth request with a 429 to exercise retries (0 disables)",
+    )
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+    app = make_stub_app(
+        args.latency_ms / 1000,
+        args.per_input_latency_ms / 1000,
+        args.dimensions,
+        args.rate_limit_every,
+    )
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    url = f"http://127.0.0.1:{port}/v1/embeddings"
+
+    texts = [f"Paragraph {i}: " + "lorem ipsum " * 40 for i in range(args.paragraphs)]
+
+    try:
+        serial_time, serial = await run_serial_loop(url, texts, args.dimensions)
+        batched_time, batched = await run_pipeline(
+            url, texts, args.dimensions, args.batch_size, args.max_concurrency
+        )
+    finally:
+        await runner.cleanup()
+
+    if serial != batched:
+        raise RuntimeError("Batched embeddings differ from the serial baseline")
+
+    print(f"Paragraphs:       {args.paragraphs}")
+    print(f"Serial loop:      {serial_time:8.2f}s  {args.paragraphs / serial_time:10.1f} paragraphs/sec")
+    print(
+        f"Batched pipeline: {batched_time:8.2f}s  {args.paragraphs / batched_time:10.1f} paragraphs/sec "
+        f"(batch_size={args.batch_size}, max_concurrency={args.max_concurrency})"
+    )
+    print(f"Speedup:          {serial_time / batched_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
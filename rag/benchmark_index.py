@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Compare the exact NumPy and the quantized (int8 / float16) index backends
+against Annoy.
+
+Builds every index over synthetic, clustered embeddings at several corpus
+sizes and reports recall@k against brute-force float32 ground truth, the
+size of the scanned vector file, p50/p99 single-query latency and batched
+query throughput. Quantized backends are measured with and without the
+exact re-rank step.
+
+Usage:
+    python benchmark_index.py
+    python benchmark_index.py --sizes 10000,50000,200000 --dimensions 1536
+    python benchmark_index.py --rerank 100
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from rag.index import ANNOY_FILE, VECTORS_FILE, AnnoyIndex, IndexBuilder
+from rag.numpy_index import NumpyIndex, save_vectors
+from rag.quantized_index import QuantizedIndex, quantized_files, save_quantized_vectors
+
+
+def make_corpus(
+    rng: np.random.Generator, size: int, dimensions: int, clusters: int = 64
+) -> np.ndarray:
+    """Clustered vectors, which is closer to real embeddings than uniform noise."""
+    centers = rng.standard_normal((clusters, dimensions)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    noise = rng.standard_normal((size, dimensions)).astype(np.float32)
+    return centers[labels] + 0.6 * noise
+
+
+def percentile_ms(samples: list[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+
+def recall_at_k(results: list[list[int]], truth: np.ndarray) -> float:
+    hits = sum(len(set(r) & set(t.tolist())) for r, t in zip(results, truth))
+    return hits / truth.size
+
+
+def benchmark_size(
+    rng: np.random.Generator,
+    size: int,
+    dimensions: int,
+    queries: int,
+    k: int,
+    trees: int,
+    batch_size: int,
+    rerank: int,
+) -> None:
+    corpus = make_corpus(rng, size, dimensions)
+    query_vectors = corpus[rng.integers(0, size, queries)] + 0.3 * rng.standard_normal(
+        (queries, dimensions)
+    ).astype(np.float32)
+
+    # Brute-force ground truth (angular == cosine ranking)
+    normalized = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    q_normalized = query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)
+    truth = np.argsort(-(q_normalized @ normalized.T), axis=1)[:, :k]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        builder = IndexBuilder(f=dimensions, metric="angular")
+        for vector in corpus:
+            builder.add_item(vector.tolist())
+        builder.build(trees=trees)
+        builder.save(tmp)
+        annoy_build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        save_vectors(tmp, corpus, "angular")
+        numpy_build = time.perf_counter() - start
+
+        quantized_builds = {}
+        for quantization in ("int8", "float16"):
+            start = time.perf_counter()
+            save_quantized_vectors(tmp, corpus, "angular", quantization)
+            quantized_builds[quantization] = time.perf_counter() - start
+
+        def file_size(*names: str) -> int:
+            return sum((Path(tmp) / name).stat().st_size for name in names)
+
+        annoy_index = AnnoyIndex.load(tmp)
+        numpy_index = NumpyIndex.load(tmp)
+        query_lists = [q.tolist() for q in query_vectors]
+
+        backends = [
+            ("annoy", annoy_index, annoy_build, file_size(ANNOY_FILE)),
+            ("numpy", numpy_index, numpy_build, file_size(VECTORS_FILE)),
+        ]
+        for quantization, build_time in quantized_builds.items():
+            size_bytes = file_size(*quantized_files(quantization))
+            backends += [
+                (
+                    f"{quantization}",
+                    QuantizedIndex.load(tmp, quantization, rerank=0),
+                    build_time,
+                    size_bytes,
+                ),
+                (
+                    f"{quantization}+rr",
+                    QuantizedIndex.load(tmp, quantization, rerank=rerank),
+                    build_time,
+                    size_bytes,
+                ),
+            ]
+
+        rows = []
+        for name, index, build_time, size_bytes in backends:
+            latencies = []
+            results = []
+            for q in query_lists:
+                start = time.perf_counter()
+                res = index.query(q, n=k)
+                latencies.append(time.perf_counter() - start)
+                results.append([r.i for r in res])
+            rows.append(
+                (
+                    name,
+                    build_time,
+                    size_bytes,
+                    recall_at_k(results, truth),
+                    percentile_ms(latencies, 50),
+                    percentile_ms(latencies, 99),
+                )
+            )
+
+        start = time.perf_counter()
+        for i in range(0, queries, batch_size):
+            numpy_index.query_batch(query_lists[i : i + batch_size], n=k)
+        batched_qps = queries / (time.perf_counter() - start)
+
+    print(f"\ncorpus={size} dimensions={dimensions} k={k} queries={queries}")
+    print(
+        f"{'backend':<11} {'build s':>9} {'file MB':>9} {'recall@k':>9} {'p50 ms':>9} {'p99 ms':>9}"
+    )
+    for name, build_time, size_bytes, recall, p50, p99 in rows:
+        print(
+            f"{name:<11} {build_time:9.2f} {size_bytes / 1e6:9.1f} {recall:9.3f} "
+            f"{p50:9.3f} {p99:9.3f}"
+        )
+    print(f"numpy query_batch({batch_size}): {batched_qps:.0f} queries/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--sizes", default="5000,20000,50000")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--trees", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--rerank", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    for size in (int(s) for s in args.sizes.split(",")):
+        benchmark_size(
+            rng,
+            size,
+            args.dimensions,
+            args.queries,
+            args.k,
+            args.trees,
+            args.batch_size,
+            args.rerank,
+        )
+
+
+if __name__ == "__main__":
+    main()
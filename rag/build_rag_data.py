@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
+import argparse
 import asyncio
 import logging
 from pathlib import Path
+from typing import Optional
 from dotenv import load_dotenv
 from rag_db_builder import RAGBuilder
 
@@ -15,7 +17,7 @@ logger = logging.getLogger("build-rag-data")
 load_dotenv()
 
 
-async def main() -> None:
+async def main(build_numpy_index: bool = False, quantization: Optional[str] = None) -> None:
     """
     Build the RAG database from the scraped docs content.
 
@@ -23,6 +25,11 @@ async def main() -> None:
         1. Run scrape_docs.py to scrape the docs content
         2. Run this script to build the RAG database
         3. The database will be created in the 'data' directory
+
+    Pass --numpy to also save the vectors for the exact NumPy index backend
+    (select it at runtime with RAG_INDEX_BACKEND=numpy), and --quantize int8
+    or --quantize float16 to save quantized vectors for a smaller in-memory
+    index (RAG_INDEX_BACKEND=int8 or float16).
     """
     # Check if raw_data.txt exists
     raw_data_path = Path(__file__).parent / "data/raw_data.txt"
@@ -41,13 +48,27 @@ async def main() -> None:
     await RAGBuilder.create_from_file(
         file_path=raw_data_path,
         index_path=output_dir,
-        data_path=output_dir / "paragraphs.pkl",
+        data_path=output_dir / "paragraphs.bin",
         embeddings_dimension=1536,
+        build_numpy_index=build_numpy_index,
+        quantization=quantization,
     )
     logger.info("RAG database successfully built!")
     logger.info(f"Index saved to: {output_dir}")
-    logger.info(f"Data saved to: {output_dir / 'paragraphs.pkl'}")
+    logger.info(f"Data saved to: {output_dir / 'paragraphs.bin'}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description="Build the RAG database")
+    parser.add_argument(
+        "--numpy",
+        action="store_true",
+        help="Also save vectors for the exact NumPy index backend",
+    )
+    parser.add_argument(
+        "--quantize",
+        choices=["int8", "float16"],
+        help="Also save quantized vectors for the quantized index backend",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(build_numpy_index=args.numpy, quantization=args.quantize))
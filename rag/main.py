@@ -11,16 +11,14 @@ Before running this agent:
 """
 
 import logging
-import pickle
+import os
 from pathlib import Path
-from typing import Literal, Any
-from collections.abc import Iterable
-from dataclasses import dataclass
+from typing import Optional
 from dotenv import load_dotenv
-import annoy
 
 from livekit.agents import (
     JobContext,
+    JobProcess,
     WorkerOptions,
     cli,
     RunContext,
@@ -28,10 +26,19 @@ from livekit.agents import (
     RoomInputOptions,
     Agent,
     AgentSession,
+    UserInputTranscribedEvent,
+    llm,
 )
 from livekit.plugins import openai, silero, deepgram, noise_cancellation
 from livekit.plugins.turn_detector.english import EnglishModel
 
+from rag.database import RAGDatabase, load_rag_database
+from rag.hybrid import HybridRetriever
+from rag.index import ItemBitmap
+from rag.prefetch import RAGPrefetcher
+from rag.registry import shared_tenant_registry, tenant_from_metadata
+from rag.query_embedding_cache import shared_query_embedding_cache
+
 # Load environment variables
 load_dotenv(dotenv_path=Path(__file__).parent.parent / ".env")
 
@@ -41,73 +48,20 @@ logging.basicConfig(
 )
 logger = logging.getLogger("rag-agent")
 
-# RAG Index Types and Classes
-Metric = Literal["angular", "euclidean", "manhattan", "hamming", "dot"]
-ANNOY_FILE = "index.annoy"
-METADATA_FILE = "metadata.pkl"
-
-
-@dataclass
-class _FileData:
-    f: int
-    metric: Metric
-    userdata: dict[int, Any]
-
-
-@dataclass
-class Item:
-    i: int
-    userdata: Any
-    vector: list[float]
-
-
-@dataclass
-class QueryResult:
-    userdata: Any
-    distance: float
-
-
-class AnnoyIndex:
-    def __init__(self, index: annoy.AnnoyIndex, filedata: _FileData) -> None:
-        self._index = index
-        self._filedata = filedata
+VDB_DIR = Path(__file__).parent / "data"
+DATA_PATH = VDB_DIR / "paragraphs.bin"
 
-    @classmethod
-    def load(cls, path: str) -> "AnnoyIndex":
-        p = Path(path)
-        index_path = p / ANNOY_FILE
-        metadata_path = p / METADATA_FILE
+# "annoy" (approximate), "numpy" (exact, needs build_rag_data.py --numpy) or
+# "int8" / "float16" (quantized, needs build_rag_data.py --quantize int8|float16)
+INDEX_BACKEND = os.getenv("RAG_INDEX_BACKEND", "annoy")
 
-        with open(metadata_path, "rb") as f:
-            metadata: _FileData = pickle.load(f)
+# Optional per-tenant databases in <RAG_TENANTS_DIR>/<tenant>/, chosen by the
+# "rag_tenant" key of the job or room metadata
+RAG_TENANTS_DIR = os.getenv("RAG_TENANTS_DIR")
+RAG_TENANTS_BUDGET_MB = int(os.getenv("RAG_TENANTS_BUDGET_MB", "2048"))
 
-        index = annoy.AnnoyIndex(metadata.f, metadata.metric)
-        index.load(str(index_path))
-        return cls(index, metadata)
-
-    @property
-    def size(self) -> int:
-        return self._index.get_n_items()
-
-    def items(self) -> Iterable[Item]:
-        for i in range(self._index.get_n_items()):
-            item = Item(
-                i=i,
-                userdata=self._filedata.userdata[i],
-                vector=self._index.get_item_vector(i),
-            )
-            yield item
-
-    def query(
-        self, vector: list[float], n: int, search_k: int = -1
-    ) -> list[QueryResult]:
-        ids = self._index.get_nns_by_vector(
-            vector, n, search_k=search_k, include_distances=True
-        )
-        return [
-            QueryResult(userdata=self._filedata.userdata[i], distance=distance)
-            for i, distance in zip(*ids)
-        ]
+# Speculatively search the docs on interim transcripts while the user speaks
+RAG_PREFETCH = os.getenv("RAG_PREFETCH", "1") == "1"
 
 
 class RAGEnrichedAgent(Agent):
@@ -115,8 +69,8 @@ class RAGEnrichedAgent(Agent):
     An agent that can answer questions using RAG (Retrieval Augmented Generation).
     """
 
-    def __init__(self) -> None:
-        """Initialize the RAG-enabled agent."""
+    def __init__(self, rag_db: Optional[RAGDatabase]) -> None:
+        """Initialize the RAG-enabled agent with the process-wide RAG database."""
         super().__init__(
             instructions="""
                 You are a helpful voice assistant specializing in knowledge about LiveKit ("live" pronounced as in "live stream").
@@ -125,66 +79,61 @@ class RAGEnrichedAgent(Agent):
             """,
         )
 
-        # Initialize RAG components
-        vdb_dir = Path(__file__).parent / "data"
-        data_path = vdb_dir / "paragraphs.pkl"
-
-        if not vdb_dir.exists() or not data_path.exists():
-            logger.warning(
-                "RAG database not found. Please run build_rag_data.py first:\n"
-                "$ python build_rag_data.py"
-            )
+        self._prefetcher: Optional[RAGPrefetcher] = None
+        if rag_db is None:
             return
 
-        # Load RAG index and data
-        self._index_path = vdb_dir
-        self._data_path = data_path
+        # The index and paragraphs are shared read-only with other sessions
         self._embeddings_dimension = 1536
         self._embeddings_model = "text-embedding-3-small"
-        self._seen_results = set()  # Track previously seen results
-
-        try:
-            self._annoy_index = AnnoyIndex.load(str(self._index_path))
-            with open(self._data_path, "rb") as f:
-                self._paragraphs_by_uuid = pickle.load(f)
-            logger.info("RAG database loaded successfully.")
-        except Exception as e:
-            logger.error(f"Failed to load RAG database: {e}")
+        self._seen_results = ItemBitmap()  # Paragraph ids already returned this session
+        self._paragraphs = rag_db.paragraphs
+        self._query_embeddings = shared_query_embedding_cache(
+            self._embeddings_model, self._embeddings_dimension
+        )
+        # BM25 + vector search; exact API names are answered without an embedding call
+        self._retriever = HybridRetriever(
+            rag_db.index, rag_db.bm25, self._query_embeddings
+        )
+        if RAG_PREFETCH:
+            self._prefetcher = RAGPrefetcher(
+                self._retriever, n=2, exclude=self._seen_results
+            )
 
     @function_tool
     async def livekit_docs_search(self, context: RunContext, query: str):
         """Lookup information in the LiveKit docs database. Will not return results already returned in previous lookups."""
         try:
-            # Generate embeddings for the query
-            query_embedding = await openai.create_embeddings(
-                input=[query],
-                model=self._embeddings_model,
-                dimensions=self._embeddings_dimension,
+            # Query the indexes for the top 2 results not returned before
+            if self._prefetcher is not None:
+                # Usually already searched while the user was speaking
+                lookup = await self._prefetcher.search(query)
+                new_results = lookup.results
+                stats = self._prefetcher.stats
+                logger.info(
+                    f"RAG prefetch {'hit' if lookup.hit else 'miss'} for query: {query}, "
+                    f"saved {lookup.time_saved * 1000:.0f}ms "
+                    f"(hit rate {stats.hit_rate:.0%}, total saved {stats.time_saved:.2f}s)"
+                )
+            else:
+                new_results = await self._retriever.search(
+                    query, n=2, exclude=self._seen_results
+                )
+            logger.debug(
+                f"Hybrid search: {self._retriever.stats}, "
+                f"query embedding cache: {self._query_embeddings.stats}"
             )
 
-            # Query the index for more results than we need to ensure we have enough new content
-            all_results = self._annoy_index.query(
-                query_embedding[0].embedding, n=5
-            )  # Get more results initially
-
-            # Filter out previously seen results
-            new_results = [
-                r for r in all_results if r.userdata not in self._seen_results
-            ]
-
-            # If we don't have enough new results, clear the seen results and start fresh
             if len(new_results) == 0:
                 return "No new results found."
-            else:
-                new_results = new_results[:2]  # Take top 2 new results
 
             # Build context from multiple relevant paragraphs
             context_parts = []
             for result in new_results:
                 # Add result to seen set
-                self._seen_results.add(result.userdata)
+                self._seen_results.add(result.i)
 
-                paragraph = self._paragraphs_by_uuid.get(result.userdata, "")
+                paragraph = self._paragraphs.get(result.i, "")
                 if paragraph:
                     # Extract source URL if available in the paragraph
                     source = "Unknown source"
@@ -209,15 +158,89 @@ class RAGEnrichedAgent(Agent):
 
     async def on_enter(self):
         """Called when the agent enters the session."""
+        if self._prefetcher is not None:
+            self.session.on("user_input_transcribed", self._on_user_input_transcribed)
         self.session.generate_reply(
             instructions="Briefly greet the user and offer your assistance with LiveKit."
         )
 
+    async def on_exit(self):
+        """Called when the agent leaves the session, e.g. on a handoff."""
+        if self._prefetcher is not None:
+            # on_enter registers it again if the agent is re-entered
+            self.session.off("user_input_transcribed", self._on_user_input_transcribed)
+
+    def _on_user_input_transcribed(self, ev: UserInputTranscribedEvent) -> None:
+        self._prefetcher.on_transcript(ev.transcript, ev.is_final)
+
+    async def on_user_turn_completed(
+        self, turn_ctx: llm.ChatContext, new_message: llm.ChatMessage
+    ) -> None:
+        """Called when the user's turn ends, before the LLM runs."""
+        if self._prefetcher is not None:
+            self._prefetcher.end_turn(new_message.text_content)
+
+
+def prewarm(proc: JobProcess):
+    """Load the RAG database once per worker process, before any job is assigned."""
+    if not VDB_DIR.exists() or not DATA_PATH.exists():
+        logger.warning(
+            "RAG database not found. Please run build_rag_data.py first:\n"
+            "$ python build_rag_data.py"
+        )
+        return
+
+    try:
+        proc.userdata["rag_db"] = load_rag_database(VDB_DIR, DATA_PATH, INDEX_BACKEND)
+        logger.info("RAG database loaded successfully.")
+    except Exception as e:
+        logger.error(f"Failed to load RAG database: {e}")
+
 
 async def entrypoint(ctx: JobContext):
     """Main entrypoint for the agent."""
     await ctx.connect()
 
+    rag_db: Optional[RAGDatabase] = ctx.proc.userdata.get("rag_db")
+
+    tenant = tenant_from_metadata(ctx.job.metadata, ctx.room.metadata)
+    if RAG_TENANTS_DIR and tenant:
+        registry = shared_tenant_registry(
+            RAG_TENANTS_DIR, INDEX_BACKEND, RAG_TENANTS_BUDGET_MB * 1024 * 1024
+        )
+        try:
+            tenant_db = await registry.get(tenant)
+        except (FileNotFoundError, ValueError) as e:
+            logger.warning(f"Falling back to the default RAG database: {e}")
+        else:
+            rag_db = tenant_db
+
+            async def release_tenant_db():
+                registry.release(tenant_db)
+
+            ctx.add_shutdown_callback(release_tenant_db)
+        stats = registry.stats
+        logger.info(
+            f"RAG tenant registry for {tenant}",
+            extra={
+                "rag_registry_size": stats.size,
+                "rag_registry_mapped_bytes": stats.mapped_bytes,
+                "rag_registry_hits": stats.hits,
+                "rag_registry_misses": stats.misses,
+                "rag_registry_evictions": stats.evictions,
+            },
+        )
+
+    if rag_db is not None:
+        logger.info(
+            "Using RAG database",
+            extra={
+                "rag_load_time": rag_db.metrics.load_time,
+                "rag_resident_bytes": rag_db.metrics.resident_bytes,
+                "rag_mapped_bytes": rag_db.metrics.mapped_bytes,
+            },
+        )
+
     session = AgentSession(
         stt=deepgram.STT(),
         llm=openai.LLM(model="gpt-4o"),
@@ -230,7 +253,7 @@ async def entrypoint(ctx: JobContext):
     )
 
     await session.start(
-        agent=RAGEnrichedAgent(),
+        agent=RAGEnrichedAgent(rag_db),
         room=ctx.room,
         room_input_options=RoomInputOptions(
             noise_cancellation=noise_cancellation.BVC(),
@@ -239,4 +262,4 @@ async def entrypoint(ctx: JobContext):
 
 
 if __name__ == "__main__":
-    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint))
+    cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
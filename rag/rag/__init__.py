@@ -0,0 +1,9 @@
+"""
+Shared building blocks for the RAG example: the vector index, the
+memory-mapped paragraph store, the process-wide database and the query
+embedding cache.
+
+Import from the submodules directly (e.g. `from rag.index import AnnoyIndex`);
+this package doesn't import them eagerly, so light tools don't pay for
+annoy, numpy or the OpenAI plugin.
+"""
@@ -0,0 +1,150 @@
+"""
+BM25 lexical index over the paragraph store.
+
+Embedding similarity is poor at exact identifiers such as
+`register_rpc_method`, which a lexical index matches directly. The index is
+built by RAGBuilder next to the vector index and stored in two files:
+
+    bm25_terms.json  document count, average length and, per term, the
+                     offset and document frequency of its postings
+    bm25.bin         document lengths (uint32) followed by the postings of
+                     every term as (doc id, term frequency) uint32 pairs
+
+The postings are memory-mapped, so only the vocabulary is read at load time.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, Iterable, Optional, Union
+
+TERMS_FILE = "bm25_terms.json"
+POSTINGS_FILE = "bm25.bin"
+
+_TOKEN = re.compile(r"[a-z0-9_]+")
+_POSTING = struct.Struct("<II")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercase word tokens. Identifiers keep their underscores, and their parts
+    are indexed too, so `register_rpc_method` matches both the exact name and
+    "register rpc method".
+    """
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+@dataclass
+class BM25Result:
+    i: int
+    score: float
+
+
+def build_bm25(path: Union[str, Path], documents: Iterable[str]) -> None:
+    """Build the BM25 index for `documents` (document i is paragraph i) at `path`."""
+    postings: dict[str, list[tuple[int, int]]] = {}
+    doc_lengths = array("I")
+
+    for doc_id, text in enumerate(documents):
+        tokens = tokenize(text)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc_id, tf))
+
+    p = Path(path)
+    p.mkdir(parents=True, exist_ok=True)
+
+    terms = {}
+    offset = len(doc_lengths) * doc_lengths.itemsize
+    tmp_postings = p / (POSTINGS_FILE + ".tmp")
+    with open(tmp_postings, "wb") as f:
+        f.write(doc_lengths.tobytes())
+        for term in sorted(postings):
+            pairs = postings[term]
+            terms[term] = [offset, len(pairs)]
+            flat = array("I", (v for pair in pairs for v in pair))
+            f.write(flat.tobytes())
+            offset += len(pairs) * _POSTING.size
+
+    n_docs = len(doc_lengths)
+    metadata = {
+        "n_docs": n_docs,
+        "avgdl": (sum(doc_lengths) / n_docs) if n_docs else 0.0,
+        "terms": terms,
+    }
+    tmp_terms = p / (TERMS_FILE + ".tmp")
+    with open(tmp_terms, "w") as f:
+        json.dump(metadata, f, separators=(",", ":"))
+
+    os.replace(tmp_postings, p / POSTINGS_FILE)
+    os.replace(tmp_terms, p / TERMS_FILE)
+
+
+class BM25Index:
+    def __init__(self, path: Union[str, Path], k1: float = 1.2, b: float = 0.75) -> None:
+        p = Path(path)
+        with open(p / TERMS_FILE, "r") as f:
+            metadata = json.load(f)
+
+        self._n_docs: int = metadata["n_docs"]
+        self._avgdl: float = metadata["avgdl"] or 1.0
+        self._terms: dict[str, list[int]] = metadata["terms"]
+        self._k1 = k1
+        self._b = b
+
+        with open(p / POSTINGS_FILE, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @classmethod
+    def exists(cls, path: Union[str, Path]) -> bool:
+        p = Path(path)
+        return (p / TERMS_FILE).exists() and (p / POSTINGS_FILE).exists()
+
+    @property
+    def size(self) -> int:
+        return self._n_docs
+
+    def _doc_length(self, doc_id: int) -> int:
+        return struct.unpack_from("<I", self._mmap, doc_id * 4)[0]
+
+    def query(
+        self, text: str, n: int, exclude: Optional[Collection[int]] = None
+    ) -> list[BM25Result]:
+        """Return up to `n` documents matching `text` that are not in `exclude`, best first."""
+        scores: dict[int, float] = {}
+        for term in set(tokenize(text)):
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+
+            offset, df = entry
+            idf = math.log(1.0 + (self._n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in _POSTING.iter_unpack(
+                self._mmap[offset : offset + df * _POSTING.size]
+            ):
+                norm = 1.0 - self._b + self._b * self._doc_length(doc_id) / self._avgdl
+                score = idf * tf * (self._k1 + 1.0) / (tf + self._k1 * norm)
+                scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        if exclude:
+            for doc_id in [doc_id for doc_id in scores if doc_id in exclude]:
+                del scores[doc_id]
+
+        best = heapq.nsmallest(n, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [BM25Result(i=doc_id, score=score) for doc_id, score in best]
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -0,0 +1,145 @@
+"""
+Process-wide, read-only RAG database shared by every session in a worker.
+
+Loading the Annoy index and the paragraph store once per process (from the
+worker's prewarm hook) means a new job can answer its first lookup without
+paying the index-load latency, and all sessions in the process read the same
+memory-mapped pages.
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from .bm25 import POSTINGS_FILE, BM25Index
+from .index import ANNOY_FILE, VECTORS_FILE, IndexBackend, IndexBackendName, load_index
+from .paragraph_store import ParagraphStore
+
+logger = logging.getLogger("rag-database")
+
+
+@dataclass
+class RAGDatabaseMetrics:
+    load_time: float
+    """Seconds spent loading the index and paragraph store"""
+    resident_bytes: int
+    """Growth of the process resident set size caused by the load"""
+    mapped_bytes: int
+    """Size of the memory-mapped files, shared through the page cache"""
+
+
+@dataclass
+class RAGDatabase:
+    index: IndexBackend
+    paragraphs: ParagraphStore
+    metrics: RAGDatabaseMetrics
+    bm25: Optional[BM25Index] = None
+    """Lexical index, if one was built alongside the vector index"""
+
+    def close(self) -> None:
+        """Release the index, paragraph and lexical index files."""
+        self.index.close()
+        self.paragraphs.close()
+        if self.bm25 is not None:
+            self.bm25.close()
+
+
+_databases: dict[tuple[str, str, str], RAGDatabase] = {}
+_lock = threading.Lock()
+
+
+def _resident_set_size() -> int:
+    """Current resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0
+
+    # ru_maxrss is a high-water mark, in bytes on macOS and KiB elsewhere
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def open_rag_database(
+    index_path: Union[str, Path],
+    data_path: Union[str, Path],
+    backend: IndexBackendName = "annoy",
+) -> RAGDatabase:
+    """
+    Load a RAG database without sharing it. Most callers want
+    `load_rag_database` (one copy per process) or a `TenantRegistry`.
+
+    Args:
+        index_path: Directory containing the index and its metadata
+        data_path: Path to the paragraph store file
+        backend: "annoy", "numpy", "int8" or "float16" (see `load_index`)
+    """
+    index_path = Path(index_path).resolve()
+    data_path = Path(data_path).resolve()
+
+    rss_before = _resident_set_size()
+    start = time.perf_counter()
+    index = load_index(index_path, backend)
+    paragraphs = ParagraphStore(data_path)
+    bm25 = BM25Index(index_path) if BM25Index.exists(index_path) else None
+    load_time = time.perf_counter() - start
+
+    if backend == "numpy":
+        mapped_files = [data_path, index_path / VECTORS_FILE]
+    elif backend in ("int8", "float16"):
+        from .quantized_index import quantized_files
+
+        mapped_files = [data_path] + [index_path / f for f in quantized_files(backend)]
+    else:
+        mapped_files = [data_path, index_path / ANNOY_FILE]
+    if bm25 is not None:
+        mapped_files.append(index_path / POSTINGS_FILE)
+    mapped_bytes = sum(f.stat().st_size for f in mapped_files)
+    metrics = RAGDatabaseMetrics(
+        load_time=load_time,
+        resident_bytes=max(0, _resident_set_size() - rss_before),
+        mapped_bytes=mapped_bytes,
+    )
+    logger.info(
+        f"Loaded RAG database from {index_path} in {load_time * 1000:.1f}ms "
+        f"(resident: {metrics.resident_bytes / 1e6:.1f}MB, "
+        f"mapped: {metrics.mapped_bytes / 1e6:.1f}MB)"
+    )
+
+    return RAGDatabase(index=index, paragraphs=paragraphs, metrics=metrics, bm25=bm25)
+
+
+def load_rag_database(
+    index_path: Union[str, Path],
+    data_path: Union[str, Path],
+    backend: IndexBackendName = "annoy",
+) -> RAGDatabase:
+    """
+    Return the process-wide RAG database for these paths, loading it on first use.
+
+    Args:
+        index_path: Directory containing the index and its metadata
+        data_path: Path to the paragraph store file
+        backend: "annoy", "numpy", "int8" or "float16" (see `load_index`)
+    """
+    index_path = Path(index_path).resolve()
+    data_path = Path(data_path).resolve()
+    key = (str(index_path), str(data_path), backend)
+
+    with _lock:
+        db = _databases.get(key)
+        if db is None:
+            db = open_rag_database(index_path, data_path, backend)
+            _databases[key] = db
+        return db
@@ -0,0 +1,105 @@
+"""
+Hybrid lexical + vector retrieval with reciprocal-rank fusion.
+
+The BM25 ranking is computed first because it is local and cheap. When it is
+confident on its own (a clear winner with a high score, which is what an
+exact API name like `register_rpc_method` produces), the embedding call and
+vector search are skipped entirely. Otherwise both rankings are merged with
+reciprocal-rank fusion.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Collection, Optional
+
+from .bm25 import BM25Index, BM25Result
+from .index import IndexBackend
+from .query_embedding_cache import QueryEmbeddingCache
+
+logger = logging.getLogger("rag-hybrid")
+
+
+@dataclass
+class HybridResult:
+    i: int
+    score: float
+    """
+    Reciprocal-rank fusion score (higher is better). Results answered by
+    BM25 alone are scored from their BM25 rank, on the same scale.
+    """
+
+
+@dataclass
+class HybridSearchStats:
+    searches: int = 0
+    lexical_only: int = 0
+    """Searches answered by BM25 alone, without an embedding call"""
+
+
+def reciprocal_rank_fusion(rankings: list[list[int]], k: int = 60) -> list[HybridResult]:
+    """Merge several rankings of item ids: score(i) = sum of 1 / (k + rank)."""
+    scores: dict[int, float] = {}
+    for ranking in rankings:
+        for rank, i in enumerate(ranking, start=1):
+            scores[i] = scores.get(i, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [HybridResult(i=i, score=score) for i, score in fused]
+
+
+class HybridRetriever:
+    def __init__(
+        self,
+        index: IndexBackend,
+        bm25: Optional[BM25Index],
+        query_embeddings: QueryEmbeddingCache,
+        *,
+        rrf_k: int = 60,
+        lexical_min_score: float = 8.0,
+        lexical_margin: float = 1.5,
+    ) -> None:
+        """
+        Args:
+            index: Vector index to search
+            bm25: Lexical index, or None for vector-only search
+            query_embeddings: Cache used to embed queries
+            rrf_k: Reciprocal-rank fusion constant
+            lexical_min_score: Minimum BM25 score of the top hit to skip the vector search
+            lexical_margin: Minimum ratio between the top two BM25 scores to skip the vector search
+        """
+        self._index = index
+        self._bm25 = bm25
+        self._query_embeddings = query_embeddings
+        self._rrf_k = rrf_k
+        self._lexical_min_score = lexical_min_score
+        self._lexical_margin = lexical_margin
+        self._stats = HybridSearchStats()
+
+    @property
+    def stats(self) -> HybridSearchStats:
+        return self._stats
+
+    def _lexically_confident(self, lexical: list[BM25Result]) -> bool:
+        if not lexical or lexical[0].score < self._lexical_min_score:
+            return False
+        return len(lexical) == 1 or lexical[0].score >= self._lexical_margin * lexical[1].score
+
+    async def search(
+        self, query: str, n: int, exclude: Optional[Collection[int]] = None
+    ) -> list[HybridResult]:
+        """Return up to `n` items for `query` that are not in `exclude`, best first."""
+        self._stats.searches += 1
+
+        # At least two hits, so the top one is always compared to a runner-up
+        lexical = self._bm25.query(query, max(n, 2), exclude) if self._bm25 is not None else []
+        if self._lexically_confident(lexical):
+            self._stats.lexical_only += 1
+            logger.debug(f"Answered {query!r} from BM25 alone")
+            return reciprocal_rank_fusion([[r.i for r in lexical]], k=self._rrf_k)[:n]
+
+        embedding = await self._query_embeddings.embed(query)
+        semantic = self._index.query(embedding, n, exclude=exclude)
+
+        fused = reciprocal_rank_fusion(
+            [[r.i for r in semantic], [r.i for r in lexical]], k=self._rrf_k
+        )
+        return fused[:n]
@@ -0,0 +1,234 @@
+"""
+Vector index used by the RAG builder, handler and agent.
+
+An index directory holds `metadata.json` (vector dimension and metric) plus
+the files of one or more search backends: `index.annoy` for AnnoyIndex,
+`vectors.npy` for the exact NumpyIndex and quantized vectors for
+QuantizedIndex. Item `i` in either backend is
+paragraph `i` in the paragraph store.
+
+Queries can exclude item ids, e.g. paragraphs a session has already seen,
+and still return `n` results; ItemBitmap is the compact way to hold them.
+
+`annoy` and `numpy` are only imported when an index is actually loaded or
+built, so tools that only read the metadata start fast.
+"""
+
+import json
+from collections.abc import Collection, Iterable, Iterator
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Literal, Optional, Protocol, Union
+
+if TYPE_CHECKING:
+    import annoy
+
+Metric = Literal["angular", "euclidean", "manhattan", "hamming", "dot"]
+IndexBackendName = Literal["annoy", "numpy", "int8", "float16"]
+ANNOY_FILE = "index.annoy"
+VECTORS_FILE = "vectors.npy"
+METADATA_FILE = "metadata.json"
+
+
+@dataclass
+class _FileData:
+    f: int
+    metric: Metric
+
+
+@dataclass
+class Item:
+    i: int
+    vector: list[float]
+
+
+@dataclass
+class QueryResult:
+    i: int
+    """Item id, which is also the paragraph id in the paragraph store"""
+    distance: float
+
+
+class ItemBitmap:
+    """A set of item ids stored as one bit per id."""
+
+    def __init__(self) -> None:
+        self._bits = bytearray()
+        self._count = 0
+
+    def add(self, i: int) -> None:
+        byte, bit = divmod(i, 8)
+        if byte >= len(self._bits):
+            self._bits.extend(bytes(byte + 1 - len(self._bits)))
+        if not self._bits[byte] >> bit & 1:
+            self._bits[byte] |= 1 << bit
+            self._count += 1
+
+    def clear(self) -> None:
+        self._bits = bytearray()
+        self._count = 0
+
+    def to_bytes(self) -> bytes:
+        """The bitmap, least significant bit of byte 0 being item 0."""
+        return bytes(self._bits)
+
+    def __contains__(self, i: object) -> bool:
+        if not isinstance(i, int) or i < 0:
+            return False
+        byte, bit = divmod(i, 8)
+        return byte < len(self._bits) and bool(self._bits[byte] >> bit & 1)
+
+    def __iter__(self) -> Iterator[int]:
+        for byte, value in enumerate(self._bits):
+            if value:
+                for bit in range(8):
+                    if value >> bit & 1:
+                        yield byte * 8 + bit
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class IndexBackend(Protocol):
+    """The query API shared by AnnoyIndex and NumpyIndex."""
+
+    @property
+    def size(self) -> int: ...
+
+    def items(self) -> Iterable[Item]: ...
+
+    def query(
+        self,
+        vector: list[float],
+        n: int,
+        search_k: int = -1,
+        exclude: Optional[Collection[int]] = None,
+    ) -> list[QueryResult]: ...
+
+    def close(self) -> None: ...
+
+
+def read_metadata(path: Union[str, Path]) -> _FileData:
+    """Read the vector dimension and metric of the index at `path`."""
+    with open(Path(path) / METADATA_FILE, "r") as f:
+        return _FileData(**json.load(f))
+
+
+def write_metadata(path: Union[str, Path], filedata: _FileData) -> None:
+    with open(Path(path) / METADATA_FILE, "w") as f:
+        json.dump(asdict(filedata), f)
+
+
+class AnnoyIndex:
+    def __init__(self, index: "annoy.AnnoyIndex", filedata: _FileData) -> None:
+        self._index = index
+        self._filedata = filedata
+
+    @classmethod
+    def load(cls, path: str) -> "AnnoyIndex":
+        import annoy
+
+        metadata = read_metadata(path)
+        index = annoy.AnnoyIndex(metadata.f, metadata.metric)
+        index.load(str(Path(path) / ANNOY_FILE))
+        return cls(index, metadata)
+
+    @property
+    def size(self) -> int:
+        return self._index.get_n_items()
+
+    def items(self) -> Iterable[Item]:
+        for i in range(self._index.get_n_items()):
+            yield Item(i=i, vector=self._index.get_item_vector(i))
+
+    def query(
+        self,
+        vector: list[float],
+        n: int,
+        search_k: int = -1,
+        exclude: Optional[Collection[int]] = None,
+    ) -> list[QueryResult]:
+        """
+        Return up to `n` approximate nearest items to `vector`, closest first.
+
+        Items in `exclude` are skipped. The search over-fetches by the number
+        of excluded items and keeps doubling the candidate count (and
+        `search_k` with it) until `n` other items are found or the whole
+        index has been returned.
+        """
+        if not exclude:
+            ids, distances = self._index.get_nns_by_vector(
+                vector, n, search_k=search_k, include_distances=True
+            )
+            return [QueryResult(i=i, distance=distance) for i, distance in zip(ids, distances)]
+
+        size = self.size
+        fetch = min(size, n + len(exclude))
+        while True:
+            ids, distances = self._index.get_nns_by_vector(
+                vector,
+                fetch,
+                search_k=search_k if search_k == -1 else search_k * fetch // max(n, 1),
+                include_distances=True,
+            )
+            results = [
+                QueryResult(i=i, distance=distance)
+                for i, distance in zip(ids, distances)
+                if i not in exclude
+            ]
+            if len(results) >= n or fetch >= size:
+                return results[:n]
+            fetch = min(size, fetch * 2)
+
+    def close(self) -> None:
+        """Unmap the index file; the index is empty afterwards."""
+        self._index.unload()
+
+
+class IndexBuilder:
+    def __init__(self, f: int, metric: Metric) -> None:
+        import annoy
+
+        self._index = annoy.AnnoyIndex(f, metric)
+        self._filedata = _FileData(f=f, metric=metric)
+        self._i = 0
+
+    def save(self, path: str) -> None:
+        p = Path(path)
+        p.mkdir(parents=True, exist_ok=True)
+        self._index.save(str(p / ANNOY_FILE))
+        write_metadata(p, self._filedata)
+
+    def build(self, trees: int = 50, jobs: int = -1) -> AnnoyIndex:
+        # n_jobs=-1 means use all available cores
+        self._index.build(n_trees=trees, n_jobs=jobs)
+        return AnnoyIndex(self._index, self._filedata)
+
+    def add_item(self, vector: list[float]) -> int:
+        """Add a vector to the index. Returns its item id."""
+        i = self._i
+        self._index.add_item(i, vector)
+        self._i += 1
+        return i
+
+
+def load_index(path: Union[str, Path], backend: IndexBackendName = "annoy") -> IndexBackend:
+    """
+    Load the index at `path` with the given search backend.
+
+    Args:
+        path: Index directory
+        backend: "annoy" for approximate search, "numpy" for exact search, or
+            "int8" / "float16" for a quantized scan with exact re-ranking
+    """
+    if backend == "annoy":
+        return AnnoyIndex.load(str(path))
+    if backend == "numpy":
+        from .numpy_index import NumpyIndex
+
+        return NumpyIndex.load(str(path))
+    if backend in ("int8", "float16"):
+        from .quantized_index import QuantizedIndex
+
+        return QuantizedIndex.load(str(path), backend)
+    raise ValueError(f"Unknown index backend: {backend!r}")
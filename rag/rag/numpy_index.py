@@ -0,0 +1,163 @@
+"""
+Exact vector search backend using NumPy.
+
+For corpora up to a few hundred thousand chunks a single float32 matrix
+product is both exact and faster than an approximate Annoy lookup. The
+vectors are stored as a `.npy` matrix next to the Annoy index and
+memory-mapped at load time, so processes share them through the page cache.
+
+`NumpyIndex` has the same `load` / `size` / `items` / `query` API as
+`AnnoyIndex`, so either can be handed to the agent as its index backend.
+"""
+
+from collections.abc import Collection, Iterable
+from pathlib import Path
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .index import VECTORS_FILE, Item, ItemBitmap, Metric, QueryResult, read_metadata
+
+SUPPORTED_METRICS = ("angular", "dot")
+
+
+def save_vectors(
+    path: str,
+    vectors: Sequence[Sequence[float]],
+    metric: Metric,
+    dimensions: Optional[int] = None,
+) -> None:
+    """
+    Save vectors as a float32 `.npy` matrix for NumpyIndex.
+
+    For the angular metric the rows are normalized up front, so a query is a
+    single matrix-vector product. `dimensions` is needed when `vectors` may be
+    empty, to save a (0, dimensions) matrix.
+    """
+    if metric not in SUPPORTED_METRICS:
+        raise ValueError(f"NumpyIndex does not support the {metric!r} metric")
+
+    p = Path(path)
+    p.mkdir(parents=True, exist_ok=True)
+    matrix = as_matrix(vectors, dimensions)
+    if metric == "angular":
+        matrix = _normalize(matrix)
+    np.save(p / VECTORS_FILE, matrix)
+
+
+def as_matrix(vectors: Sequence[Sequence[float]], dimensions: Optional[int]) -> np.ndarray:
+    """Stack `vectors` into a float32 matrix with one row per vector."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if dimensions is not None:
+        return matrix.reshape(len(vectors), dimensions)
+    if matrix.ndim != 2:
+        raise ValueError("Pass dimensions to save an empty set of vectors")
+    return matrix
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def exclusion_mask(exclude: Collection[int], size: int) -> np.ndarray:
+    """Boolean mask over `size` items, True for the ids in `exclude`."""
+    mask = np.zeros(size, dtype=bool)
+    if isinstance(exclude, ItemBitmap):
+        bits = np.unpackbits(
+            np.frombuffer(exclude.to_bytes(), dtype=np.uint8), bitorder="little"
+        )[:size]
+        mask[: len(bits)] = bits.astype(bool)
+    else:
+        ids = np.fromiter(exclude, dtype=np.int64, count=len(exclude))
+        mask[ids[(ids >= 0) & (ids < size)]] = True
+    return mask
+
+
+class NumpyIndex:
+    def __init__(self, vectors: np.ndarray, metric: Metric) -> None:
+        if metric not in SUPPORTED_METRICS:
+            raise ValueError(f"NumpyIndex does not support the {metric!r} metric")
+        self._vectors = vectors
+        self._metric = metric
+
+    @classmethod
+    def load(cls, path: str) -> "NumpyIndex":
+        metadata = read_metadata(path)
+        vectors = np.load(Path(path) / VECTORS_FILE, mmap_mode="r")
+        if vectors.shape[1] != metadata.f:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match metadata ({metadata.f})"
+            )
+        return cls(vectors, metadata.metric)
+
+    @property
+    def size(self) -> int:
+        return self._vectors.shape[0]
+
+    def items(self) -> Iterable[Item]:
+        for i in range(self.size):
+            yield Item(i=i, vector=self._vectors[i].tolist())
+
+    def query(
+        self,
+        vector: list[float],
+        n: int,
+        search_k: int = -1,
+        exclude: Optional[Collection[int]] = None,
+    ) -> list[QueryResult]:
+        """
+        Return the `n` nearest items to `vector` that are not in `exclude`,
+        closest first.
+
+        The search is exact, so `search_k` is accepted for API compatibility
+        with AnnoyIndex and ignored.
+        """
+        return self.query_batch([vector], n, exclude)[0]
+
+    def query_batch(
+        self,
+        vectors: Sequence[Sequence[float]],
+        n: int,
+        exclude: Optional[Collection[int]] = None,
+    ) -> list[list[QueryResult]]:
+        """Run several queries with a single matrix product."""
+        queries = np.asarray(vectors, dtype=np.float32)
+        if self._metric == "angular":
+            queries = _normalize(queries)
+
+        mask = exclusion_mask(exclude, self.size) if exclude else None
+        available = self.size - (int(mask.sum()) if mask is not None else 0)
+        n = min(n, available)
+        if n <= 0:
+            return [[] for _ in range(len(queries))]
+
+        scores = queries @ self._vectors.T
+        if mask is not None:
+            # Excluded items sort last, and n never reaches them
+            scores[:, mask] = -np.inf
+        # Partial sort: only the top n columns of each row are ordered
+        top = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        if self._metric == "angular":
+            # Same distance Annoy reports for angular: sqrt(2 - 2 * cos)
+            distances = np.sqrt(np.maximum(2.0 - 2.0 * top_scores, 0.0))
+        else:
+            distances = top_scores
+
+        return [
+            [QueryResult(i=int(i), distance=float(d)) for i, d in zip(row_ids, row_dist)]
+            for row_ids, row_dist in zip(top, distances)
+        ]
+
+    def close(self) -> None:
+        """Drop the mapped matrix; the index is empty afterwards."""
+        # numpy has no safe way to unmap a live memmap: closing it under an
+        # array that still points into it crashes. The file is unmapped once
+        # the last reference is gone.
+        self._vectors = np.empty((0, self._vectors.shape[1]), dtype=np.float32)
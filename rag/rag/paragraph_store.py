@@ -0,0 +1,88 @@
+"""
+Memory-mapped, pickle-free paragraph store for the RAG index.
+
+The store is a single file laid out as:
+
+    header   magic (4 bytes) | version (uint32) | count (uint64)
+    offsets  (count + 1) x uint64, little-endian byte offsets into the blob
+    blob     all paragraphs, UTF-8 encoded and concatenated
+
+Paragraph `i` is the paragraph for Annoy item `i`. Opening the store only maps
+the file, so every agent process on a host shares the same pages through the
+OS page cache and a lookup is O(1) without deserializing the whole store.
+"""
+
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Iterable, Optional, Union
+
+MAGIC = b"LKPS"
+VERSION = 1
+_HEADER = struct.Struct("<4sIQ")
+_OFFSET = struct.Struct("<Q")
+
+
+class ParagraphStore:
+    def __init__(self, path: Union[str, Path]) -> None:
+        self._path = Path(path)
+        with open(self._path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self._path} is not a paragraph store")
+        if version != VERSION:
+            raise ValueError(
+                f"Unsupported paragraph store version {version} in {self._path}"
+            )
+
+        self._count = count
+        self._offsets_start = _HEADER.size
+        self._blob_start = self._offsets_start + (count + 1) * _OFFSET.size
+
+    @staticmethod
+    def write(path: Union[str, Path], paragraphs: Iterable[str]) -> None:
+        """
+        Write paragraphs to a new store at `path`.
+
+        The file is written next to the target and renamed into place, so
+        processes that already have the old store mapped keep reading it.
+        """
+        path = Path(path)
+        encoded = [p.encode("utf-8") for p in paragraphs]
+
+        offsets = [0]
+        for data in encoded:
+            offsets.append(offsets[-1] + len(data))
+
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, len(encoded)))
+            f.write(struct.pack(f"<{len(offsets)}Q", *offsets))
+            for data in encoded:
+                f.write(data)
+        os.replace(tmp_path, path)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> str:
+        if not 0 <= i < self._count:
+            raise IndexError(f"paragraph id {i} out of range")
+        start, end = struct.unpack_from(
+            "<2Q", self._mmap, self._offsets_start + i * _OFFSET.size
+        )
+        return self._mmap[self._blob_start + start : self._blob_start + end].decode(
+            "utf-8"
+        )
+
+    def get(self, i: int, default: Optional[str] = None) -> Optional[str]:
+        try:
+            return self[i]
+        except IndexError:
+            return default
+
+    def close(self) -> None:
+        self._mmap.close()
@@ -0,0 +1,190 @@
+"""
+Speculative retrieval on in-progress user transcripts.
+
+The docs search tool normally starts only after the LLM has decided to call
+it, so its latency is added on top of the LLM's first pass. RAGPrefetcher
+runs the same hybrid search on the user's interim and final transcripts while
+they are still speaking, and keeps the results by normalized text. When the
+tool is called, a prefetched search whose text covers the tool query is used
+instead of starting a new one.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Collection, Optional
+
+from .hybrid import HybridResult, HybridRetriever
+from .query_embedding_cache import QueryEmbeddingCache
+
+logger = logging.getLogger("rag-prefetch")
+
+_WORD = re.compile(r"[a-z0-9_]+")
+
+
+@dataclass
+class PrefetchStats:
+    prefetches: int = 0
+    hits: int = 0
+    misses: int = 0
+    time_saved: float = 0.0
+    """Total seconds of search latency taken off tool calls"""
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class PrefetchLookup:
+    results: list[HybridResult]
+    hit: bool
+    time_saved: float
+    """Seconds of search latency this lookup avoided"""
+
+
+class _Prefetch:
+    def __init__(self, text: str, task: asyncio.Task) -> None:
+        self.text = text
+        self.words = set(_WORD.findall(QueryEmbeddingCache.normalize(text)))
+        self.task = task
+        self.started_at = time.perf_counter()
+        self.duration: Optional[float] = None
+        task.add_done_callback(self._on_done)
+
+    def _on_done(self, _: asyncio.Task) -> None:
+        self.duration = time.perf_counter() - self.started_at
+
+
+class RAGPrefetcher:
+    def __init__(
+        self,
+        retriever: HybridRetriever,
+        *,
+        n: int = 5,
+        min_words: int = 3,
+        min_overlap: float = 0.8,
+        max_entries: int = 8,
+        exclude: Optional[Collection[int]] = None,
+    ) -> None:
+        """
+        Args:
+            retriever: Retriever used for both prefetches and regular searches
+            n: Number of results to fetch, which should match the tool's
+            min_words: Minimum number of words in a transcript before it is prefetched
+            min_overlap: Fraction of the tool query's words a prefetched
+                transcript must contain to be used for it
+            max_entries: Number of prefetched searches to keep
+            exclude: Item ids to leave out of every search, such as the
+                session's seen results; read at search time, so it may change
+        """
+        self._retriever = retriever
+        self._n = n
+        self._min_words = min_words
+        self._min_overlap = min_overlap
+        self._max_entries = max_entries
+        self._exclude = exclude
+        self._entries: OrderedDict[str, _Prefetch] = OrderedDict()
+        self._final_text = ""
+        self._stats = PrefetchStats()
+
+    @property
+    def stats(self) -> PrefetchStats:
+        return self._stats
+
+    def on_transcript(self, transcript: str, is_final: bool) -> None:
+        """
+        Feed an STT transcript of the current user turn.
+
+        Final segments are accumulated, and each interim transcript is
+        prefetched together with the finals before it. Interim prefetches are
+        skipped while another prefetch is still running, so a fast stream of
+        interim results costs at most one search at a time.
+        """
+        text = f"{self._final_text} {transcript}".strip()
+        if is_final:
+            self._final_text = text
+        elif any(not entry.task.done() for entry in self._entries.values()):
+            return
+        self.prefetch(text)
+
+    def end_turn(self, text: Optional[str] = None) -> None:
+        """Prefetch the completed user message and start a new turn."""
+        if text:
+            self.prefetch(text)
+        self._final_text = ""
+
+    def prefetch(self, text: str) -> None:
+        key = QueryEmbeddingCache.normalize(text)
+        if len(_WORD.findall(key)) < self._min_words or key in self._entries:
+            return
+
+        self._stats.prefetches += 1
+        # Search the transcript as written; the normalized key only dedupes
+        task = asyncio.create_task(self._retriever.search(text, self._n, self._exclude))
+        # A failed prefetch is only a missed optimization; log it and let the
+        # tool call search again
+        task.add_done_callback(self._log_failure)
+        self._entries[key] = _Prefetch(text, task)
+        while len(self._entries) > self._max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.task.cancel()
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"RAG prefetch failed: {task.exception()}")
+
+    def _match(self, query: str) -> Optional[_Prefetch]:
+        key = QueryEmbeddingCache.normalize(query)
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+
+        words = set(_WORD.findall(key))
+        if not words:
+            return None
+        # Most recent (and so most complete) transcript first
+        for entry in reversed(self._entries.values()):
+            if len(words & entry.words) / len(words) >= self._min_overlap:
+                return entry
+        return None
+
+    async def search(self, query: str) -> PrefetchLookup:
+        """Return results for `query`, from a prefetched search when one matches."""
+        lookup_at = time.perf_counter()
+        entry = self._match(query)
+        if entry is not None and not entry.task.cancelled():
+            try:
+                results = await asyncio.shield(entry.task)
+            except asyncio.CancelledError:
+                # The prefetch was evicted while we waited on it: search
+                # directly, unless it is this lookup that was cancelled
+                if not entry.task.cancelled():
+                    raise
+                results = None
+            except Exception:
+                results = None
+
+            if results is not None and self._exclude:
+                # Items seen after the prefetch started must not be returned;
+                # search the prefetched text again (its embedding is cached)
+                unseen = [r for r in results if r.i not in self._exclude]
+                if len(unseen) < len(results):
+                    query, results = entry.text, None
+
+            if results is not None:
+                # A fresh search would have finished at lookup_at + duration;
+                # the prefetch finished duration after it started
+                saved = min(entry.duration or 0.0, lookup_at - entry.started_at)
+                self._stats.hits += 1
+                self._stats.time_saved += saved
+                return PrefetchLookup(results=results, hit=True, time_saved=saved)
+
+        self._stats.misses += 1
+        results = await self._retriever.search(query, self._n, self._exclude)
+        return PrefetchLookup(results=results, hit=False, time_saved=0.0)
@@ -0,0 +1,241 @@
+"""
+Scalar-quantized vector search backend.
+
+The vectors are stored as int8 codes with a per-dimension scale, or as
+float16, which makes the matrix that every query scans 4x (int8) or 2x
+(float16) smaller than float32, in memory and on disk. A query scans the
+quantized matrix block by block, keeps the best `rerank` candidates and
+re-scores them exactly against the float32 `vectors.npy` saved for
+NumpyIndex. Those rows are read with pread rather than memory-mapped, so the
+float32 matrix never becomes part of the process's resident set.
+
+Files, next to the Annoy index:
+
+    vectors.q8.npy     int8 codes (int8 quantization)
+    vector_scales.npy  float32 scale per dimension (int8 quantization)
+    vectors.f16.npy    float16 vectors (float16 quantization)
+
+float16 halves memory but converting it is slow on most CPUs; int8 scans
+about as fast as float32.
+"""
+
+import os
+from collections.abc import Collection, Iterable
+from pathlib import Path
+from typing import Literal, Optional, Sequence
+
+import numpy as np
+
+from .index import VECTORS_FILE, Item, Metric, QueryResult, read_metadata
+from .numpy_index import SUPPORTED_METRICS, _normalize, as_matrix, exclusion_mask
+
+Quantization = Literal["int8", "float16"]
+INT8_FILE = "vectors.q8.npy"
+SCALES_FILE = "vector_scales.npy"
+FLOAT16_FILE = "vectors.f16.npy"
+
+# Rows converted to float32 at a time while scanning; small enough that the
+# converted block stays in cache for the matrix-vector product
+_BLOCK_ROWS = 256
+
+
+def quantized_files(quantization: Quantization) -> list[str]:
+    """Names of the files that hold vectors quantized with `quantization`."""
+    if quantization == "int8":
+        return [INT8_FILE, SCALES_FILE]
+    if quantization == "float16":
+        return [FLOAT16_FILE]
+    raise ValueError(f"Unknown quantization: {quantization!r}")
+
+
+def save_quantized_vectors(
+    path: str,
+    vectors: Sequence[Sequence[float]],
+    metric: Metric,
+    quantization: Quantization,
+    dimensions: Optional[int] = None,
+) -> None:
+    """
+    Save vectors for QuantizedIndex.
+
+    For the angular metric the rows are normalized before quantization, so a
+    query is a single matrix-vector product. int8 codes use a symmetric scale
+    per dimension: code = round(x / scale), scale = max |x| / 127.
+    `dimensions` is needed when `vectors` may be empty.
+    """
+    if metric not in SUPPORTED_METRICS:
+        raise ValueError(f"QuantizedIndex does not support the {metric!r} metric")
+    files = quantized_files(quantization)
+
+    p = Path(path)
+    p.mkdir(parents=True, exist_ok=True)
+    matrix = as_matrix(vectors, dimensions)
+    if metric == "angular":
+        matrix = _normalize(matrix)
+
+    if quantization == "float16":
+        np.save(p / files[0], matrix.astype(np.float16))
+        return
+
+    scales = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1])
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(matrix / scales), -127, 127).astype(np.int8)
+    np.save(p / files[0], codes)
+    np.save(p / files[1], scales.astype(np.float32))
+
+
+class _FloatRows:
+    """Random access to rows of a float32 `.npy` matrix without mapping it."""
+
+    def __init__(self, path: Path) -> None:
+        with open(path, "rb") as f:
+            if np.lib.format.read_magic(f) == (1, 0):
+                shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+            self._offset = f.tell()
+        self._dtype = dtype
+        self._row_bytes = shape[1] * dtype.itemsize
+        self._fd = os.open(path, os.O_RDONLY)
+
+    def rows(self, ids: Sequence[int]) -> np.ndarray:
+        data = b"".join(
+            os.pread(self._fd, self._row_bytes, self._offset + int(i) * self._row_bytes)
+            for i in ids
+        )
+        return np.frombuffer(data, dtype=self._dtype).reshape(len(ids), -1)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class QuantizedIndex:
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        scales: Optional[np.ndarray],
+        metric: Metric,
+        exact: Optional[_FloatRows] = None,
+        rerank: int = 50,
+    ) -> None:
+        """
+        Args:
+            vectors: int8 codes or float16 vectors, one row per item
+            scales: Per-dimension scale of int8 codes, None for float16
+            metric: "angular" or "dot"
+            exact: The float32 vectors used for re-ranking
+            rerank: Number of candidates re-scored exactly (0 to disable)
+        """
+        if metric not in SUPPORTED_METRICS:
+            raise ValueError(f"QuantizedIndex does not support the {metric!r} metric")
+        self._vectors = vectors
+        self._scales = scales
+        self._metric = metric
+        self._exact = exact
+        self._rerank = rerank
+
+    @classmethod
+    def load(
+        cls, path: str, quantization: Quantization = "int8", rerank: int = 50
+    ) -> "QuantizedIndex":
+        p = Path(path)
+        metadata = read_metadata(path)
+        files = quantized_files(quantization)
+        vectors = np.load(p / files[0], mmap_mode="r")
+        scales = np.load(p / files[1]) if quantization == "int8" else None
+        if vectors.shape[1] != metadata.f:
+            raise ValueError(
+                f"Vector dimension {vectors.shape[1]} does not match metadata ({metadata.f})"
+            )
+
+        exact = None
+        if rerank > 0 and (p / VECTORS_FILE).exists():
+            exact = _FloatRows(p / VECTORS_FILE)
+        return cls(vectors, scales, metadata.metric, exact, rerank)
+
+    @property
+    def size(self) -> int:
+        return self._vectors.shape[0]
+
+    def _dequantize(self, rows: np.ndarray) -> np.ndarray:
+        rows = rows.astype(np.float32)
+        return rows * self._scales if self._scales is not None else rows
+
+    def items(self) -> Iterable[Item]:
+        # Approximate (quantized) vectors, or the exact ones when available
+        for i in range(self.size):
+            if self._exact is not None:
+                vector = self._exact.rows([i])[0].tolist()
+            else:
+                vector = self._dequantize(self._vectors[i]).tolist()
+            yield Item(i=i, vector=vector)
+
+    def _scan(self, query: np.ndarray) -> np.ndarray:
+        """Approximate scores of every item, converting one block at a time."""
+        # For int8, fold the scales into the query instead of the matrix
+        weights = query * self._scales if self._scales is not None else query
+        scores = np.empty(self.size, dtype=np.float32)
+        buffer = np.empty((_BLOCK_ROWS, self._vectors.shape[1]), dtype=np.float32)
+        for start in range(0, self.size, _BLOCK_ROWS):
+            block = self._vectors[start : start + _BLOCK_ROWS]
+            converted = buffer[: len(block)]
+            np.copyto(converted, block, casting="unsafe")
+            np.dot(converted, weights, out=scores[start : start + len(block)])
+        return scores
+
+    def _exact_scores(self, query: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        # vectors.npy rows are already normalized for the angular metric
+        return self._exact.rows(ids) @ query
+
+    def query(
+        self,
+        vector: list[float],
+        n: int,
+        search_k: int = -1,
+        exclude: Optional[Collection[int]] = None,
+    ) -> list[QueryResult]:
+        """
+        Return the `n` nearest items to `vector` that are not in `exclude`,
+        closest first.
+
+        The best max(n, rerank) items by quantized score are re-scored
+        exactly. `search_k` is accepted for API compatibility with AnnoyIndex
+        and ignored.
+        """
+        query = np.asarray(vector, dtype=np.float32)
+        if self._metric == "angular":
+            query = _normalize(query)
+
+        scores = self._scan(query)
+        available = self.size
+        if exclude:
+            mask = exclusion_mask(exclude, self.size)
+            scores[mask] = -np.inf
+            available -= int(mask.sum())
+
+        n = min(n, available)
+        if n <= 0:
+            return []
+
+        candidates = min(max(n, self._rerank if self._exact is not None else n), available)
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top_scores = scores[top]
+        if self._exact is not None:
+            top_scores = self._exact_scores(query, top)
+
+        order = np.argsort(-top_scores)[:n]
+        top, top_scores = top[order], top_scores[order]
+
+        if self._metric == "angular":
+            # Same distance Annoy reports for angular: sqrt(2 - 2 * cos)
+            distances = np.sqrt(np.maximum(2.0 - 2.0 * top_scores, 0.0))
+        else:
+            distances = top_scores
+        return [QueryResult(i=int(i), distance=float(d)) for i, d in zip(top, distances)]
+
+    def close(self) -> None:
+        """Drop the mapped matrix and close the re-ranking file; the index is empty afterwards."""
+        self._vectors = np.empty((0, self._vectors.shape[1]), dtype=self._vectors.dtype)
+        if self._exact is not None:
+            self._exact.close()
+            self._exact = None
@@ -0,0 +1,132 @@
+"""
+In-process LRU cache for query embeddings.
+
+Voice users ask the same few questions over and over, and every docs lookup
+starts with an embeddings round-trip. Caching embeddings by the normalized
+query skips that round-trip for repeats, and concurrent lookups of the same
+query share a single in-flight request. The normalized text is only the cache
+key: a miss embeds the query as the caller wrote it, so the vectors are the
+same with or without the cache.
+"""
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import aiohttp
+
+logger = logging.getLogger("query-embedding-cache")
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCTUATION = re.compile(r"[\s?!.,;:]+$")
+
+
+@dataclass
+class QueryEmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    """Lookups that waited on another caller's in-flight request"""
+    evictions: int = 0
+    size: int = 0
+
+
+class QueryEmbeddingCache:
+    def __init__(
+        self,
+        *,
+        model: str = "text-embedding-3-small",
+        dimensions: int = 1536,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+    ) -> None:
+        """
+        Args:
+            model: OpenAI model to use for embeddings
+            dimensions: Dimension of embeddings to use
+            max_size: Maximum number of cached queries
+            ttl: Seconds a cached embedding stays valid
+        """
+        self._model = model
+        self._dimensions = dimensions
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries: OrderedDict[str, tuple[float, list[float]]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._stats = QueryEmbeddingCacheStats()
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query so trivially different phrasings share an entry."""
+        query = _WHITESPACE.sub(" ", query.strip().lower())
+        return _TRAILING_PUNCTUATION.sub("", query)
+
+    @property
+    def stats(self) -> QueryEmbeddingCacheStats:
+        self._stats.size = len(self._entries)
+        return self._stats
+
+    async def embed(
+        self, query: str, http_session: Optional["aiohttp.ClientSession"] = None
+    ) -> list[float]:
+        """Return the embedding for `query`, from the cache when possible."""
+        key = self.normalize(query)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, embedding = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._stats.hits += 1
+                return embedding
+            del self._entries[key]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats.coalesced += 1
+        else:
+            self._stats.misses += 1
+            task = asyncio.create_task(self._fetch(key, query, http_session))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+
+        # Shield so a cancelled caller (e.g. an interrupted turn) doesn't
+        # cancel the request other callers are waiting on
+        return await asyncio.shield(task)
+
+    async def _fetch(
+        self, key: str, query: str, http_session: Optional["aiohttp.ClientSession"]
+    ) -> list[float]:
+        from livekit.plugins import openai
+
+        results = await openai.create_embeddings(
+            input=[query],
+            model=self._model,
+            dimensions=self._dimensions,
+            http_session=http_session,
+        )
+        embedding = results[0].embedding
+
+        self._entries[key] = (time.monotonic() + self._ttl, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self._stats.evictions += 1
+
+        return embedding
+
+
+_caches: dict[tuple[str, int], QueryEmbeddingCache] = {}
+
+
+def shared_query_embedding_cache(model: str, dimensions: int) -> QueryEmbeddingCache:
+    """Return the process-wide query embedding cache for a model and dimension."""
+    key = (model, dimensions)
+    if key not in _caches:
+        _caches[key] = QueryEmbeddingCache(model=model, dimensions=dimensions)
+    return _caches[key]
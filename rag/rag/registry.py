@@ -0,0 +1,206 @@
+"""
+Per-tenant RAG databases with a byte-budgeted LRU.
+
+Each tenant has its own docs corpus in `<root>/<tenant>/` (the index files
+plus `paragraphs.bin`, as written by RAGBuilder). The registry loads a
+tenant's database the first time a job asks for it and keeps recently used
+ones open. Once the mapped size of the open databases exceeds the budget,
+the least recently used tenants are evicted and their files closed. Every
+`get()` leases the database until the matching `release()`, so a database
+evicted while sessions still use it is closed when the last one releases it.
+
+The tenant of a job is read from the job or room metadata, e.g.
+`{"rag_tenant": "acme"}`.
+"""
+
+import asyncio
+import json
+import logging
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+from .database import RAGDatabase, open_rag_database
+from .index import IndexBackendName
+
+logger = logging.getLogger("rag-registry")
+
+DATA_FILE = "paragraphs.bin"
+TENANT_METADATA_KEYS = ("rag_tenant", "tenant")
+
+_TENANT = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+@dataclass
+class TenantRegistryStats:
+    size: int = 0
+    """Number of open tenant databases"""
+    mapped_bytes: int = 0
+    """Mapped size of the open databases, counted against the budget"""
+    hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    """Lookups that waited on another caller's load of the same tenant"""
+    evictions: int = 0
+
+
+@dataclass
+class _Load:
+    task: asyncio.Task
+    waiters: int = 0
+    """Callers waiting on the task, each leased the database when it loads"""
+
+
+def tenant_from_metadata(*metadata: Optional[str]) -> Optional[str]:
+    """
+    Return the tenant named in the first JSON metadata string that has one.
+
+    Args:
+        metadata: Job and/or room metadata strings, in order of precedence
+    """
+    for raw in metadata:
+        if not raw:
+            continue
+        try:
+            parsed = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(parsed, dict):
+            continue
+        for key in TENANT_METADATA_KEYS:
+            if parsed.get(key):
+                return str(parsed[key])
+    return None
+
+
+class TenantRegistry:
+    def __init__(
+        self,
+        root: Union[str, Path],
+        backend: IndexBackendName = "annoy",
+        max_bytes: int = 2 * 1024**3,
+    ) -> None:
+        """
+        Args:
+            root: Directory with one subdirectory per tenant
+            backend: Index backend used for every tenant
+            max_bytes: Budget for the mapped size of the open databases. The
+                most recently used database is always kept, even if it alone
+                exceeds the budget.
+        """
+        self._root = Path(root).resolve()
+        self._backend = backend
+        self._max_bytes = max_bytes
+        self._databases: OrderedDict[str, RAGDatabase] = OrderedDict()
+        self._loading: dict[str, _Load] = {}
+        # Outstanding leases and evicted databases still leased, by id(db)
+        self._leases: dict[int, int] = {}
+        self._evicted: dict[int, RAGDatabase] = {}
+        self._stats = TenantRegistryStats()
+
+    @property
+    def stats(self) -> TenantRegistryStats:
+        self._stats.size = len(self._databases)
+        self._stats.mapped_bytes = self._mapped_bytes()
+        return self._stats
+
+    def tenant_path(self, tenant: str) -> Path:
+        if not _TENANT.match(tenant):
+            raise ValueError(f"Invalid tenant name: {tenant!r}")
+        return self._root / tenant
+
+    def _mapped_bytes(self) -> int:
+        return sum(db.metrics.mapped_bytes for db in self._databases.values())
+
+    async def get(self, tenant: str) -> RAGDatabase:
+        """
+        Return the tenant's database, loading it if it isn't open. Pass it to
+        `release()` once the session is done with it.
+        """
+        db = self._databases.get(tenant)
+        if db is not None:
+            self._databases.move_to_end(tenant)
+            self._stats.hits += 1
+            self._leases[id(db)] = self._leases.get(id(db), 0) + 1
+            return db
+
+        load = self._loading.get(tenant)
+        if load is not None:
+            self._stats.coalesced += 1
+        else:
+            self._stats.misses += 1
+            path = self.tenant_path(tenant)
+            if not (path / DATA_FILE).exists():
+                raise FileNotFoundError(f"No RAG database for tenant {tenant!r} at {path}")
+            load = _Load(asyncio.create_task(self._load(tenant, path)))
+            self._loading[tenant] = load
+            load.task.add_done_callback(lambda _: self._forget_load(tenant, load))
+
+        load.waiters += 1
+        try:
+            # Shield so a cancelled job doesn't cancel a load other jobs wait on
+            return await asyncio.shield(load.task)
+        except asyncio.CancelledError:
+            if load.task.done() and not load.task.cancelled() and load.task.exception() is None:
+                self.release(load.task.result())
+            else:
+                load.waiters -= 1
+            raise
+
+    def release(self, db: RAGDatabase) -> None:
+        """Return a lease taken by `get()`, closing the database if it was evicted."""
+        leases = self._leases.get(id(db), 0) - 1
+        if leases > 0:
+            self._leases[id(db)] = leases
+            return
+        self._leases.pop(id(db), None)
+        if self._evicted.pop(id(db), None) is not None:
+            db.close()
+
+    def _forget_load(self, tenant: str, load: _Load) -> None:
+        if self._loading.get(tenant) is load:
+            del self._loading[tenant]
+
+    async def _load(self, tenant: str, path: Path) -> RAGDatabase:
+        # Opening the files is blocking I/O; keep it off the event loop
+        db = await asyncio.to_thread(open_rag_database, path, path / DATA_FILE, self._backend)
+        # Lease it to every caller waiting on this load before anything can
+        # evict it, and stop new callers from joining the finished load
+        load = self._loading.pop(tenant)
+        self._leases[id(db)] = load.waiters
+        self._databases[tenant] = db
+        self._evict()
+        return db
+
+    def _evict(self) -> None:
+        mapped = self._mapped_bytes()
+        while mapped > self._max_bytes and len(self._databases) > 1:
+            tenant, db = self._databases.popitem(last=False)
+            mapped -= db.metrics.mapped_bytes
+            self._stats.evictions += 1
+            logger.info(
+                f"Evicted RAG database of tenant {tenant} "
+                f"({db.metrics.mapped_bytes / 1e6:.1f}MB mapped)"
+            )
+            if self._leases.get(id(db), 0) > 0:
+                # Closed by the last release()
+                self._evicted[id(db)] = db
+            else:
+                db.close()
+
+
+_registries: dict[tuple[str, str], TenantRegistry] = {}
+
+
+def shared_tenant_registry(
+    root: Union[str, Path],
+    backend: IndexBackendName = "annoy",
+    max_bytes: int = 2 * 1024**3,
+) -> TenantRegistry:
+    """Return the process-wide registry for a tenants directory and backend."""
+    key = (str(Path(root).resolve()), backend)
+    if key not in _registries:
+        _registries[key] = TenantRegistry(root, backend, max_bytes)
+    return _registries[key]
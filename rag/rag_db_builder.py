@@ -1,112 +1,110 @@
-import pickle
-import uuid
+import asyncio
+import base64
+import hashlib
+import os
+import sqlite3
+import struct
 import logging
+from array import array
 from pathlib import Path
-from typing import List, Optional, Union, Literal, Callable, Any
-from collections.abc import Iterable
-from dataclasses import dataclass
+from typing import List, Optional, TextIO, Union, Callable
+from collections.abc import Iterable, Iterator
 import aiohttp
 from tqdm import tqdm
-import annoy
 
 from livekit.agents import tokenize
-from livekit.plugins import openai
 
-logger = logging.getLogger("rag-builder")
-
-# RAG Index Types and Classes
-Metric = Literal["angular", "euclidean", "manhattan", "hamming", "dot"]
-ANNOY_FILE = "index.annoy"
-METADATA_FILE = "metadata.pkl"
+from rag.bm25 import build_bm25
+from rag.index import IndexBuilder
+from rag.paragraph_store import ParagraphStore
 
+logger = logging.getLogger("rag-builder")
 
-@dataclass
-class _FileData:
-    f: int
-    metric: Metric
-    userdata: dict[int, Any]
+# Index Files
+EMBEDDINGS_CACHE_FILE = "embeddings.sqlite"
 
+# Embeddings API
+EMBEDDINGS_URL = "https://api.openai.com/v1/embeddings"
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
 
-@dataclass
-class Item:
-    i: int
-    userdata: Any
-    vector: list[float]
 
+def content_hash(text: str) -> str:
+    """Return the content-addressed key (sha256 hex digest) for a paragraph."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-@dataclass
-class QueryResult:
-    userdata: Any
-    distance: float
 
+class EmbeddingCache:
+    """
+    Persistent content-hash -> embedding store, kept next to the Annoy index.
 
-class AnnoyIndex:
-    def __init__(self, index: annoy.AnnoyIndex, filedata: _FileData) -> None:
-        self._index = index
-        self._filedata = filedata
+    Vectors are keyed by the sha256 of the cleaned paragraph together with the
+    embeddings model and dimension, so changing either invalidates the cache
+    instead of silently mixing vectors from different models.
+    """
 
-    @classmethod
-    def load(cls, path: str) -> "AnnoyIndex":
-        p = Path(path)
-        index_path = p / ANNOY_FILE
-        metadata_path = p / METADATA_FILE
-
-        with open(metadata_path, "rb") as f:
-            metadata: _FileData = pickle.load(f)
-
-        index = annoy.AnnoyIndex(metadata.f, metadata.metric)
-        index.load(str(index_path))
-        return cls(index, metadata)
-
-    @property
-    def size(self) -> int:
-        return self._index.get_n_items()
-
-    def items(self) -> Iterable[Item]:
-        for i in range(self._index.get_n_items()):
-            item = Item(
-                i=i,
-                userdata=self._filedata.userdata[i],
-                vector=self._index.get_item_vector(i),
+    def __init__(self, path: Union[str, Path], model: str, dimensions: int) -> None:
+        self._model = model
+        self._dimensions = dimensions
+        self._conn = sqlite3.connect(str(path))
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                PRIMARY KEY (hash, model, dimensions)
             )
-            yield item
-
-    def query(
-        self, vector: list[float], n: int, search_k: int = -1
-    ) -> list[QueryResult]:
-        ids = self._index.get_nns_by_vector(
-            vector, n, search_k=search_k, include_distances=True
+            """
         )
-        return [
-            QueryResult(userdata=self._filedata.userdata[i], distance=distance)
-            for i, distance in zip(*ids)
+        self._conn.commit()
+
+    def get_many(self, hashes: Iterable[str]) -> dict[str, list[float]]:
+        """Return the cached vectors for the given hashes, skipping misses."""
+        wanted = set(hashes)
+        found: dict[str, list[float]] = {}
+        cursor = self._conn.execute(
+            "SELECT hash, vector FROM embeddings WHERE model = ? AND dimensions = ?",
+            (self._model, self._dimensions),
+        )
+        for p_hash, blob in cursor:
+            if p_hash in wanted:
+                vector = array("f")
+                vector.frombytes(blob)
+                found[p_hash] = vector.tolist()
+        return found
+
+    def put_many(self, vectors: dict[str, list[float]]) -> None:
+        """Store vectors by content hash."""
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (hash, model, dimensions, vector) VALUES (?, ?, ?, ?)",
+            (
+                (p_hash, self._model, self._dimensions, array("f", vector).tobytes())
+                for p_hash, vector in vectors.items()
+            ),
+        )
+        self._conn.commit()
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """Delete vectors for this model whose hash is not in `keep`. Returns the count removed."""
+        keep = set(keep)
+        stale = [
+            (p_hash,)
+            for (p_hash,) in self._conn.execute(
+                "SELECT hash FROM embeddings WHERE model = ? AND dimensions = ?",
+                (self._model, self._dimensions),
+            )
+            if p_hash not in keep
         ]
+        self._conn.executemany(
+            "DELETE FROM embeddings WHERE hash = ? AND model = ? AND dimensions = ?",
+            ((p_hash, self._model, self._dimensions) for (p_hash,) in stale),
+        )
+        self._conn.commit()
+        return len(stale)
 
-
-class IndexBuilder:
-    def __init__(self, f: int, metric: Metric) -> None:
-        self._index = annoy.AnnoyIndex(f, metric)
-        self._filedata = _FileData(f=f, metric=metric, userdata={})
-        self._i = 0
-
-    def save(self, path: str) -> None:
-        p = Path(path)
-        p.mkdir(parents=True, exist_ok=True)
-        index_path = p / ANNOY_FILE
-        metadata_path = p / METADATA_FILE
-        self._index.save(str(index_path))
-        with open(metadata_path, "wb") as f:
-            pickle.dump(self._filedata, f)
-
-    def build(self, trees: int = 50, jobs: int = -1) -> AnnoyIndex:
-        # n_jobs=-1 means use all available cores
-        self._index.build(n_trees=trees, n_jobs=jobs)
-        return AnnoyIndex(self._index, self._filedata)
-
-    def add_item(self, vector: list[float], userdata: Any) -> None:
-        self._index.add_item(self._i, vector)
-        self._filedata.userdata[self._i] = userdata
-        self._i += 1
+    def close(self) -> None:
+        self._conn.close()
 
 
 class SentenceChunker:
@@ -130,10 +128,24 @@ class SentenceChunker:
         self._word_tokenizer = word_tokenizer
 
     def chunk(self, *, text: str) -> list[str]:
-        chunks = []
+        return list(self._chunk_paragraphs(self._paragraph_tokenizer(text)))
+
+    def iter_chunks(self, *, text: str) -> Iterator[str]:
+        """Like `chunk`, but yields chunks as they are produced."""
+        return self._chunk_paragraphs(self._paragraph_tokenizer(text))
+
+    def chunk_stream(self, stream: TextIO) -> Iterator[str]:
+        """
+        Yield chunks from a text stream without reading it all into memory.
 
-        buf_words: list[str] = []
-        for paragraph in self._paragraph_tokenizer(text):
+        Paragraphs are split on blank lines, the same way the default
+        paragraph tokenizer splits them.
+        """
+        return self._chunk_paragraphs(_iter_paragraphs(stream))
+
+    def _chunk_paragraphs(self, paragraphs: Iterable[str]) -> Iterator[str]:
+        for paragraph in paragraphs:
+            buf_words: list[str] = []
             last_buf_words: list[str] = []
 
             for sentence in self._sentence_tokenizer.tokenize(text=paragraph):
@@ -149,10 +161,9 @@ class SentenceChunker:
                         ):
                             last_buf_words = last_buf_words[1:]
 
-                        new_chunk = self._word_tokenizer.format_words(
+                        yield self._word_tokenizer.format_words(
                             last_buf_words + buf_words
                         )
-                        chunks.append(new_chunk)
                         last_buf_words = buf_words
                         buf_words = []
 
@@ -165,13 +176,24 @@ class SentenceChunker:
                 ):
                     last_buf_words = last_buf_words[1:]
 
-                new_chunk = self._word_tokenizer.format_words(
-                    last_buf_words + buf_words
-                )
-                chunks.append(new_chunk)
-                buf_words = []
+                yield self._word_tokenizer.format_words(last_buf_words + buf_words)
+
 
-        return chunks
+def _iter_paragraphs(stream: TextIO) -> Iterator[str]:
+    """Split a text stream into stripped, non-empty paragraphs at blank lines."""
+    lines: list[str] = []
+    for line in stream:
+        if line.endswith("\n") and not line.strip():
+            paragraph = "".join(lines).strip()
+            if paragraph:
+                yield paragraph
+            lines = []
+        else:
+            lines.append(line)
+
+    paragraph = "".join(lines).strip()
+    if paragraph:
+        yield paragraph
 
 
 class RAGBuilder:
@@ -182,7 +204,7 @@ class RAGBuilder:
     Example usage:
         builder = RAGBuilder(
             index_path="data",
-            data_path="my_data.pkl",
+            data_path="data/paragraphs.bin",
             embeddings_dimension=1536
         )
 
@@ -204,6 +226,13 @@ class RAGBuilder:
         embeddings_dimension: int = 1536,
         embeddings_model: str = "text-embedding-3-small",
         metric: str = "angular",
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        embeddings_url: str = EMBEDDINGS_URL,
+        build_numpy_index: bool = False,
+        quantization: Optional[str] = None,
+        build_bm25_index: bool = True,
     ):
         """
         Initialize the RAG builder.
@@ -214,12 +243,30 @@ class RAGBuilder:
             embeddings_dimension: Dimension of embeddings to use
             embeddings_model: OpenAI model to use for embeddings
             metric: Distance metric for Annoy index ("angular", "euclidean", or "manhattan")
+            batch_size: Number of paragraphs sent per embeddings request
+            max_concurrency: Maximum number of embeddings requests in flight at once
+            max_retries: How many times a rate-limited or failed batch is retried
+            embeddings_url: Embeddings endpoint (OpenAI-compatible)
+            build_numpy_index: Also save the vectors for the exact NumpyIndex backend
+            quantization: Also save "int8" or "float16" vectors for the QuantizedIndex
+                backend (this saves the NumpyIndex vectors too, for re-ranking)
+            build_bm25_index: Also build the BM25 lexical index for hybrid search
+
+        Embeddings are cached by content hash in `embeddings.sqlite` inside
+        `index_path`, so rebuilding only embeds new or changed paragraphs.
         """
         self._index_path = Path(index_path)
         self._data_path = Path(data_path)
         self._embeddings_dimension = embeddings_dimension
         self._embeddings_model = embeddings_model
         self._metric = metric
+        self._batch_size = max(1, batch_size)
+        self._max_concurrency = max(1, max_concurrency)
+        self._max_retries = max_retries
+        self._embeddings_url = embeddings_url
+        self._build_numpy_index = build_numpy_index
+        self._quantization = quantization
+        self._build_bm25_index = build_bm25_index
 
     def _clean_content(self, text: str) -> str:
         """
@@ -254,17 +301,98 @@ class RAGBuilder:
             
         return '\n'.join(cleaned_lines)
 
-    async def _create_embeddings(
-        self, text: str, http_session: Optional[aiohttp.ClientSession] = None
-    ) -> openai.EmbeddingData:
-        """Create embeddings for a single text."""
-        results = await openai.create_embeddings(
-            input=[text],
-            model=self._embeddings_model,
-            dimensions=self._embeddings_dimension,
-            http_session=http_session,
-        )
-        return results[0]
+    async def _create_embeddings_batch(
+        self, texts: List[str], http_session: aiohttp.ClientSession
+    ) -> List[List[float]]:
+        """
+        Create embeddings for a batch of texts in a single request.
+
+        This mirrors openai.create_embeddings, but checks the response status so
+        that rate-limited (429) and transient server errors can be retried with
+        exponential backoff, honoring the Retry-After header when present.
+        """
+        api_key = os.environ.get("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY must be set")
+
+        payload = {
+            "model": self._embeddings_model,
+            "input": texts,
+            "encoding_format": "base64",
+            "dimensions": self._embeddings_dimension,
+        }
+
+        attempt = 0
+        while True:
+            async with http_session.post(
+                self._embeddings_url,
+                headers={"Authorization": f"Bearer {api_key}"},
+                json=payload,
+            ) as resp:
+                if resp.status == 200:
+                    data = (await resp.json())["data"]
+                    break
+
+                if resp.status not in RETRYABLE_STATUSES or attempt >= self._max_retries:
+                    body = await resp.text()
+                    raise RuntimeError(
+                        f"Embeddings request failed with status {resp.status}: {body}"
+                    )
+
+                retry_after = resp.headers.get("Retry-After")
+
+            try:
+                delay = float(retry_after)
+            except (TypeError, ValueError):
+                delay = min(0.5 * 2**attempt, 30.0)
+            attempt += 1
+            logger.warning(
+                f"Embeddings request got status {resp.status}, "
+                f"retrying in {delay:.1f}s (attempt {attempt}/{self._max_retries})"
+            )
+            await asyncio.sleep(delay)
+
+        # The API may return items out of order, so place them by index
+        embeddings: List[List[float]] = [[] for _ in texts]
+        for d in data:
+            raw = base64.b64decode(d["embedding"])
+            embeddings[d["index"]] = list(struct.unpack(f"{len(raw) // 4}f", raw))
+        return embeddings
+
+    async def _embed_texts(
+        self,
+        texts: List[str],
+        http_session: aiohttp.ClientSession,
+        show_progress: bool = True,
+    ) -> List[List[float]]:
+        """
+        Create embeddings for many texts using batched, concurrent requests.
+
+        Texts are split into batches of `batch_size`, at most `max_concurrency`
+        batches are in flight at once, and the returned embeddings are in the
+        same order as `texts`.
+        """
+        embeddings: List[List[float]] = [[] for _ in texts]
+        semaphore = asyncio.Semaphore(self._max_concurrency)
+        progress = tqdm(total=len(texts), desc="Creating embeddings") if show_progress else None
+
+        async def _run_batch(start: int) -> None:
+            batch = texts[start : start + self._batch_size]
+            async with semaphore:
+                results = await self._create_embeddings_batch(batch, http_session)
+            embeddings[start : start + len(batch)] = results
+            if progress is not None:
+                progress.update(len(batch))
+
+        try:
+            await asyncio.gather(
+                *(_run_batch(start) for start in range(0, len(texts), self._batch_size))
+            )
+        finally:
+            if progress is not None:
+                progress.close()
+
+        return embeddings
 
     async def build_from_texts(
         self, texts: List[str], show_progress: bool = True
@@ -278,43 +406,104 @@ class RAGBuilder:
             show_progress: Whether to show a progress bar
         """
         # Create parent directories if they don't exist
-        self._index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._index_path.mkdir(parents=True, exist_ok=True)
         self._data_path.parent.mkdir(parents=True, exist_ok=True)
 
-        async with aiohttp.ClientSession() as http_session:
-            idx_builder = IndexBuilder(
-                f=self._embeddings_dimension, metric=self._metric
+        cache = EmbeddingCache(
+            self._index_path / EMBEDDINGS_CACHE_FILE,
+            model=self._embeddings_model,
+            dimensions=self._embeddings_dimension,
+        )
+
+        try:
+            async with aiohttp.ClientSession() as http_session:
+                await self._build(texts, cache, http_session, show_progress)
+        finally:
+            cache.close()
+
+    async def _build(
+        self,
+        texts: List[str],
+        cache: EmbeddingCache,
+        http_session: aiohttp.ClientSession,
+        show_progress: bool,
+    ) -> None:
+        """Embed what the cache is missing, then build and save the index."""
+        idx_builder = IndexBuilder(
+            f=self._embeddings_dimension, metric=self._metric
+        )
+
+        # Clean and filter texts
+        cleaned_texts = []
+        for text in texts:
+            cleaned = self._clean_content(text)
+            if cleaned:  # Only include non-empty cleaned texts
+                cleaned_texts.append(cleaned)
+
+        # Key each paragraph by its content hash (identical paragraphs collapse)
+        paragraphs_by_hash = {content_hash(text): text for text in cleaned_texts}
+
+        # Only embed paragraphs that are new or changed since the last build
+        vectors = cache.get_many(paragraphs_by_hash.keys())
+        missing = [h for h in paragraphs_by_hash if h not in vectors]
+        logger.info(
+            f"{len(vectors)} of {len(paragraphs_by_hash)} paragraphs found in embeddings cache, "
+            f"embedding {len(missing)}"
+        )
+        if missing:
+            embeddings = await self._embed_texts(
+                [paragraphs_by_hash[h] for h in missing], http_session, show_progress
+            )
+            new_vectors = dict(zip(missing, embeddings))
+            cache.put_many(new_vectors)
+            vectors.update(new_vectors)
+
+        # Rebuild the index from cached vectors, in corpus order. Item ids are
+        # positions in the paragraph store, so no id mapping needs to be saved.
+        for p_hash in paragraphs_by_hash:
+            idx_builder.add_item(vectors[p_hash])
+
+        # Build and save the index
+        logger.info(f"Building index at {self._index_path}")
+        idx_builder.build()
+        idx_builder.save(str(self._index_path))
+
+        # The quantized backend re-ranks against the float32 vectors
+        if self._build_numpy_index or self._quantization is not None:
+            from rag.numpy_index import save_vectors
+
+            logger.info(f"Saving vectors for the NumPy index at {self._index_path}")
+            save_vectors(
+                str(self._index_path),
+                [vectors[p_hash] for p_hash in paragraphs_by_hash],
+                self._metric,
+                self._embeddings_dimension,
             )
 
-            # Clean and filter texts
-            cleaned_texts = []
-            for text in texts:
-                cleaned = self._clean_content(text)
-                if cleaned:  # Only include non-empty cleaned texts
-                    cleaned_texts.append(cleaned)
-
-            # Generate UUIDs for each paragraph
-            paragraphs_by_uuid = {str(uuid.uuid4()): text for text in cleaned_texts}
-
-            # Create iterator with optional progress bar
-            items = paragraphs_by_uuid.items()
-            if show_progress:
-                items = tqdm(items, desc="Creating embeddings")
-
-            # Generate embeddings and add to index
-            for p_uuid, paragraph in items:
-                resp = await self._create_embeddings(paragraph, http_session)
-                idx_builder.add_item(resp.embedding, p_uuid)
-
-            # Build and save the index
-            logger.info(f"Building index at {self._index_path}")
-            idx_builder.build()
-            idx_builder.save(str(self._index_path))
-
-            # Save paragraph data
-            logger.info(f"Saving paragraph data to {self._data_path}")
-            with open(self._data_path, "wb") as f:
-                pickle.dump(paragraphs_by_uuid, f)
+        if self._quantization is not None:
+            from rag.quantized_index import save_quantized_vectors
+
+            logger.info(f"Saving {self._quantization} vectors at {self._index_path}")
+            save_quantized_vectors(
+                str(self._index_path),
+                [vectors[p_hash] for p_hash in paragraphs_by_hash],
+                self._metric,
+                self._quantization,
+                self._embeddings_dimension,
+            )
+
+        if self._build_bm25_index:
+            logger.info(f"Building BM25 index at {self._index_path}")
+            build_bm25(self._index_path, paragraphs_by_hash.values())
+
+        # Save paragraph data
+        logger.info(f"Saving paragraph data to {self._data_path}")
+        ParagraphStore.write(self._data_path, paragraphs_by_hash.values())
+
+        # Drop vectors for paragraphs that are no longer in the corpus
+        removed = cache.prune(paragraphs_by_hash.keys())
+        if removed:
+            logger.info(f"Pruned {removed} stale embeddings from cache")
 
     async def build_from_file(
         self, file_path: Union[str, Path], show_progress: bool = True
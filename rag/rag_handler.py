@@ -1,79 +1,22 @@
+import asyncio
 import logging
-import pickle
 import random
+import time
+from dataclasses import dataclass
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Union, Any, Literal
-from collections.abc import Iterable
-from dataclasses import dataclass
-
-import annoy
+from typing import List, Optional, Union
 
-from livekit.agents.voice import Agent, RunContext
+from livekit.agents.voice import Agent, RunContext, SpeechHandle
 from livekit.agents.llm import function_tool
-from livekit.plugins import openai
-
-logger = logging.getLogger("rag-handler")
-
-# RAG Index Types and Classes
-Metric = Literal["angular", "euclidean", "manhattan", "hamming", "dot"]
-ANNOY_FILE = "index.annoy"
-METADATA_FILE = "metadata.pkl"
-
-@dataclass
-class Item:
-    i: int
-    userdata: Any
-    vector: list[float]
-
-@dataclass
-class _FileData:
-    f: int
-    metric: Metric
-    userdata: dict[int, Any]
-
-@dataclass
-class QueryResult:
-    userdata: Any
-    distance: float
-
-class AnnoyIndex:
-    def __init__(self, index: annoy.AnnoyIndex, filedata: _FileData) -> None:
-        self._index = index
-        self._filedata = filedata
-
-    @classmethod
-    def load(cls, path: str) -> "AnnoyIndex":
-        p = Path(path)
-        index_path = p / ANNOY_FILE
-        metadata_path = p / METADATA_FILE
-
-        with open(metadata_path, "rb") as f:
-            metadata: _FileData = pickle.load(f)
 
-        index = annoy.AnnoyIndex(metadata.f, metadata.metric)
-        index.load(str(index_path))
-        return cls(index, metadata)
+from rag.database import RAGDatabase, RAGDatabaseMetrics, load_rag_database
+from rag.hybrid import HybridRetriever
+from rag.index import IndexBackendName
+from rag.query_embedding_cache import QueryEmbeddingCacheStats, shared_query_embedding_cache
+from rag.registry import DATA_FILE, TenantRegistry
 
-    @property
-    def size(self) -> int:
-        return self._index.get_n_items()
-
-    def items(self) -> Iterable[Item]:
-        for i in range(self._index.get_n_items()):
-            item = Item(
-                i=i,
-                userdata=self._filedata.userdata[i],
-                vector=self._index.get_item_vector(i),
-            )
-            yield item
-
-    def query(self, vector: list[float], n: int, search_k: int = -1) -> list[QueryResult]:
-        ids = self._index.get_nns_by_vector(vector, n, search_k=search_k, include_distances=True)
-        return [
-            QueryResult(userdata=self._filedata.userdata[i], distance=distance)
-            for i, distance in zip(*ids)
-        ]
+logger = logging.getLogger("rag-handler")
 
 class ThinkingStyle(Enum):
     NONE = "none"
@@ -90,6 +33,24 @@ DEFAULT_THINKING_MESSAGES = [
 
 DEFAULT_THINKING_PROMPT = "Generate a very short message to indicate that we're looking up the answer in the docs"
 
+
+@dataclass
+class RAGPhaseTimings:
+    """Seconds from the start of `enrich_with_rag` to the end of each phase."""
+
+    retrieval: float
+    generation: float
+    """Until the answer text was ready (retrieval + LLM completion, or just
+    retrieval when nothing relevant was found)"""
+    filler: Optional[float] = None
+    """Until the filler finished or was cut off, None if no filler was spoken"""
+    filler_interrupted: bool = False
+
+    @property
+    def hidden_latency(self) -> float:
+        """Part of the wait the user spent hearing the filler instead of silence."""
+        return min(self.filler, self.generation) if self.filler is not None else 0.0
+
 class RAGHandler:
     """
     Handler for Retrieval-Augmented Generation (RAG) in LiveKit agents 1.0.
@@ -103,9 +64,20 @@ class RAGHandler:
             # Initialize RAG handler
             self.rag_handler = RAGHandler(
                 index_path="data",
-                data_path="my_data.pkl",
+                data_path="data/paragraphs.bin",
                 thinking_style="message"
             )
+
+    The index and paragraphs are loaded once per process and shared by every
+    handler that points at the same paths. Call `RAGHandler.prewarm(...)` from
+    the worker's `prewarm_fnc` so the first session doesn't pay the load cost.
+    For per-customer corpora, use `await RAGHandler.for_tenant(registry, tenant)`.
+
+    Retrieval runs while the thinking filler is spoken; the filler is skipped
+    when retrieval finishes within `filler_delay` and cut off as soon as
+    retrieval is done. With the LLM style, `register_with_agent` starts
+    generating the filler messages when the agent enters the session, so no
+    lookup waits on a filler completion.
     """
     
     def __init__(
@@ -116,19 +88,25 @@ class RAGHandler:
         thinking_messages: Optional[List[str]] = None,
         thinking_prompt: Optional[str] = None,
         embeddings_dimension: int = 1536,
-        embeddings_model: str = "text-embedding-3-small"
+        embeddings_model: str = "text-embedding-3-small",
+        index_backend: IndexBackendName = "annoy",
+        filler_delay: float = 0.2,
+        rag_db: Optional[RAGDatabase] = None,
     ):
         """
         Initialize the RAG handler.
         
         Args:
             index_path: Path to the Annoy index file
-            data_path: Path to the pickled data file containing paragraphs
+            data_path: Path to the paragraph store file
             thinking_style: How to handle delays during RAG lookups
             thinking_messages: Custom messages to use with MESSAGE style
             thinking_prompt: Custom prompt to use with LLM style
             embeddings_dimension: Dimension of embeddings to use
             embeddings_model: OpenAI model to use for embeddings
+            index_backend: "annoy" for approximate search or "numpy" for exact search
+            filler_delay: Seconds to wait for retrieval before speaking a filler
+            rag_db: An already loaded database to use instead of loading the paths
         """
         self._index_path = Path(index_path)
         self._data_path = Path(data_path)
@@ -137,29 +115,129 @@ class RAGHandler:
         self._thinking_prompt = thinking_prompt or DEFAULT_THINKING_PROMPT
         self._embeddings_dimension = embeddings_dimension
         self._embeddings_model = embeddings_model
+        self._filler_delay = filler_delay
+        self._generated_thinking_messages: List[str] = []
+        self._thinking_generation: Optional[asyncio.Task] = None
+        self._last_timings: Optional[RAGPhaseTimings] = None
         
-        # Load index and data
-        if not self._index_path.exists():
-            raise FileNotFoundError(f"Annoy index not found at {self._index_path}")
-        if not self._data_path.exists():
-            raise FileNotFoundError(f"Data file not found at {self._data_path}")
-            
-        self._annoy_index = AnnoyIndex.load(str(self._index_path))
-        with open(self._data_path, "rb") as f:
-            self._paragraphs_by_uuid = pickle.load(f)
+        # Use the process-wide index and data (loaded here if not prewarmed)
+        self._rag_db = rag_db or self.prewarm(self._index_path, self._data_path, index_backend)
+        self._paragraphs = self._rag_db.paragraphs
+        self._query_embeddings = shared_query_embedding_cache(
+            self._embeddings_model, self._embeddings_dimension
+        )
+        self._retriever = HybridRetriever(
+            self._rag_db.index, self._rag_db.bm25, self._query_embeddings
+        )
+
+    @classmethod
+    async def for_tenant(
+        cls, registry: TenantRegistry, tenant: str, **kwargs
+    ) -> "RAGHandler":
+        """
+        Create a handler for one tenant's corpus from a tenant registry. Call
+        `registry.release(handler.rag_db)` when the session ends.
+
+        Args:
+            registry: Registry holding the per-tenant databases
+            tenant: Tenant to load, e.g. from `tenant_from_metadata(...)`
+            **kwargs: Other RAGHandler arguments
+        """
+        rag_db = await registry.get(tenant)
+        path = registry.tenant_path(tenant)
+        return cls(index_path=path, data_path=path / DATA_FILE, rag_db=rag_db, **kwargs)
+
+    @staticmethod
+    def prewarm(
+        index_path: Union[str, Path],
+        data_path: Union[str, Path],
+        index_backend: IndexBackendName = "annoy",
+    ) -> RAGDatabase:
+        """
+        Load the RAG database into this process so later handlers can share it.
+
+        Args:
+            index_path: Path to the Annoy index file
+            data_path: Path to the paragraph store file
+            index_backend: "annoy" for approximate search or "numpy" for exact search
+
+        Returns:
+            The shared database, including its load metrics
+        """
+        if not Path(index_path).exists():
+            raise FileNotFoundError(f"Annoy index not found at {index_path}")
+        if not Path(data_path).exists():
+            raise FileNotFoundError(f"Data file not found at {data_path}")
+
+        return load_rag_database(index_path, data_path, index_backend)
+
+    @property
+    def rag_db(self) -> RAGDatabase:
+        """The database this handler searches."""
+        return self._rag_db
+
+    @property
+    def metrics(self) -> RAGDatabaseMetrics:
+        """Load time and memory footprint of the shared RAG database."""
+        return self._rag_db.metrics
+
+    @property
+    def query_cache_stats(self) -> QueryEmbeddingCacheStats:
+        """Hit/miss counters of the shared query embedding cache."""
+        return self._query_embeddings.stats
     
-    async def _handle_thinking(self, agent: Agent) -> None:
-        """Handle the thinking phase based on the configured style."""
+    @property
+    def last_timings(self) -> Optional[RAGPhaseTimings]:
+        """Per-phase timings of the most recent `enrich_with_rag` call."""
+        return self._last_timings
+
+    async def pregenerate_thinking_messages(self, llm, count: int = 3) -> None:
+        """
+        Generate the LLM-style filler messages ahead of time, so a lookup
+        never waits on an LLM round-trip before it can say something.
+
+        Args:
+            llm: The LLM to generate the messages with
+            count: Number of messages to generate
+        """
+        messages = []
+        for _ in range(count):
+            try:
+                response = await llm.complete(self._thinking_prompt)
+            except Exception as e:
+                logger.warning(f"Failed to generate a thinking message: {e}")
+                break
+            if response.text:
+                messages.append(response.text)
+        self._generated_thinking_messages = messages
+
+    def _thinking_message(self, agent: Agent) -> str:
+        if self._thinking_style == ThinkingStyle.LLM:
+            if self._generated_thinking_messages:
+                return random.choice(self._generated_thinking_messages)
+            # Not pre-generated yet: use a canned message this time and
+            # generate the LLM ones in the background for the next lookup
+            self._start_thinking_generation(agent)
+        return random.choice(self._thinking_messages)
+
+    def _start_thinking_generation(self, agent: Agent) -> None:
+        """Generate the LLM-style filler messages in the background, once."""
+        if self._thinking_generation is None:
+            self._thinking_generation = asyncio.create_task(
+                self.pregenerate_thinking_messages(agent._llm)
+            )
+
+    async def _handle_thinking(
+        self, agent: Agent, retrieval: asyncio.Task
+    ) -> Optional[SpeechHandle]:
+        """Start the thinking filler unless retrieval finishes within the filler delay."""
         if self._thinking_style == ThinkingStyle.NONE:
-            return
-            
-        elif self._thinking_style == ThinkingStyle.MESSAGE:
-            await agent.session.say(random.choice(self._thinking_messages))
-            
-        elif self._thinking_style == ThinkingStyle.LLM:
-            # Create a thinking message using the LLM
-            response = await agent._llm.complete(self._thinking_prompt)
-            await agent.session.say(response.text)
+            return None
+
+        done, _ = await asyncio.wait({retrieval}, timeout=self._filler_delay)
+        if done:
+            return None
+        return agent.session.say(self._thinking_message(agent))
     
     async def retrieve_context(self, query: str) -> str:
         """
@@ -171,21 +249,15 @@ class RAGHandler:
         Returns:
             The retrieved context, or an empty string if no relevant context was found
         """
-        # Generate embeddings for the query
-        query_embedding = await openai.create_embeddings(
-            input=[query],
-            model=self._embeddings_model,
-            dimensions=self._embeddings_dimension
-        )
-        
-        # Query the index
-        results = self._annoy_index.query(query_embedding[0].embedding, n=1)
+        # Query the BM25 and vector indexes (the embedding is skipped when
+        # the lexical match alone is confident)
+        results = await self._retriever.search(query, n=1)
         
         if not results:
             return ""
             
         # Get the most relevant paragraph
-        paragraph = self._paragraphs_by_uuid.get(results[0].userdata, "")
+        paragraph = self._paragraphs.get(results[0].i, "")
         return paragraph
     
     async def enrich_with_rag(self, agent: Agent, context: RunContext, query: str) -> None:
@@ -197,13 +269,37 @@ class RAGHandler:
             context: The RunContext from the function call
             query: The query to search for
         """
-        # Handle thinking phase
-        await self._handle_thinking(agent)
-        
-        # Retrieve relevant context
-        relevant_context = await self.retrieve_context(query)
-        
+        start = time.perf_counter()
+        filler_ended_at: Optional[float] = None
+
+        def on_filler_done(_: SpeechHandle) -> None:
+            nonlocal filler_ended_at
+            if filler_ended_at is None:
+                filler_ended_at = time.perf_counter()
+
+        # Retrieve relevant context while the thinking filler is spoken
+        retrieval = asyncio.create_task(self.retrieve_context(query))
+        try:
+            filler = await self._handle_thinking(agent, retrieval)
+        except BaseException:
+            retrieval.cancel()
+            raise
+        if filler is not None:
+            filler.add_done_callback(on_filler_done)
+
+        relevant_context = await retrieval
+        retrieved_at = time.perf_counter()
+
+        # The filler only covers retrieval; cut it off now so it doesn't
+        # also hold up the answer while the LLM runs
+        filler_interrupted = self._finish_filler(filler)
+        if filler is not None and filler_ended_at is None:
+            filler_ended_at = retrieved_at
+
         if not relevant_context:
+            self._record_timings(
+                start, retrieved_at, retrieved_at, filler_ended_at, filler_interrupted
+            )
             await agent.session.say("I couldn't find any relevant information about that.")
             return
         
@@ -219,8 +315,37 @@ class RAGHandler:
         """
         
         response = await agent._llm.complete(context_prompt)
+        generated_at = time.perf_counter()
+
+        self._record_timings(
+            start, retrieved_at, generated_at, filler_ended_at, filler_interrupted
+        )
         await agent.session.say(response.text)
 
+    def _record_timings(
+        self,
+        start: float,
+        retrieved_at: float,
+        generated_at: float,
+        filler_ended_at: Optional[float],
+        filler_interrupted: bool,
+    ) -> None:
+        self._last_timings = RAGPhaseTimings(
+            retrieval=retrieved_at - start,
+            generation=generated_at - start,
+            filler=(filler_ended_at - start) if filler_ended_at is not None else None,
+            filler_interrupted=filler_interrupted,
+        )
+        logger.info(f"RAG phase timings: {self._last_timings}")
+
+    @staticmethod
+    def _finish_filler(filler: Optional[SpeechHandle]) -> bool:
+        """Cut off the filler if it is still playing. Returns whether it was."""
+        if filler is None or filler.done():
+            return False
+        filler.interrupt(force=True)
+        return True
+
     def register_with_agent(self, agent: Agent) -> None:
         """
         Register the RAG handler with an agent
@@ -243,4 +368,15 @@ class RAGHandler:
         
         # Add the function and rag_handler to the agent
         agent.lookup_info = lookup_info.__get__(agent)
-        agent.rag_handler = self 
\ No newline at end of file
+        agent.rag_handler = self
+
+        if self._thinking_style == ThinkingStyle.LLM:
+            # Generate the filler messages in the background when the agent
+            # starts, so the greeting isn't held up by them
+            agent_on_enter = agent.on_enter
+
+            async def on_enter() -> None:
+                self._start_thinking_generation(agent)
+                await agent_on_enter()
+
+            agent.on_enter = on_enter 
\ No newline at end of file
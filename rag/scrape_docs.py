@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
 import asyncio
+import hashlib
+import json
 import logging
+import os
 import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Set
+from typing import Dict, List, Optional, Set
 from urllib.parse import urljoin, urlparse
 
 import aiohttp
@@ -20,24 +25,137 @@ logger = logging.getLogger("docs-scraper")
 load_dotenv()
 
 BASE_URL = "https://docs.livekit.io"
-SITEMAP_URL = f"{BASE_URL}/sitemap.xml"
 OUTPUT_FILE = Path(__file__).parent / "data/raw_data.txt"
+CACHE_DIR = Path(__file__).parent / "data/http_cache"
 EXCLUDED_PATHS = ["/reference"]  # Paths to exclude from scraping
 
+def extract_main_text(html: str) -> str:
+    """
+    Extract the cleaned text of a page's <main> element.
+
+    This is CPU-bound, so the scraper runs it in a process pool rather than on
+    the event loop.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+
+    # Extract the main content
+    main_content = soup.find("main")
+    if not main_content:
+        return ""
+
+    # Remove unwanted elements
+    for element in main_content.find_all(["nav", "footer", "header", "script", "style"]):
+        element.decompose()
+
+    # Clean up the text
+    text = main_content.get_text(separator="\n", strip=True)
+    text = re.sub(r"\n\s*\n", "\n\n", text)  # Remove excessive newlines
+    return text.strip()
+
+
+class HostRateLimiter:
+    """Spaces out requests to each host to at most `rate` per second."""
+
+    def __init__(self, rate: float):
+        self._interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_slot: Dict[str, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, url: str):
+        if not self._interval:
+            return
+
+        host = urlparse(url).netloc
+        async with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self._interval
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class HttpCache:
+    """
+    On-disk cache of page validators (ETag / Last-Modified) and extracted text.
+
+    When the server answers a conditional GET with 304 Not Modified, the
+    cached text is reused and the page is neither downloaded nor parsed.
+    """
+
+    def __init__(self, cache_dir: Path):
+        self._cache_dir = cache_dir
+        self._cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        return self._cache_dir / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url: str) -> Optional[dict]:
+        try:
+            with open(self._path(url), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, etag: Optional[str], last_modified: Optional[str], text: str):
+        if not etag and not last_modified:
+            return
+        entry = {"url": url, "etag": etag, "last_modified": last_modified, "text": text}
+        tmp_path = self._path(url).with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, self._path(url))
+
+    @staticmethod
+    def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+
 class DocsScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        base_url: str = BASE_URL,
+        max_concurrency: int = 8,
+        requests_per_second: float = 10.0,
+        cache_dir: Optional[Path] = CACHE_DIR,
+        parse_workers: Optional[int] = None,
+    ):
+        """
+        Args:
+            base_url: Docs site to scrape; its /sitemap.xml lists the pages
+            max_concurrency: Maximum number of page requests in flight
+            requests_per_second: Per-host request rate limit (0 disables it)
+            cache_dir: Directory for the HTTP cache, or None to disable caching
+            parse_workers: Number of HTML parsing processes (defaults to CPU count)
+        """
+        self.base_url = base_url.rstrip("/")
         self.visited_urls: Set[str] = set()
         self.content: List[str] = []
         self.session = None
+        self.stats: Dict[str, int] = {"fetched": 0, "not_modified": 0, "failed": 0}
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._rate_limiter = HostRateLimiter(requests_per_second)
+        self._cache = HttpCache(cache_dir) if cache_dir else None
+        self._parse_workers = parse_workers
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
 
     async def init_session(self):
-        """Initialize the aiohttp session."""
+        """Initialize the aiohttp session and the HTML parsing pool."""
         self.session = aiohttp.ClientSession()
+        self._parse_pool = ProcessPoolExecutor(max_workers=self._parse_workers)
 
     async def close_session(self):
-        """Close the aiohttp session."""
+        """Close the aiohttp session and the HTML parsing pool."""
         if self.session:
             await self.session.close()
+        if self._parse_pool:
+            self._parse_pool.shutdown()
 
     def should_exclude_url(self, url: str) -> bool:
         """Check if a URL should be excluded from scraping."""
@@ -46,7 +164,7 @@ class DocsScraper:
 
     async def fetch_sitemap(self) -> List[str]:
         """Fetch and parse the sitemap to get all URLs."""
-        async with self.session.get(SITEMAP_URL) as response:
+        async with self.session.get(f"{self.base_url}/sitemap.xml") as response:
             if response.status != 200:
                 raise Exception(f"Failed to fetch sitemap: {response.status}")
             
@@ -54,39 +172,44 @@ class DocsScraper:
             soup = BeautifulSoup(content, "xml")
             urls = [loc.text for loc in soup.find_all("loc")]
             
-            # Filter out excluded URLs and ensure they're from docs.livekit.io
+            # Filter out excluded URLs and ensure they're from the docs site
             return [
                 url for url in urls 
-                if url.startswith(BASE_URL) and not self.should_exclude_url(url)
+                if url.startswith(self.base_url) and not self.should_exclude_url(url)
             ]
 
     async def fetch_page(self, url: str) -> str:
-        """Fetch a single page and extract its content."""
+        """Fetch a single page and extract its content, reusing the cache when unchanged."""
+        cached = self._cache.get(url) if self._cache else None
         try:
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    logger.warning(f"Failed to fetch {url}: {response.status}")
-                    return ""
-                
-                content = await response.text()
-                soup = BeautifulSoup(content, "html.parser")
-                
-                # Extract the main content
-                main_content = soup.find("main")
-                if not main_content:
-                    return ""
-                
-                # Remove unwanted elements
-                for element in main_content.find_all(["nav", "footer", "header", "script", "style"]):
-                    element.decompose()
-                
-                # Clean up the text
-                text = main_content.get_text(separator="\n", strip=True)
-                text = re.sub(r"\n\s*\n", "\n\n", text)  # Remove excessive newlines
-                return text.strip()
+            async with self._semaphore:
+                await self._rate_limiter.wait(url)
+                async with self.session.get(
+                    url, headers=HttpCache.conditional_headers(cached)
+                ) as response:
+                    if response.status == 304 and cached:
+                        self.stats["not_modified"] += 1
+                        return cached["text"]
+
+                    if response.status != 200:
+                        logger.warning(f"Failed to fetch {url}: {response.status}")
+                        self.stats["failed"] += 1
+                        return ""
+
+                    html = await response.text()
+                    etag = response.headers.get("ETag")
+                    last_modified = response.headers.get("Last-Modified")
+
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(self._parse_pool, extract_main_text, html)
+            self.stats["fetched"] += 1
+            if self._cache:
+                self._cache.put(url, etag, last_modified, text)
+            return text
                 
         except Exception as e:
             logger.error(f"Error fetching {url}: {e}")
+            self.stats["failed"] += 1
             return ""
 
     async def scrape(self):
@@ -97,17 +220,19 @@ class DocsScraper:
             urls = await self.fetch_sitemap()
             logger.info(f"Found {len(urls)} URLs to scrape")
             
-            # Process each URL
-            for url in urls:
-                if url in self.visited_urls:
-                    continue
-                    
-                self.visited_urls.add(url)
-                logger.info(f"Scraping {url}")
-                
-                content = await self.fetch_page(url)
+            # Process each URL once, concurrently, keeping sitemap order
+            urls = [url for url in dict.fromkeys(urls) if url not in self.visited_urls]
+            self.visited_urls.update(urls)
+            pages = await asyncio.gather(*(self.fetch_page(url) for url in urls))
+
+            for url, content in zip(urls, pages):
                 if content:
                     self.content.append(f"Content from {url}:\n\n{content}\n\n")
+
+            logger.info(
+                f"Scraped {len(urls)} URLs: {self.stats['fetched']} fetched, "
+                f"{self.stats['not_modified']} unchanged, {self.stats['failed']} failed"
+            )
                     
         finally:
             await self.close_session()
@@ -0,0 +1,105 @@
+import hashlib
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The tests import the example's modules (`rag`, `rag_handler`, ...) the way
+# its scripts do, from the example directory
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+class DocsSite:
+    """
+    A docs site served from memory: /sitemap.xml lists every page, and pages
+    answer conditional GETs on their ETag and Last-Modified with 304.
+    """
+
+    LAST_MODIFIED = "Wed, 01 Jan 2025 00:00:00 GMT"
+
+    def __init__(self) -> None:
+        self.pages: dict[str, str] = {}
+        self.requests: list[tuple[str, int, dict]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def page_requests(self) -> list[tuple[str, int, dict]]:
+        return [r for r in self.requests if r[0] != "/sitemap.xml"]
+
+    def _sitemap(self) -> str:
+        locs = "".join(f"<url><loc>{self.url}{path}</loc></url>" for path in self.pages)
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+        )
+
+    def _handler(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with site._lock:
+                    site.in_flight += 1
+                    site.max_in_flight = max(site.max_in_flight, site.in_flight)
+                try:
+                    time.sleep(site.delay)
+                    self._respond()
+                finally:
+                    with site._lock:
+                        site.in_flight -= 1
+
+            def _respond(self) -> None:
+                if self.path == "/sitemap.xml":
+                    return self._send(200, site._sitemap(), {})
+                if self.path not in site.pages:
+                    return self._send(404, "", {})
+
+                body = site.pages[self.path]
+                etag = f'"{hashlib.sha256(body.encode()).hexdigest()[:16]}"'
+                validators = {"ETag": etag, "Last-Modified": site.LAST_MODIFIED}
+                if self.headers.get("If-None-Match") == etag:
+                    return self._send(304, None, validators)
+                self._send(200, body, validators)
+
+            def _send(self, status: int, body, headers: dict) -> None:
+                site.requests.append((self.path, status, dict(self.headers)))
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                if body is None:
+                    self.end_headers()
+                    return
+                data = body.encode()
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args) -> None:
+                pass
+
+        return Handler
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def docs_site():
+    """A local docs site, so the scraper can be tested without the network."""
+    site = DocsSite()
+    site.start()
+    yield site
+    site.stop()
@@ -0,0 +1,72 @@
+import io
+import random
+from pathlib import Path
+
+import pytest
+
+from rag_db_builder import SentenceChunker
+
+WAR_AND_PEACE = Path(__file__).resolve().parents[2] / "pipeline-llm/lib/war_and_peace.txt"
+
+
+def original_chunk(chunker: SentenceChunker, text: str) -> list[str]:
+    """SentenceChunker.chunk as it was before chunks could be streamed."""
+    format_words = chunker._word_tokenizer.format_words
+    chunks = []
+
+    buf_words: list[str] = []
+    for paragraph in chunker._paragraph_tokenizer(text):
+        last_buf_words: list[str] = []
+
+        for sentence in chunker._sentence_tokenizer.tokenize(text=paragraph):
+            for word in chunker._word_tokenizer.tokenize(text=sentence):
+                if len(format_words(buf_words + [word])) > chunker._max_chunk_size:
+                    while len(format_words(last_buf_words)) > chunker._chunk_overlap:
+                        last_buf_words = last_buf_words[1:]
+
+                    chunks.append(format_words(last_buf_words + buf_words))
+                    last_buf_words = buf_words
+                    buf_words = []
+
+                buf_words.append(word)
+
+        if buf_words:
+            while len(format_words(last_buf_words)) > chunker._chunk_overlap:
+                last_buf_words = last_buf_words[1:]
+
+            chunks.append(format_words(last_buf_words + buf_words))
+            buf_words = []
+
+    return chunks
+
+
+def random_text(rng: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(1, 6)):
+        sentences = []
+        for _ in range(rng.randint(1, 8)):
+            words = ["x" * rng.randint(1, 40) for _ in range(rng.randint(1, 30))]
+            sentences.append(" ".join(words) + rng.choice([".", "!", "?"]))
+        paragraphs.append(" ".join(sentences))
+    return rng.choice(["\n\n", "\n \n\n", "\n\n\n"]).join(paragraphs)
+
+
+@pytest.mark.parametrize("size,overlap", [(120, 30), (500, 30), (40, 0), (20, 60)])
+def test_matches_the_original_chunker(size, overlap):
+    rng = random.Random(size * 100 + overlap)
+    chunker = SentenceChunker(max_chunk_size=size, chunk_overlap=overlap)
+    for _ in range(30):
+        text = random_text(rng)
+        assert chunker.chunk(text=text) == original_chunk(chunker, text)
+
+
+@pytest.mark.skipif(not WAR_AND_PEACE.exists(), reason="sample text not available")
+def test_stream_matches_chunk_on_a_book():
+    text = WAR_AND_PEACE.read_text()[:200_000]
+    chunker = SentenceChunker()
+
+    chunks = chunker.chunk(text=text)
+
+    assert chunks == original_chunk(chunker, text)
+    assert list(chunker.chunk_stream(io.StringIO(text))) == chunks
+    assert list(chunker.iter_chunks(text=text)) == chunks
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from rag import database
+from rag.index import IndexBuilder
+from rag.paragraph_store import ParagraphStore
+
+PARAGRAPHS = [f"Paragraph {i} about room {i % 3}" for i in range(20)]
+
+
+@pytest.fixture
+def rag_files(tmp_path):
+    rng = random.Random(0)
+    builder = IndexBuilder(8, "angular")
+    for _ in PARAGRAPHS:
+        builder.add_item([rng.uniform(-1, 1) for _ in range(8)])
+    builder.build(trees=10)
+    builder.save(str(tmp_path / "index"))
+    ParagraphStore.write(tmp_path / "paragraphs.bin", PARAGRAPHS)
+    return tmp_path / "index", tmp_path / "paragraphs.bin"
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """A fresh process-wide cache, recording every index load."""
+    monkeypatch.setattr(database, "_databases", {})
+    calls = []
+    load_index = database.load_index
+
+    def counting_load_index(path, backend="annoy"):
+        calls.append((path, backend))
+        return load_index(path, backend)
+
+    monkeypatch.setattr(database, "load_index", counting_load_index)
+    return calls
+
+
+def test_second_load_reuses_the_database(rag_files, loads):
+    index_path, data_path = rag_files
+    first = database.load_rag_database(index_path, data_path)
+    second = database.load_rag_database(index_path, data_path)
+
+    assert second is first
+    assert len(loads) == 1
+    assert second.paragraphs[3] == PARAGRAPHS[3]
+    assert second.index.size == len(PARAGRAPHS)
+
+
+def test_equivalent_paths_share_one_database(rag_files, loads, monkeypatch):
+    index_path, data_path = rag_files
+    first = database.load_rag_database(index_path, data_path)
+    monkeypatch.chdir(index_path.parent)
+
+    assert database.load_rag_database("index", "./paragraphs.bin") is first
+    assert len(loads) == 1
+
+
+def test_each_backend_is_loaded_once(rag_files, loads):
+    index_path, data_path = rag_files
+    annoy_db = database.load_rag_database(index_path, data_path, "annoy")
+    database.load_rag_database(index_path, data_path, "annoy")
+
+    assert [backend for _, backend in loads] == ["annoy"]
+    assert annoy_db.metrics.load_time > 0
+    assert annoy_db.metrics.mapped_bytes == (
+        (index_path / "index.annoy").stat().st_size + data_path.stat().st_size
+    )
+
+
+def test_open_rag_database_is_not_shared(rag_files, loads):
+    index_path, data_path = rag_files
+    shared = database.load_rag_database(index_path, data_path)
+
+    assert database.open_rag_database(index_path, data_path) is not shared
+    assert len(loads) == 2
+
+
+def test_second_session_pays_no_load_cost(rag_files, loads):
+    pytest.importorskip("livekit.agents")
+    from rag_handler import RAGHandler
+
+    index_path, data_path = rag_files
+    prewarmed = RAGHandler.prewarm(index_path, data_path)
+    first_session = RAGHandler(index_path=index_path, data_path=data_path)
+    second_session = RAGHandler(index_path=index_path, data_path=data_path)
+
+    assert len(loads) == 1
+    assert first_session._rag_db is prewarmed
+    assert second_session._rag_db is prewarmed
+    assert second_session.metrics is prewarmed.metrics
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from rag.bm25 import BM25Index, build_bm25
+from rag.hybrid import HybridRetriever
+from rag.index import QueryResult
+
+DOCUMENTS = [
+    "Use register_rpc_method to expose a method to other participants.",
+    "Participants can publish tracks to the room.",
+    "The room emits events when participants join or leave.",
+    "Data messages are sent to every participant in the room.",
+    "register_rpc_method register_rpc_method handlers return a string.",
+    "Agents join rooms as participants.",
+    "Set a unique_token_name on the access token grant.",
+]
+
+
+class FakeIndex:
+    """Vector search that always ranks the documents in a fixed order."""
+
+    def __init__(self, ranking: list[int]) -> None:
+        self.ranking = ranking
+
+    def query(self, vector, n, search_k=-1, exclude=None):
+        ids = [i for i in self.ranking if not exclude or i not in exclude]
+        return [QueryResult(i=i, distance=float(rank)) for rank, i in enumerate(ids[:n])]
+
+
+class FakeEmbeddings:
+    def __init__(self) -> None:
+        self.queries: list[str] = []
+
+    async def embed(self, text: str) -> list[float]:
+        self.queries.append(text)
+        return [0.0]
+
+
+@pytest.fixture
+def bm25(tmp_path):
+    build_bm25(tmp_path, DOCUMENTS)
+    return BM25Index(tmp_path)
+
+
+def retriever(bm25, embeddings, **kwargs) -> HybridRetriever:
+    return HybridRetriever(FakeIndex([2, 1, 5, 3, 0, 4, 6]), bm25, embeddings, **kwargs)
+
+
+def test_close_runner_up_is_fused_even_for_one_result(bm25):
+    embeddings = FakeEmbeddings()
+    search = retriever(bm25, embeddings, lexical_min_score=0.5, lexical_margin=3.0)
+
+    results = asyncio.run(search.search("register_rpc_method", n=1))
+
+    # Two documents match about equally, so the vector search is consulted
+    assert embeddings.queries == ["register_rpc_method"]
+    assert search.stats.lexical_only == 0
+    assert len(results) == 1
+
+
+def test_clear_lexical_winner_skips_the_embedding(bm25):
+    embeddings = FakeEmbeddings()
+    search = retriever(bm25, embeddings, lexical_min_score=0.5, lexical_margin=1.5)
+
+    results = asyncio.run(search.search("unique_token_name grant", n=1))
+
+    assert embeddings.queries == []
+    assert search.stats.lexical_only == 1
+    assert [r.i for r in results] == [6]
+
+
+def test_lexical_only_scores_are_on_the_fused_scale(bm25):
+    search = retriever(bm25, FakeEmbeddings(), lexical_min_score=0.5, lexical_margin=1.5, rrf_k=60)
+
+    lexical_only = asyncio.run(search.search("unique_token_name grant", n=3))
+    fused = asyncio.run(search.search("participants", n=3))
+
+    assert [r.score for r in lexical_only] == [1 / 61]
+    assert all(0 < r.score <= 2 / 61 for r in fused)
+    assert [r.score for r in fused] == sorted((r.score for r in fused), reverse=True)
+
+
+def test_low_scores_fall_back_to_fusion(bm25):
+    embeddings = FakeEmbeddings()
+    search = retriever(bm25, embeddings)
+
+    results = asyncio.run(search.search("participants room", n=2))
+
+    assert embeddings.queries == ["participants room"]
+    assert len(results) == 2
+
+
+def test_excluded_items_are_not_returned(bm25):
+    search = retriever(bm25, FakeEmbeddings(), lexical_min_score=0.5, lexical_margin=1.5)
+
+    results = asyncio.run(search.search("unique_token_name participants", n=3, exclude={6, 2}))
+
+    assert not {r.i for r in results} & {6, 2}
+    assert len(results) == 3
+
+
+def test_without_bm25_only_the_vector_ranking_is_used():
+    embeddings = FakeEmbeddings()
+    search = HybridRetriever(FakeIndex([3, 1, 2]), None, embeddings)
+
+    results = asyncio.run(search.search("anything", n=2))
+
+    assert [r.i for r in results] == [3, 1]
+    assert embeddings.queries == ["anything"]
@@ -0,0 +1,209 @@
+import math
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rag.index import IndexBuilder, ItemBitmap, load_index
+from rag.numpy_index import save_vectors
+from rag.quantized_index import save_quantized_vectors
+
+BACKENDS = ["annoy", "numpy", "int8", "float16"]
+SIZE = 40
+DIMENSIONS = 16
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = random.Random(1)
+    return [[rng.gauss(0, 1) for _ in range(DIMENSIONS)] for _ in range(SIZE)]
+
+
+@pytest.fixture(scope="module")
+def index_path(tmp_path_factory, vectors):
+    path = tmp_path_factory.mktemp("index")
+    builder = IndexBuilder(DIMENSIONS, "angular")
+    for vector in vectors:
+        builder.add_item(vector)
+    builder.build(trees=20)
+    builder.save(str(path))
+    save_vectors(str(path), vectors, "angular")
+    for quantization in ("int8", "float16"):
+        save_quantized_vectors(str(path), vectors, "angular", quantization)
+    return path
+
+
+@pytest.fixture(params=BACKENDS)
+def index(request, index_path):
+    return load_index(index_path, request.param)
+
+
+def angular_distance(a, b):
+    cos = sum(x * y for x, y in zip(a, b)) / math.sqrt(
+        sum(x * x for x in a) * sum(y * y for y in b)
+    )
+    return math.sqrt(max(2 - 2 * cos, 0.0))
+
+
+def exact_ranking(vectors, query):
+    return sorted(range(len(vectors)), key=lambda i: angular_distance(vectors[i], query))
+
+
+def test_size(index):
+    assert index.size == SIZE
+
+
+def test_results_are_closest_first(index, vectors):
+    results = index.query(vectors[0], 10)
+
+    assert len(results) == 10
+    assert results[0].i == 0
+    assert results[0].distance == pytest.approx(0.0, abs=1e-3)
+    distances = [r.distance for r in results]
+    assert distances == sorted(distances)
+    assert len({r.i for r in results}) == 10
+
+
+def test_distances_match_the_angular_metric(index, vectors):
+    query = vectors[5]
+    for result in index.query(query, 5):
+        assert result.distance == pytest.approx(
+            angular_distance(vectors[result.i], query), abs=1e-2
+        )
+
+
+@pytest.mark.parametrize("backend", ["numpy", "int8", "float16"])
+def test_exact_backends_match_brute_force(index_path, vectors, backend):
+    index = load_index(index_path, backend)
+    query = [sum(v) for v in zip(vectors[2], vectors[7])]
+
+    assert [r.i for r in index.query(query, 10)] == exact_ranking(vectors, query)[:10]
+
+
+@pytest.mark.parametrize("exclude", [{0, 1, 2}, ItemBitmap()], ids=["set", "bitmap"])
+def test_excluded_items_are_skipped(index, vectors, exclude):
+    if isinstance(exclude, ItemBitmap):
+        for i in (0, 1, 2):
+            exclude.add(i)
+    results = index.query(vectors[0], 5, exclude=exclude)
+
+    assert len(results) == 5
+    assert not {r.i for r in results} & {0, 1, 2}
+    distances = [r.distance for r in results]
+    assert distances == sorted(distances)
+
+
+def test_exclusion_keeps_the_remaining_order(index_path, vectors):
+    index = load_index(index_path, "numpy")
+    unfiltered = [r.i for r in index.query(vectors[3], 10)]
+    excluded = set(unfiltered[:4:2])
+
+    filtered = [r.i for r in index.query(vectors[3], 6, exclude=excluded)]
+    assert filtered == [i for i in unfiltered if i not in excluded][:6]
+
+
+def test_excluding_nearest_items_still_fills_n(index, vectors):
+    # More exclusions than n makes the Annoy backend over-fetch
+    nearest = set(exact_ranking(vectors, vectors[4])[:20])
+    results = index.query(vectors[4], 5, exclude=nearest)
+
+    assert len(results) == 5
+    assert not {r.i for r in results} & nearest
+
+
+def test_n_larger_than_the_corpus_returns_every_item(index, vectors):
+    results = index.query(vectors[0], SIZE * 3)
+
+    assert sorted(r.i for r in results) == list(range(SIZE))
+
+
+def test_n_larger_than_the_corpus_with_exclusions(index, vectors):
+    results = index.query(vectors[0], SIZE * 3, exclude={1, 3, 5})
+
+    assert sorted(r.i for r in results) == [i for i in range(SIZE) if i not in {1, 3, 5}]
+
+
+def test_excluding_everything_returns_nothing(index, vectors):
+    assert index.query(vectors[0], 5, exclude=set(range(SIZE))) == []
+
+
+def test_exclusions_outside_the_index_are_ignored(index, vectors):
+    results = index.query(vectors[0], 3, exclude={-1, SIZE, SIZE + 100})
+
+    assert [r.i for r in results][0] == 0
+    assert len(results) == 3
+
+
+def test_items_round_trip(index, vectors):
+    items = list(index.items())
+
+    assert [item.i for item in items] == list(range(SIZE))
+    assert angular_distance(items[9].vector, vectors[9]) == pytest.approx(0.0, abs=1e-2)
+
+
+def test_reading_metadata_does_not_import_backends(index_path):
+    script = (
+        "import sys\n"
+        "from rag.index import read_metadata\n"
+        f"print(read_metadata({str(index_path)!r}).f)\n"
+        "assert 'annoy' not in sys.modules and 'numpy' not in sys.modules\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=Path(__file__).resolve().parents[1],
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == str(DIMENSIONS)
+
+
+def test_unknown_backend(index_path):
+    with pytest.raises(ValueError):
+        load_index(index_path, "faiss")
+
+
+@pytest.fixture(scope="module")
+def empty_index_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp("empty-index")
+    builder = IndexBuilder(DIMENSIONS, "angular")
+    builder.build(trees=1)
+    builder.save(str(path))
+    save_vectors(str(path), [], "angular", DIMENSIONS)
+    for quantization in ("int8", "float16"):
+        save_quantized_vectors(str(path), [], "angular", quantization, DIMENSIONS)
+    return path
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_empty_corpus(empty_index_path, vectors, backend):
+    index = load_index(empty_index_path, backend)
+
+    assert index.size == 0
+    assert index.query(vectors[0], 5) == []
+    assert list(index.items()) == []
+
+
+def test_empty_vectors_need_the_dimension(tmp_path):
+    with pytest.raises(ValueError):
+        save_quantized_vectors(str(tmp_path), [], "angular", "int8")
+
+
+def test_close_empties_the_index(index, vectors):
+    index.close()
+
+    assert index.size == 0
+    assert index.query(vectors[0], 5) == []
+
+
+def test_close_releases_the_rerank_file(index_path):
+    index = load_index(index_path, "int8")
+    fd = index._exact._fd
+    index.close()
+
+    with pytest.raises(OSError):
+        os.fstat(fd)
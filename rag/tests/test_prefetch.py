@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from rag.hybrid import HybridResult
+from rag.prefetch import RAGPrefetcher
+
+
+class SlowRetriever:
+    """Returns one result per search after `delay` seconds, recording queries."""
+
+    def __init__(self, delay: float = 0.05) -> None:
+        self.delay = delay
+        self.queries: list[str] = []
+
+    async def search(self, query, n, exclude=None):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        return [HybridResult(i=len(self.queries), score=1.0)]
+
+
+def test_search_uses_a_finished_prefetch():
+    async def run():
+        retriever = SlowRetriever()
+        prefetcher = RAGPrefetcher(retriever)
+        prefetcher.on_transcript("how do I register an RPC method", is_final=True)
+        await asyncio.sleep(0.1)
+        return retriever, prefetcher, await prefetcher.search("register an RPC method")
+
+    retriever, prefetcher, lookup = asyncio.run(run())
+
+    assert lookup.hit
+    assert lookup.time_saved > 0
+    assert len(retriever.queries) == 1
+    assert prefetcher.stats.hit_rate == 1.0
+
+
+def test_unrelated_query_misses():
+    async def run():
+        retriever = SlowRetriever(delay=0)
+        prefetcher = RAGPrefetcher(retriever)
+        prefetcher.on_transcript("how do I register an RPC method", is_final=True)
+        await asyncio.sleep(0)
+        return prefetcher, await prefetcher.search("publish a video track")
+
+    prefetcher, lookup = asyncio.run(run())
+
+    assert not lookup.hit
+    assert prefetcher.stats.misses == 1
+
+
+def test_prefetch_evicted_while_awaited_falls_back_to_search():
+    async def run():
+        retriever = SlowRetriever()
+        prefetcher = RAGPrefetcher(retriever, max_entries=1)
+        prefetcher.prefetch("how do I register an RPC method")
+        lookup = asyncio.create_task(prefetcher.search("how do I register an RPC method"))
+        await asyncio.sleep(0.01)
+        # Evicts and cancels the prefetch the lookup is waiting on
+        prefetcher.prefetch("how do I publish a video track")
+        return retriever, await lookup
+
+    retriever, lookup = asyncio.run(run())
+
+    assert not lookup.hit
+    assert lookup.results
+    assert retriever.queries[-1] == "how do I register an RPC method"
+
+
+def test_cancelling_the_lookup_still_cancels_it():
+    async def run():
+        prefetcher = RAGPrefetcher(SlowRetriever(delay=1.0))
+        prefetcher.prefetch("how do I register an RPC method")
+        lookup = asyncio.create_task(prefetcher.search("how do I register an RPC method"))
+        await asyncio.sleep(0.01)
+        lookup.cancel()
+        await lookup
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run())
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from livekit.plugins import openai
+
+from rag.query_embedding_cache import QueryEmbeddingCache
+
+
+@pytest.fixture
+def requests(monkeypatch):
+    """Replace the embeddings call, recording the inputs it is sent."""
+    sent: list[str] = []
+
+    async def create_embeddings(*, input, model, dimensions, http_session=None):
+        sent.extend(input)
+        await asyncio.sleep(0.01)
+        return [openai.EmbeddingData(index=0, embedding=[float(len(input[0]))])]
+
+    monkeypatch.setattr(openai, "create_embeddings", create_embeddings)
+    return sent
+
+
+def test_miss_embeds_the_query_as_written(requests):
+    cache = QueryEmbeddingCache()
+
+    asyncio.run(cache.embed("  How do I use  RPC?"))
+
+    assert requests == ["  How do I use  RPC?"]
+
+
+def test_normalized_repeats_hit_the_cache(requests):
+    cache = QueryEmbeddingCache()
+
+    async def run():
+        first = await cache.embed("How do I use RPC?")
+        second = await cache.embed("how do i   use rpc")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == second
+    assert requests == ["How do I use RPC?"]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_concurrent_lookups_share_one_request(requests):
+    cache = QueryEmbeddingCache()
+
+    async def run():
+        return await asyncio.gather(*(cache.embed("What is a room?") for _ in range(5)))
+
+    results = asyncio.run(run())
+
+    assert len(requests) == 1
+    assert all(result == results[0] for result in results)
+    assert cache.stats.coalesced == 4
+
+
+def test_expired_and_evicted_entries_are_fetched_again(requests):
+    cache = QueryEmbeddingCache(max_size=1, ttl=0.0)
+
+    async def run():
+        await cache.embed("first question")
+        await cache.embed("first question")
+        await cache.embed("second question")
+
+    asyncio.run(run())
+
+    assert requests == ["first question", "first question", "second question"]
+    assert cache.stats.evictions == 1
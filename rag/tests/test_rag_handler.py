@@ -0,0 +1,180 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+from rag_handler import RAGHandler
+
+PARAGRAPH = "Rooms are created automatically when the first participant joins."
+
+
+class FakeSpeech:
+    """Plays for `duration` seconds unless interrupted first."""
+
+    def __init__(self, text: str, duration: float) -> None:
+        self.text = text
+        self.interrupted = False
+        self._callbacks = []
+        self._done = False
+        self._done_fut = asyncio.get_running_loop().create_future()
+        self._timer = asyncio.get_running_loop().call_later(duration, self._finish)
+
+    def done(self) -> bool:
+        return self._done
+
+    def __await__(self):
+        return asyncio.shield(self._done_fut).__await__()
+
+    def add_done_callback(self, callback) -> None:
+        self._callbacks.append(callback)
+
+    def interrupt(self, *, force: bool = False) -> "FakeSpeech":
+        self.interrupted = True
+        self._timer.cancel()
+        self._finish()
+        return self
+
+    def _finish(self) -> None:
+        if not self._done:
+            self._done = True
+            self._done_fut.set_result(None)
+            for callback in self._callbacks:
+                callback(self)
+
+
+class FakeSession:
+    def __init__(self, speech_duration: float) -> None:
+        self.speeches: list[FakeSpeech] = []
+        self._speech_duration = speech_duration
+
+    def say(self, text: str) -> FakeSpeech:
+        speech = FakeSpeech(text, self._speech_duration)
+        self.speeches.append(speech)
+        return speech
+
+
+class FakeLLM:
+    def __init__(self, session: FakeSession, delay: float = 0.0) -> None:
+        self.prompts: list[str] = []
+        self.speaking_during_completion: list[bool] = []
+        self._session = session
+        self._delay = delay
+
+    async def complete(self, prompt: str):
+        self.prompts.append(prompt)
+        self.speaking_during_completion.append(
+            any(not speech.done() for speech in self._session.speeches)
+        )
+        await asyncio.sleep(self._delay)
+        return SimpleNamespace(text=f"answer {len(self.prompts)}")
+
+
+class FakeAgent:
+    def __init__(self, session: FakeSession, llm: FakeLLM) -> None:
+        self.session = session
+        self._llm = llm
+        self.entered = False
+
+    async def on_enter(self) -> None:
+        self.entered = True
+
+
+def make_handler(retrieval_delay: float, context: str = PARAGRAPH, **kwargs) -> RAGHandler:
+    rag_db = SimpleNamespace(paragraphs={}, index=None, bm25=None, metrics=None)
+    handler = RAGHandler(index_path="unused", data_path="unused", rag_db=rag_db, **kwargs)
+
+    async def retrieve_context(query: str) -> str:
+        await asyncio.sleep(retrieval_delay)
+        return context
+
+    handler.retrieve_context = retrieve_context
+    return handler
+
+
+def run_lookup(handler: RAGHandler, speech_duration: float = 0.3, llm_delay: float = 0.0):
+    async def lookup():
+        session = FakeSession(speech_duration)
+        llm = FakeLLM(session, llm_delay)
+        agent = FakeAgent(session, llm)
+        await handler.enrich_with_rag(agent, None, "How are rooms created?")
+        return session, llm
+
+    return asyncio.run(lookup())
+
+
+def test_filler_is_skipped_when_retrieval_is_fast():
+    handler = make_handler(retrieval_delay=0.0, filler_delay=0.2)
+    session, llm = run_lookup(handler)
+
+    assert [speech.text for speech in session.speeches] == ["answer 1"]
+    assert PARAGRAPH in llm.prompts[0]
+    timings = handler.last_timings
+    assert timings.filler is None
+    assert not timings.filler_interrupted
+    assert timings.hidden_latency == 0.0
+    assert 0 <= timings.retrieval <= timings.generation
+
+
+def test_filler_is_cut_off_when_retrieval_completes():
+    handler = make_handler(retrieval_delay=0.15, filler_delay=0.05)
+    session, llm = run_lookup(handler, speech_duration=1.0, llm_delay=0.1)
+
+    filler, answer = session.speeches
+    assert filler.text in handler._thinking_messages
+    assert filler.interrupted
+    assert answer.text == "answer 1"
+    # The LLM ran after the filler had already been cut off
+    assert llm.speaking_during_completion == [False]
+
+    timings = handler.last_timings
+    assert timings.filler_interrupted
+    assert timings.filler == pytest.approx(timings.retrieval, abs=0.02)
+    assert timings.generation >= timings.retrieval + 0.1
+    assert timings.hidden_latency == timings.filler
+
+
+def test_short_filler_finishes_on_its_own():
+    handler = make_handler(retrieval_delay=0.2, filler_delay=0.05)
+    session, _ = run_lookup(handler, speech_duration=0.05)
+
+    filler = session.speeches[0]
+    assert not filler.interrupted
+    timings = handler.last_timings
+    assert not timings.filler_interrupted
+    assert timings.filler < timings.retrieval
+
+
+def test_timings_are_recorded_without_context():
+    handler = make_handler(retrieval_delay=0.1, context="", filler_delay=0.05)
+    session, llm = run_lookup(handler)
+
+    filler, apology = session.speeches
+    assert filler.interrupted
+    assert apology.text == "I couldn't find any relevant information about that."
+    assert llm.prompts == []
+
+    timings = handler.last_timings
+    assert timings.filler_interrupted
+    assert timings.generation == timings.retrieval
+    assert timings.retrieval >= 0.1
+
+
+def test_llm_fillers_are_generated_when_the_agent_enters():
+    handler = make_handler(retrieval_delay=0.0, thinking_style="llm")
+
+    async def enter():
+        session = FakeSession(0.0)
+        llm = FakeLLM(session)
+        agent = FakeAgent(session, llm)
+        handler.register_with_agent(agent)
+        await agent.on_enter()
+        await handler._thinking_generation
+        return agent, llm
+
+    agent, llm = asyncio.run(enter())
+
+    assert agent.entered
+    assert llm.prompts == [handler._thinking_prompt] * 3
+    assert handler._generated_thinking_messages == ["answer 1", "answer 2", "answer 3"]
@@ -0,0 +1,192 @@
+import asyncio
+import random
+
+import pytest
+
+from rag import registry as registry_module
+from rag.index import ANNOY_FILE, IndexBuilder
+from rag.paragraph_store import ParagraphStore
+from rag.registry import TenantRegistry, tenant_from_metadata
+
+TENANTS = ["acme", "globex", "initech"]
+
+
+@pytest.fixture
+def tenants_dir(tmp_path):
+    rng = random.Random(0)
+    for tenant in TENANTS:
+        path = tmp_path / tenant
+        path.mkdir()
+        builder = IndexBuilder(8, "angular")
+        for _ in range(10):
+            builder.add_item([rng.uniform(-1, 1) for _ in range(8)])
+        builder.build(trees=5)
+        builder.save(str(path))
+        ParagraphStore.write(
+            path / "paragraphs.bin", [f"{tenant} paragraph {i}" for i in range(10)]
+        )
+    return tmp_path
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Tenants opened by the registry, in order."""
+    calls = []
+    open_rag_database = registry_module.open_rag_database
+
+    def counting_open(index_path, data_path, backend="annoy"):
+        calls.append(index_path.name)
+        return open_rag_database(index_path, data_path, backend)
+
+    monkeypatch.setattr(registry_module, "open_rag_database", counting_open)
+    return calls
+
+
+def db_size(tenants_dir, tenant: str) -> int:
+    path = tenants_dir / tenant
+    return (path / ANNOY_FILE).stat().st_size + (path / "paragraphs.bin").stat().st_size
+
+
+def is_closed(db) -> bool:
+    return db.paragraphs._mmap.closed
+
+
+def test_concurrent_gets_share_one_load(tenants_dir, loads):
+    registry = TenantRegistry(tenants_dir)
+
+    async def get_many():
+        return await asyncio.gather(*(registry.get("acme") for _ in range(5)))
+
+    dbs = asyncio.run(get_many())
+
+    assert loads == ["acme"]
+    assert all(db is dbs[0] for db in dbs)
+    assert dbs[0].paragraphs[3] == "acme paragraph 3"
+    stats = registry.stats
+    assert (stats.misses, stats.coalesced, stats.hits) == (1, 4, 0)
+    assert registry._leases[id(dbs[0])] == 5
+
+
+def test_lru_eviction_respects_the_budget(tenants_dir, loads):
+    # Room for any two tenants, but not all three
+    sizes = sorted(db_size(tenants_dir, tenant) for tenant in TENANTS)
+    budget = sizes[1] + sizes[2]
+    registry = TenantRegistry(tenants_dir, max_bytes=budget)
+
+    async def use(tenant):
+        db = await registry.get(tenant)
+        registry.release(db)
+        return db
+
+    async def scenario():
+        acme = await use("acme")
+        await use("globex")
+        await use("acme")  # globex is now the least recently used
+        initech = await use("initech")
+        return acme, initech
+
+    acme, initech = asyncio.run(scenario())
+
+    assert list(registry._databases) == ["acme", "initech"]
+    assert registry.stats.mapped_bytes <= budget
+    assert loads == ["acme", "globex", "initech"]
+    assert not is_closed(acme) and not is_closed(initech)
+
+
+def test_most_recent_database_stays_resident_over_budget(tenants_dir):
+    registry = TenantRegistry(tenants_dir, max_bytes=1)
+
+    async def scenario():
+        first = await registry.get("acme")
+        registry.release(first)
+        second = await registry.get("globex")
+        return first, second
+
+    first, second = asyncio.run(scenario())
+
+    assert list(registry._databases) == ["globex"]
+    assert registry.stats.mapped_bytes > 1
+    assert is_closed(first)
+    assert second.paragraphs[0] == "globex paragraph 0"
+
+
+def test_evicted_database_is_closed_on_last_release(tenants_dir):
+    registry = TenantRegistry(tenants_dir, max_bytes=1)
+
+    async def scenario():
+        held = await registry.get("acme")
+        also_held = await registry.get("acme")
+        await registry.get("globex")
+        return held, also_held
+
+    held, also_held = asyncio.run(scenario())
+
+    assert "acme" not in registry._databases
+    assert held.paragraphs[1] == "acme paragraph 1"
+    registry.release(held)
+    assert not is_closed(held)
+    registry.release(also_held)
+    assert is_closed(held)
+    assert held.index.size == 0
+
+
+def test_cancelled_waiter_does_not_keep_a_lease(tenants_dir):
+    registry = TenantRegistry(tenants_dir)
+
+    async def scenario():
+        waiter = asyncio.create_task(registry.get("acme"))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        db = await registry.get("acme")
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return db
+
+    db = asyncio.run(scenario())
+
+    assert registry._leases[id(db)] == 1
+
+
+def test_stats(tenants_dir):
+    registry = TenantRegistry(tenants_dir, max_bytes=1)
+
+    async def scenario():
+        for tenant in ["acme", "acme", "globex", "globex", "acme"]:
+            registry.release(await registry.get(tenant))
+
+    asyncio.run(scenario())
+
+    stats = registry.stats
+    assert (stats.hits, stats.misses, stats.coalesced, stats.evictions) == (2, 3, 0, 2)
+    assert stats.size == 1
+    assert stats.mapped_bytes == db_size(tenants_dir, "acme")
+
+
+@pytest.mark.parametrize(
+    "metadata, tenant",
+    [
+        (['{"rag_tenant": "acme"}'], "acme"),
+        (['{"tenant": "acme"}'], "acme"),
+        (['{"rag_tenant": "acme", "tenant": "globex"}'], "acme"),
+        (["", '{"tenant": "globex"}'], "globex"),
+        ([None, "not json", "[1, 2]", '{"tenant": ""}', '{"rag_tenant": "initech"}'], "initech"),
+        (['{"other": "acme"}'], None),
+        ([None, ""], None),
+    ],
+)
+def test_tenant_from_metadata(metadata, tenant):
+    assert tenant_from_metadata(*metadata) == tenant
+
+
+@pytest.mark.parametrize("tenant", ["", "..", "../acme", "acme/../globex", ".hidden", "a b", "x" * 200])
+def test_bad_tenant_names_are_rejected(tenants_dir, tenant):
+    registry = TenantRegistry(tenants_dir)
+
+    with pytest.raises(ValueError):
+        asyncio.run(registry.get(tenant))
+    assert registry.stats.size == 0
+
+
+def test_unknown_tenant(tenants_dir):
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(TenantRegistry(tenants_dir).get("umbrella"))
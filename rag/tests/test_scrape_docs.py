@@ -0,0 +1,125 @@
+import asyncio
+import time
+
+import pytest
+
+from scrape_docs import DocsScraper, HostRateLimiter
+
+
+def page(title: str, body: str) -> str:
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f"<nav>Navigation</nav><main><h1>{title}</h1><p>{body}</p>"
+        "<script>ignored()</script></main><footer>Footer</footer></body></html>"
+    )
+
+
+@pytest.fixture
+def site(docs_site):
+    docs_site.pages = {
+        f"/guide/{i}": page(f"Guide {i}", f"How to do thing {i}.") for i in range(6)
+    }
+    docs_site.pages["/reference/api"] = page("API", "Excluded from scraping.")
+    return docs_site
+
+
+def scrape(site, cache_dir, **kwargs) -> DocsScraper:
+    scraper = DocsScraper(
+        base_url=site.url,
+        cache_dir=cache_dir,
+        requests_per_second=0,
+        parse_workers=1,
+        **kwargs,
+    )
+    asyncio.run(scraper.scrape())
+    return scraper
+
+
+def cache_files(cache_dir):
+    return {path.name: path.stat().st_mtime_ns for path in cache_dir.glob("*.json")}
+
+
+def test_first_run_fetches_and_caches_every_page(site, tmp_path):
+    scraper = scrape(site, tmp_path / "cache")
+
+    assert scraper.stats == {"fetched": 6, "not_modified": 0, "failed": 0}
+    assert len(cache_files(tmp_path / "cache")) == 6
+    assert scraper.content[0] == (
+        f"Content from {site.url}/guide/0:\n\nGuide 0\nHow to do thing 0.\n\n"
+    )
+    # /reference is excluded, so only the guides are requested
+    assert sorted(path for path, _, _ in site.page_requests()) == [f"/guide/{i}" for i in range(6)]
+
+
+def test_rerun_gets_304s_and_rewrites_nothing(site, tmp_path):
+    cache_dir = tmp_path / "cache"
+    first = scrape(site, cache_dir)
+    cached = cache_files(cache_dir)
+    site.requests.clear()
+
+    second = scrape(site, cache_dir)
+
+    assert second.stats == {"fetched": 0, "not_modified": 6, "failed": 0}
+    assert {status for _, status, _ in site.page_requests()} == {304}
+    assert all("If-None-Match" in headers for _, _, headers in site.page_requests())
+    assert cache_files(cache_dir) == cached
+    assert second.content == first.content
+
+
+def test_changed_page_is_fetched_again(site, tmp_path):
+    cache_dir = tmp_path / "cache"
+    scrape(site, cache_dir)
+    site.pages["/guide/2"] = page("Guide 2", "Updated instructions.")
+    site.requests.clear()
+
+    scraper = scrape(site, cache_dir)
+
+    assert scraper.stats == {"fetched": 1, "not_modified": 5, "failed": 0}
+    assert "Updated instructions." in scraper.content[2]
+    rerun = scrape(site, cache_dir)
+    assert rerun.stats["not_modified"] == 6
+
+
+def test_without_cache_every_page_is_downloaded(site, tmp_path):
+    scrape(site, None)
+    site.requests.clear()
+
+    scraper = scrape(site, None)
+
+    assert scraper.stats["fetched"] == 6
+    assert not any("If-None-Match" in headers for _, _, headers in site.page_requests())
+
+
+def test_missing_pages_are_counted_as_failed(site, tmp_path):
+    scraper = DocsScraper(base_url=site.url, cache_dir=tmp_path, requests_per_second=0, parse_workers=1)
+
+    async def fetch_missing() -> str:
+        await scraper.init_session()
+        try:
+            return await scraper.fetch_page(f"{site.url}/guide/missing")
+        finally:
+            await scraper.close_session()
+
+    assert asyncio.run(fetch_missing()) == ""
+    assert scraper.stats["failed"] == 1
+
+
+def test_concurrency_is_bounded(site, tmp_path):
+    site.delay = 0.05
+
+    scrape(site, tmp_path / "cache", max_concurrency=2)
+
+    assert site.max_in_flight == 2
+
+
+def test_rate_limit_spaces_requests_per_host():
+    limiter = HostRateLimiter(rate=50)
+
+    async def wait_all() -> float:
+        start = time.monotonic()
+        await asyncio.gather(*(limiter.wait("http://a.test/page") for _ in range(6)))
+        await asyncio.gather(*(limiter.wait(f"http://host{i}.test/") for i in range(6)))
+        return time.monotonic() - start
+
+    # Five intervals for one host; other hosts don't wait on it
+    assert 0.09 <= asyncio.run(wait_all()) < 0.5